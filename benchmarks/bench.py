@@ -0,0 +1,411 @@
+# Offline benchmark suite over the recorded / generated CWA, MOENV and NLSC payloads.
+#
+#   python -m benchmarks.bench                 run, compare with benchmarks/baseline.json
+#   python -m benchmarks.bench --update        run and save the results as the new baseline
+#   python -m benchmarks.bench -k forecast     only benchmarks whose name contains "forecast"
+#   python -m benchmarks.bench --replay rec.jsonl.gz   answer from a recorded archive (see replay.py) instead of the payloads
+#
+# Each benchmark reports the median wall time per call and the tracemalloc peak of one call.
+# The run fails when either grows past the baseline by more than the tolerance.
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import tracemalloc
+from datetime import datetime
+import numpy as np
+from pathlib import Path
+from . import payloads, harness
+from .harness import API_KEY, API_KEY_MOENV
+
+from custom_components.cwaweather.cwa import CWA
+from custom_components.cwaweather.moenv import MOENV
+from custom_components.cwaweather.datagovtw import DataGovTw
+from custom_components.cwaweather.coordinator import convet_cwa_to_ha_forcast, ForecastPeriod
+from custom_components.cwaweather.replay import ReplaySession
+from custom_components.cwaweather.national import ForecastColumns
+from custom_components.cwaweather.earthquake import EarthquakeFeed
+from custom_components.cwaweather.warning import WarningIndex
+from custom_components.cwaweather.cyclone import CycloneTracker
+from custom_components.cwaweather import grid
+
+BASELINE = Path(__file__).parent / "baseline.json"
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.10
+
+BENCHMARKS = {}
+
+
+def benchmark(name, number = 20):
+    def wrap(fn):
+        BENCHMARKS[name] = (fn, number)
+        return fn
+    return wrap
+
+
+# --- fetch + decode + parse, cache forgotten before every call ---
+
+@benchmark("get_forcast_hourly")
+async def bench_forcast_hourly(session):
+    harness.reset_cache()
+    await CWA.get_forcast_hourly(session, API_KEY, "高雄市", "鳳山區")
+
+
+@benchmark("get_forcast_twice_daily")
+async def bench_forcast_twice_daily(session):
+    harness.reset_cache()
+    await CWA.get_forcast_twice_daily(session, API_KEY, "高雄市", "鳳山區")
+
+
+@benchmark("get_observation_stations")
+async def bench_observation_stations(session):
+    harness.reset_cache()
+    await CWA.get_observation_stations(session, API_KEY)
+
+
+@benchmark("get_aqi_hourly")
+async def bench_aqi_hourly(session):
+    harness.reset_cache()
+    await MOENV.get_aqi_hourly(session, API_KEY_MOENV)
+
+
+@benchmark("get_aqi_hourly nearest sites")
+async def bench_aqi_hourly_sites(session):
+    # the hourly query once the coordinator knows its nearest sites
+    harness.reset_cache()
+    await MOENV.get_aqi_hourly(session, API_KEY_MOENV, ("1", "2", "3"))
+
+
+@benchmark("get_earthquake_reports", number=10)
+async def bench_earthquake_reports(session):
+    harness.reset_cache()
+    await CWA.get_earthquake_reports(session, API_KEY)
+
+
+@benchmark("earthquake feed poll", number=50)
+async def bench_earthquake_feed(session):
+    # a poll of the shared feed between two reports: fetched, nothing parsed
+    if not hasattr(bench_earthquake_feed, "feed"):
+        harness.reset_cache()
+        bench_earthquake_feed.feed = EarthquakeFeed()
+        await bench_earthquake_feed.feed.async_update(session, API_KEY)
+    feed = bench_earthquake_feed.feed
+    harness.reset_cache()
+    feed._shared.tried = None
+    await feed.async_update(session, API_KEY)
+
+
+@benchmark("earthquake felt in county", number=200)
+async def bench_earthquake_felt(session):
+    if not hasattr(bench_earthquake_felt, "feed"):
+        harness.reset_cache()
+        bench_earthquake_felt.feed = EarthquakeFeed()
+        await bench_earthquake_felt.feed.async_update(session, API_KEY)
+    for county in ("花蓮縣", "臺北市", "高雄市", "連江縣"):
+        bench_earthquake_felt.feed.felt(county)
+
+
+@benchmark("weather warnings index", number=50)
+async def bench_warnings_index(session):
+    harness.reset_cache()
+    return WarningIndex(await CWA.get_weather_warnings(session, API_KEY))
+
+
+@benchmark("weather warnings active", number=200)
+async def bench_warnings_active(session):
+    if not hasattr(bench_warnings_active, "index"):
+        harness.reset_cache()
+        bench_warnings_active.index = WarningIndex(await CWA.get_weather_warnings(session, API_KEY))
+    now = datetime.now().astimezone()
+    for county, town in (("臺北市", "大安區"), ("高雄市", "鳳山區"), ("花蓮縣", "花蓮市"), ("連江縣", "南竿鄉")):
+        bench_warnings_active.index.active(county, town, now)
+
+
+@benchmark("cyclone tracks", number=50)
+async def bench_cyclone_tracks(session):
+    harness.reset_cache()
+    tracker = CycloneTracker()
+    await tracker.async_update(session, API_KEY)
+    return tracker
+
+
+@benchmark("cyclone approach 200 locations", number=50)
+async def bench_cyclone_approach(session):
+    # a new advisory with 200 entries: one pass over every position and fix
+    if not hasattr(bench_cyclone_approach, "tracker"):
+        harness.reset_cache()
+        tracker = bench_cyclone_approach.tracker = CycloneTracker()
+        for i in range(200):
+            tracker.locate(f"entry{i}", 21.9 + (i % 20) * 0.2, 120.0 + (i // 20) * 0.2)
+        await tracker.async_update(session, API_KEY)
+    tracker = bench_cyclone_approach.tracker
+    tracker._dirty = True
+    tracker.approach("entry0")
+
+
+GRID_PATH = "/tmp/cwaweather-bench/grid/O-A0038-001"
+
+
+@benchmark("grid decode", number=20)
+async def bench_grid_decode(session):
+    # a new issuance: decoded, saved and mapped
+    if not hasattr(bench_grid_decode, "payload"):
+        bench_grid_decode.payload = payloads.load("O-A0038-001")
+    return grid._decode(bench_grid_decode.payload, grid.TEMPERATURE, GRID_PATH)
+
+
+def _grid_sample(n):
+    # the interpolation of every entry's position, one call whatever the count
+    state = []
+
+    async def run(session):
+        if not state:
+            lat = np.array([22.0 + i % 30 * 0.1 for i in range(n)])
+            lon = np.array([120.1 + i // 30 % 19 * 0.1 for i in range(n)])
+            state.extend((grid._decode(payloads.load("O-A0038-001"), grid.TEMPERATURE, GRID_PATH), lat, lon))
+        grid_, lat, lon = state
+        grid_.sample(lat, lon)
+    return run
+
+
+benchmark("grid sample 1 location", number=200)(_grid_sample(1))
+benchmark("grid sample 1000 locations", number=200)(_grid_sample(1000))
+
+
+@benchmark("town_village_point_query", number=200)
+async def bench_town_village_point_query(session):
+    harness.reset_cache()
+    await DataGovTw.town_village_point_query(session, 22.62, 120.35)
+
+
+# --- pure parsing, no fetch layer ---
+
+def _parse_a000x(dataid):
+    stations = payloads.load(dataid)["records"]["Station"]
+
+    async def run(session):
+        for st in stations:
+            CWA._parse_a000x(st)
+    return run
+
+
+benchmark("_parse_a000x O-A0001-001", number=10)(_parse_a000x("O-A0001-001"))
+benchmark("_parse_a000x O-A0002-001", number=5)(_parse_a000x("O-A0002-001"))
+benchmark("_parse_a000x O-A0003-001", number=50)(_parse_a000x("O-A0003-001"))
+
+
+def _parse_forecast_county(twice_daily):
+    dataid = "F-D0047-067-county" if twice_daily else "F-D0047-065-county"
+    parse = CWA._parse_forcast_twice_daily if twice_daily else CWA._parse_forcast_hourly
+
+    locs = []
+
+    async def run(session):
+        # the parsers leave the payload untouched, decode once
+        if not locs:
+            locs.extend(harness.utils.json_loads(session.body(dataid))["records"]["Locations"][0]["Location"])
+        for loc in locs:
+            parse(loc)
+    return run
+
+
+benchmark("parse F-D0047 county hourly", number=3)(_parse_forecast_county(False))
+benchmark("parse F-D0047 county twice_daily", number=3)(_parse_forecast_county(True))
+
+
+def _parse_forecast_national(twice_daily):
+    dataid = "F-D0047-091" if twice_daily else "F-D0047-089"
+    parse = CWA._parse_forcast_twice_daily if twice_daily else CWA._parse_forcast_hourly
+
+    locs = []
+
+    async def run(session):
+        if not locs:
+            locs.extend(harness.utils.json_loads(session.body(dataid))["records"]["Locations"][0]["Location"])
+        for loc in locs:
+            parse(loc)
+    return run
+
+
+benchmark("parse F-D0047 national hourly", number=3)(_parse_forecast_national(False))
+benchmark("parse F-D0047 national twice_daily", number=3)(_parse_forecast_national(True))
+
+
+def _national_columns(twice_daily):
+    # the national index of every town, built once per issuance
+    payload = []
+
+    async def run(session):
+        if not payload:
+            payload.append(harness.utils.json_loads(session.body("F-D0047-093-twice_daily" if twice_daily else "F-D0047-093")))
+        return ForecastColumns(payload[0], twice_daily)
+    return run
+
+
+benchmark("national index hourly", number=3)(_national_columns(False))
+benchmark("national index twice_daily", number=3)(_national_columns(True))
+
+
+@benchmark("national index town", number=200)
+async def bench_national_town(session):
+    # a town change answered from the index
+    if not hasattr(bench_national_town, "columns"):
+        bench_national_town.columns = await _national_columns(False)(session)
+    bench_national_town.columns.town("臺北市", "大安區")
+
+
+# --- record types, the whole snapshot is kept alive so the peak is its footprint ---
+
+def _records(dataid, key, parse):
+    records = []
+
+    async def run(session):
+        if not records:
+            data = payloads.load(dataid)["records"]
+            records.extend(data[key] if key else data)
+        return [parse(r) for r in records]
+    return run
+
+
+benchmark("records O-A0001-001", number=10)(_records("O-A0001-001", "Station", CWA._parse_a000x))
+benchmark("records O-A0003-001", number=20)(_records("O-A0003-001", "Station", CWA._parse_a000x))
+benchmark("records AQX_P_432", number=20)(_records("AQX_P_432", None, lambda r: MOENV._parse_aqi([r])[0]))
+
+
+@benchmark("records forecast periods", number=50)
+async def bench_forecast_periods(session):
+    if not hasattr(bench_forecast_periods, "forecasts"):
+        harness.reset_cache()
+        bench_forecast_periods.forecasts = (
+            (await CWA.get_forcast_hourly(session, API_KEY, "高雄市", "鳳山區"))["Forecasts"] +
+            (await CWA.get_forcast_twice_daily(session, API_KEY, "高雄市", "鳳山區"))["Forecasts"])
+    return [ForecastPeriod.from_cwa(fc) for fc in bench_forecast_periods.forecasts]
+
+
+@benchmark("convet_cwa_to_ha_forcast", number=50)
+async def bench_convert(session):
+    if not hasattr(bench_convert, "forecasts"):
+        harness.reset_cache()
+        bench_convert.forecasts = (
+            (await CWA.get_forcast_hourly(session, API_KEY, "高雄市", "鳳山區"))["Forecasts"] +
+            (await CWA.get_forcast_twice_daily(session, API_KEY, "高雄市", "鳳山區"))["Forecasts"])
+    for fc in bench_convert.forecasts:
+        convet_cwa_to_ha_forcast(fc)
+
+
+# --- a whole coordinator refresh ---
+
+@benchmark("_async_update_data", number=10)
+async def bench_update_data(session):
+    if not hasattr(bench_update_data, "coordinator"):
+        hass = await harness.async_make_hass(session)
+        bench_update_data.coordinator = harness.make_coordinator(hass, harness.config_entry())
+    coordinator = bench_update_data.coordinator
+    harness.reset_cache()
+    coordinator.force_refresh()
+    for c in coordinator.coordinators:
+        c.data = await c._async_update_data()
+
+
+@benchmark("_async_update_data forecast only", number=10)
+async def bench_update_data_forecast_only(session):
+    # only the hourly forecast sensors enabled: no twice daily forecast, observations or AQI
+    if not hasattr(bench_update_data_forecast_only, "coordinator"):
+        hass = await harness.async_make_hass(session)
+        coordinator = bench_update_data_forecast_only.coordinator = harness.make_coordinator(hass, harness.config_entry(), datasets=frozenset())
+        harness.reset_cache()
+        coordinator.data = await coordinator._async_update_data()
+    coordinator = bench_update_data_forecast_only.coordinator
+    harness.reset_cache()
+    coordinator._force_refresh = True
+    coordinator.data = await coordinator._async_update_data()
+
+
+@benchmark("get_forcasts x100", number=20)
+async def bench_get_forcasts(session):
+    # forecast subscribers and card renders between two refreshes
+    if not hasattr(bench_get_forcasts, "coordinator"):
+        hass = await harness.async_make_hass(session)
+        bench_get_forcasts.coordinator = harness.make_coordinator(hass, harness.config_entry())
+        harness.reset_cache()
+        bench_get_forcasts.coordinator.data = await bench_get_forcasts.coordinator._async_update_data()
+    coordinator = bench_get_forcasts.coordinator
+    for _ in range(100):
+        coordinator.get_forcasts("hourly")
+        coordinator.get_forcasts("twice_daily")
+        coordinator.get_forcasts("daily")
+
+
+async def _measure(fn, number, session):
+    await fn(session)   # warm up, lazy setup
+    times = []
+    for _ in range(number):
+        start = time.perf_counter()
+        await fn(session)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    await fn(session)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"time_ms": round(statistics.median(times) * 1000, 3), "peak_kib": round(peak / 1024, 1)}
+
+
+def _compare(name, res, base) -> list[str]:
+    errors = []
+    if base is None:
+        return [f"{name}: not in the baseline, save it with --update"]
+    if res["time_ms"] > base["time_ms"] * (1 + TIME_TOLERANCE):
+        errors.append(f"{name}: time {res['time_ms']}ms > baseline {base['time_ms']}ms")
+    if res["peak_kib"] > base["peak_kib"] * (1 + MEMORY_TOLERANCE):
+        errors.append(f"{name}: memory {res['peak_kib']}KiB > baseline {base['peak_kib']}KiB")
+    return errors
+
+
+async def run(selected, update, replay = None) -> int:
+    harness.unthrottle()
+    session = harness.FixtureSession()
+    if replay:
+        session = ReplaySession(replay, scale=0)
+        session.body = harness.FixtureSession().body
+    if not BASELINE.exists() and not update:
+        print(f"ERROR no baseline at {BASELINE}, save one with --update")
+        return 1
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    results = {}
+    errors = []
+
+    print(f"{'benchmark':<36} {'time':>12} {'baseline':>12} {'peak':>12} {'baseline':>12}")
+    for name, (fn, number) in BENCHMARKS.items():
+        if selected and not any(s in name for s in selected):
+            continue
+        res = results[name] = await _measure(fn, number, session)
+        base = baseline.get(name)
+        print(f"{name:<36} {res['time_ms']:>10.3f}ms {base['time_ms'] if base else '-':>10}ms "
+              f"{res['peak_kib']:>9.1f}KiB {base['peak_kib'] if base else '-':>9}KiB")
+        errors.extend(_compare(name, res, base))
+
+    if update:
+        BASELINE.write_text(json.dumps({**baseline, **results}, indent=2, ensure_ascii=False) + "\n")
+        print(f"baseline saved to {BASELINE}")
+        return 0
+
+    for e in errors:
+        print(f"REGRESSION {e}")
+    return 1 if errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--update", action="store_true", help="save results as the new baseline")
+    parser.add_argument("-k", action="append", default=[], help="only run benchmarks containing this text")
+    parser.add_argument("--replay", help="recorded archive to answer requests from")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.k, args.update, args.replay)))
+
+
+if __name__ == "__main__":
+    main()
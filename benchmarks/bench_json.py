@@ -0,0 +1,29 @@
+# JSON decode benchmark over the station, AQI and forecast payloads.
+#   python -m benchmarks.bench_json
+
+import json
+import timeit
+from . import payloads
+from custom_components.cwaweather.utils import json_loads, JSON_BACKEND
+
+DATASETS = ["O-A0001-001", "O-A0003-001", "AQX_P_432", "F-D0047-065", "F-D0047-065-county", "F-D0047-067-county", "F-D0047-091"]
+
+
+def _best(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def main():
+    print(f"backend: {JSON_BACKEND}")
+    print(f"{'dataset':<20} {'size':>10} {'json(str)':>12} {'json(bytes)':>12} {JSON_BACKEND + '(bytes)':>14} {'speedup':>8}")
+    for name in DATASETS:
+        body = payloads.load_bytes(name)
+        number = max(1, 2_000_000 // len(body))
+        t_str = _best(lambda: json.loads(body.decode()), number)
+        t_bytes = _best(lambda: json.loads(body), number)
+        t_backend = _best(lambda: json_loads(body), number)
+        print(f"{name:<20} {len(body):>10} {t_str * 1e3:>10.3f}ms {t_bytes * 1e3:>10.3f}ms {t_backend * 1e3:>12.3f}ms {t_str / t_backend:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# Offline plumbing shared by the benchmarks: a session answering from the payloads,
+# and coordinators running against it without a network or real config entries.
+
+import re
+import json
+import asyncio
+from types import SimpleNamespace
+from urllib.parse import urlsplit, parse_qs
+from aiohttp import ClientResponseError
+from . import payloads
+
+from custom_components.cwaweather import ratelimit, utils, resilience
+from custom_components.cwaweather.const import DOMAIN, CONF_API_KEY, CONF_API_KEY_MOENV, CONF_LOCATION, CONF_LATITUDE, CONF_LONGITUDE, CONF_NATIONAL_FORECAST
+
+API_KEY = "CWA-BENCHMARK-KEY"
+API_KEY_MOENV = "moenv-benchmark-key"
+
+
+def dataset_of(url) -> str:
+    """Payload name answering a request url."""
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/")
+    if "/TownVillagePointQuery/" in path:
+        return "TownVillagePointQuery"
+    name = path.rsplit("/", 1)[-1]
+    if m := re.fullmatch(r"F-D0047-(\d{3})", name):
+        num = int(m[1])
+        if num == 93:
+            # bulk request of several counties, hourly or twice daily by the ids asked for
+            ids = parse_qs(parts.query).get("locationId", ["F-D0047-001"])[0]
+            return f"{name}-twice_daily" if (int(ids.split(",")[0][-3:]) - 1) % 4 else name
+        if num in (89, 91):
+            return name
+        # county datasets alternate hourly / twice daily
+        county = parse_qs(parts.query).get("LocationName") is None
+        return f"F-D0047-{'067' if (num - 1) % 4 else '065'}{'-county' if county else ''}"
+    return name
+
+
+def moenv_query(payload, query) -> dict:
+    """A MOENV v2 response with the filters, fields, limit and offset of the query applied, like upstream does."""
+    params = {k: v[0] for k, v in parse_qs(query).items()}
+    records = payload["records"]
+    for cond in filter(None, params.get("filters", "").split("|")):
+        field, _, *values = cond.split(",")
+        records = [r for r in records if r.get(field) in values]
+    total = len(records)
+    offset = int(params.get("offset", 0))
+    records = records[offset:offset + int(params.get("limit", 1000))]
+    if names := params.get("fields"):
+        names = names.split(",")
+        records = [{k: r[k] for k in names if k in r} for r in records]
+    return {**payload, "total": str(total), "limit": params.get("limit", "1000"), "offset": str(offset), "records": records}
+
+
+class FixtureResponse:
+    def __init__(self, url, body, status = 200, delay = 0.0):
+        self.url = url
+        self.body = body
+        self.status = status
+        self.delay = delay
+
+    async def __aenter__(self):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise ClientResponseError(SimpleNamespace(real_url=self.url), (), status=self.status)
+
+    def get_encoding(self):
+        return "utf-8"
+
+    async def read(self):
+        return self.body
+
+    async def text(self):
+        return self.body.decode()
+
+
+class FixtureSession:
+    """Answers every request from the benchmark payloads, bodies are encoded once."""
+
+    def __init__(self, delay = 0.0):
+        self.delay = delay
+        self.requests = 0
+        self._bodies = {}
+
+    def body(self, name) -> bytes:
+        if (body := self._bodies.get(name)) is None:
+            body = self._bodies[name] = payloads.load_bytes(name)
+        return body
+
+    def get(self, url, **kwargs):
+        self.requests += 1
+        name = dataset_of(url)
+        query = urlsplit(url).query
+        if "offset=" in query:
+            body = json.dumps(moenv_query(json.loads(self.body(name)), query), ensure_ascii=False).encode()
+            return FixtureResponse(url, body, delay=self.delay)
+        return FixtureResponse(url, self.body(name), delay=self.delay)
+
+
+def unthrottle():
+    """Benchmarks hammer the fetch layer, lift the per key budgets so they measure code instead of the limiter."""
+    for host in (ratelimit.HOST_CWA, ratelimit.HOST_MOENV):
+        ratelimit.HOST_RATES[host] = (1e9, 1e9, 1e12)
+    ratelimit.DEFAULT_RATE = (1e9, 1e9, 1e12)
+    ratelimit.limiter._budgets.clear()
+
+
+def reset_cache():
+    """Forget cached responses so every call goes through fetch, decode and parse."""
+    utils.cache_clear()
+    resilience.snapshots._data.clear()
+
+
+def config_entry(entry_id = "bench", location = "高雄市-鳳山區", latitude = None, longitude = None, options = None, national = False):
+    data = {CONF_API_KEY: API_KEY, CONF_API_KEY_MOENV: API_KEY_MOENV, CONF_LOCATION: location, CONF_NATIONAL_FORECAST: national}
+    if latitude is not None:
+        data[CONF_LATITUDE] = latitude
+        data[CONF_LONGITUDE] = longitude
+    return SimpleNamespace(
+        entry_id=entry_id,
+        title=location or f"{latitude},{longitude}",
+        data=data,
+        options=options or {},
+        domain=DOMAIN,
+        async_on_unload=lambda func: None,
+        add_update_listener=lambda listener: (lambda: None),
+        async_create_task=lambda hass, coro, name=None, eager_start=True: hass.async_create_task(coro),
+        async_create_background_task=lambda hass, coro, name, eager_start=True: hass.async_create_background_task(coro, name),
+    )
+
+
+async def async_make_hass(session, config_dir = "/tmp/cwaweather-bench"):
+    """A bare HomeAssistant core with the integration session pointed at `session`."""
+    from homeassistant.core import HomeAssistant
+    hass = HomeAssistant(config_dir)
+    hass.data.setdefault(DOMAIN, {})["session"] = session
+    return hass
+
+
+def make_coordinator(hass, entry, datasets = None):
+    """A coordinator with listeners standing in for enabled entities that need `datasets`, all of them by default."""
+    from custom_components.cwaweather.coordinator import CWAWeatherCoordinator, DATASETS_ALL
+    coordinator = CWAWeatherCoordinator(hass, entry)
+    for c in coordinator.coordinators:
+        c.async_add_listener(lambda: None, DATASETS_ALL if datasets is None else datasets)
+    return coordinator
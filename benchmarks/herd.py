@@ -0,0 +1,180 @@
+# Upstream request bursts and refresh work over simulated time, coordinators in lockstep against spread out.
+#
+#   python -m benchmarks.herd
+#   python -m benchmarks.herd --entries 200 --hours 3 --towns 40
+#
+# Every coordinator refreshes at the time it scheduled itself for, on a simulated clock starting at the setup of all
+# entries, half an hour before a forecast publication. The fixture data is renewed every hour. Taiwan time.
+# "lockstep" replays the previous scheduling: a fixed 10 minute interval from the setup, a one minute fetch cache and
+# no prefetch. "spread" is the phase per coordinator, the publication aligned cache and the prefetcher.
+# Reports upstream requests (total, the most in a minute and in 10 seconds) and the refresh work in a 10 second
+# window, the event loop time taken by the refreshes.
+
+import os
+import time
+import heapq
+import asyncio
+import argparse
+import tempfile
+from collections import Counter
+from datetime import datetime
+from . import harness, payloads
+
+from custom_components.cwaweather import coordinator as coordinator_module, national, earthquake, warning, cyclone, grid, prefetch, utils, schedule, shared
+from custom_components.cwaweather.locations import catalog
+
+
+class SimClock:
+    """Stands in for the time module of the fetch cache, only the wall clock is simulated."""
+
+    def __init__(self, now):
+        self.now = now
+        self.perf_counter = time.perf_counter
+        self.monotonic = time.monotonic
+
+    def time(self):
+        return self.now
+
+
+def _sim_datetime(clock):
+    class SimDatetime(datetime):
+        @classmethod
+        def now(cls, tz = None):
+            return datetime.fromtimestamp(clock.now, tz)
+    return SimDatetime
+
+
+class Simulation:
+    def __init__(self, clock):
+        self.clock = clock
+        self._events = []
+        self._seq = 0
+
+    def at(self, t, job):
+        self._seq += 1
+        event = [t, self._seq, job]
+        heapq.heappush(self._events, event)
+
+        def cancel():
+            event[2] = None
+        return cancel
+
+    async def run(self, until):
+        while self._events and self._events[0][0] <= until:
+            t, _, job = heapq.heappop(self._events)
+            if job is not None:
+                self.clock.now = t
+                await job()
+
+
+class CountingSession(harness.FixtureSession):
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+        self.times = []
+
+    def get(self, url, **kwargs):
+        self.times.append(self.clock.now)
+        return super().get(url, **kwargs)
+
+
+def _max_in(times, window) -> int:
+    return max(Counter(int(t // window) for t in times).values(), default=0)
+
+
+async def _run(args, spread) -> dict:
+    # the grids saved on disk are of simulated hours, every run starts without
+    with tempfile.TemporaryDirectory() as config_dir:
+        return await _simulate(args, spread, config_dir)
+
+
+async def _simulate(args, spread, config_dir) -> dict:
+    harness.unthrottle()
+    harness.reset_cache()
+    national.national._columns.clear()
+    # the shared feeds start over on the simulated clock
+    for feed in (earthquake.feed, warning.weather_warnings, cyclone.tracker):
+        feed._shared.tried = None
+    grid.grids._grids.clear()
+    grid.grids._shared.clear()
+    start = schedule.FORECAST.next_served(datetime.now().astimezone()).timestamp() - 1800
+    clock = SimClock(start)
+    sim_datetime = _sim_datetime(clock)
+    for module in (coordinator_module, national, grid, prefetch):
+        module.datetime = sim_datetime
+    utils.time = shared.time = clock
+    if spread:
+        coordinator_module.next_refresh = schedule.next_refresh
+        utils.cache_expiry = schedule.cache_expiry
+    else:
+        coordinator_module.next_refresh = lambda key, now, interval = schedule.REFRESH_INTERVAL: interval
+        utils.cache_expiry = lambda dataset, ts: ts + schedule.DEFAULT_CACHE_TTL
+
+    sim = Simulation(clock)
+    prefetch.async_track_point_in_utc_time = lambda hass, action, point: sim.at(point.timestamp(), lambda: action(point))
+    session = CountingSession(clock)
+    hass = await harness.async_make_hass(session, config_dir)
+
+    async def renew(hour):
+        # new fixture data every hour, as if upstream published it
+        payloads.ISSUE_TIME = datetime.fromtimestamp(hour, schedule.TZ)
+        session._bodies.clear()
+        sim.at(hour + 3600, lambda: renew(hour + 3600))
+    await renew(start // 3600 * 3600)
+
+    towns = catalog.options()
+    coordinators = [
+        harness.make_coordinator(hass, harness.config_entry(f"herd{i}", location=towns[(i % args.towns) * len(towns) // args.towns]))
+        for i in range(args.entries)
+    ]
+    work = Counter()
+
+    async def tick(c):
+        t0 = time.perf_counter()
+        await c.async_refresh()
+        work[int(clock.now // 10)] += time.perf_counter() - t0
+        sim.at(clock.now + c.update_interval.total_seconds(), lambda: tick(c))
+
+    # the setup itself is the same in both, see benchmarks.startup
+    await asyncio.gather(*(c.async_refresh_all() for c in coordinators))
+    session.times.clear()
+    unregister = []
+    for c in coordinators:
+        for x in c.coordinators:
+            sim.at(clock.now + x.update_interval.total_seconds(), lambda x = x: tick(x))
+        if spread:
+            unregister.append(prefetch.prefetcher.register(c))
+    await sim.run(start + args.hours * 3600)
+    for func in unregister:
+        func()
+
+    return {
+        "requests": len(session.times),
+        "requests, max in a minute": _max_in(session.times, 60),
+        "requests, max in 10s": _max_in(session.times, 10),
+        "refresh work, max in 10s (ms)": round(max(work.values()) * 1000, 1),
+        "refresh work, 10s windows over 50ms": sum(1 for v in work.values() if v > .05),
+    }
+
+
+async def run(args):
+    lockstep = await _run(args, spread=False)
+    spread = await _run(args, spread=True)
+    print(f"entries: {args.entries} in {args.towns} towns, simulated hours: {args.hours}")
+    print(f"{'':<38} {'lockstep':>10} {'spread':>10}")
+    for key in lockstep:
+        print(f"{key:<38} {lockstep[key]:>10} {spread[key]:>10}")
+
+
+def main():
+    os.environ["TZ"] = "Asia/Taipei"
+    time.tzset()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=50)
+    parser.add_argument("--towns", type=int, default=10, help="distinct towns the entries are in")
+    parser.add_argument("--hours", type=int, default=2)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
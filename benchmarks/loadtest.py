@@ -0,0 +1,184 @@
+# Multi entry load test against a local stand-in for the CWA datastore, MOENV v2 and NLSC endpoints.
+#
+#   python -m benchmarks.loadtest --entries 50 --hours 6
+#   python -m benchmarks.loadtest --entries 500 --zones --latency 0.3 --jitter 0.2 --error-rate 0.02
+#   python -m benchmarks.loadtest --entries 200 --zones --national
+#
+# With --zones the point queries answer a town picked by the coordinates, so the entries spread over every county.
+# Every simulated tick is one 10 minute coordinator interval: all coordinators refresh concurrently,
+# the fetch cache is aged out between ticks, a new forecast issuance is simulated every 6 hours and a new AQI hour every hour.
+# Reports upstream requests per endpoint, p50/p99 refresh latency, event loop lag, CPU time and peak RSS.
+
+import time
+import zlib
+import random
+import asyncio
+import argparse
+import resource
+from collections import Counter
+from aiohttp import web
+from . import harness, payloads
+
+from custom_components.cwaweather.session import HostSessionPool
+from custom_components.cwaweather.metrics import metrics
+from custom_components.cwaweather.locations import catalog
+
+TICKS_PER_HOUR = 6
+TICKS_PER_ISSUANCE = 6 * TICKS_PER_HOUR
+
+
+class StandInServer:
+    def __init__(self, latency, jitter, error_rate, seed = 0, towns = False):
+        self.towns = towns
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = Counter()
+        self.errors = 0
+        self._rnd = random.Random(seed)
+        self._bodies = harness.FixtureSession()
+        self._runner = None
+        self.port = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        name = harness.dataset_of(str(request.url))
+        self.requests[name] += 1
+        await asyncio.sleep(max(0.0, self._rnd.gauss(self.latency, self.jitter)))
+        if self._rnd.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503)
+        if name == "TownVillagePointQuery":
+            body = self._bodies.body(name)
+            if self.towns:
+                town = catalog.options()[zlib.crc32(request.path.encode()) % len(catalog.options())]
+                body = payloads.town_village_point(*town.split("-")).encode()
+            return web.Response(body=body, content_type="text/xml", charset="utf-8")
+        return web.Response(body=self._bodies.body(name), content_type="application/json", charset="utf-8")
+
+    async def async_start(self):
+        app = web.Application()
+        app.router.add_get("/api/v1/rest/datastore/{dataid}", self._handle)
+        app.router.add_get("/api/v2/{dataset}", self._handle)
+        app.router.add_get("/other/TownVillagePointQuery/{lon}/{lat}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def async_stop(self):
+        await self._runner.cleanup()
+
+
+class LocalSessionPool(HostSessionPool):
+    """The integration session pool, with every upstream host pointed at the stand-in server."""
+
+    def __init__(self, port):
+        super().__init__()
+        self._base = f"http://127.0.0.1:{port}"
+
+    def get(self, url, **kwargs):
+        _, _, rest = url.partition("://")
+        return super().get(self._base + rest[rest.index("/"):], **kwargs)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval = 0.05):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(time.perf_counter() - start - self.interval)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        self._task.cancel()
+
+
+def _quantile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def _refresh(coordinator, latencies):
+    start = time.perf_counter()
+    await coordinator.async_refresh_all()
+    latencies.append(time.perf_counter() - start)
+
+
+async def run(args):
+    harness.unthrottle()
+    server = StandInServer(args.latency, args.jitter, args.error_rate, towns=args.zones)
+    await server.async_start()
+    session = LocalSessionPool(server.port)
+    hass = await harness.async_make_hass(session)
+
+    rnd = random.Random(1)
+    coordinators = []
+    for i in range(args.entries):
+        if args.zones:
+            entry = harness.config_entry(f"entry{i}", location=None, latitude=round(22.0 + rnd.random() * 3, 5), longitude=round(120.1 + rnd.random() * 1.8, 5), national=args.national)
+        else:
+            entry = harness.config_entry(f"entry{i}", national=args.national)
+        coordinators.append(harness.make_coordinator(hass, entry))
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    latencies = []
+    failures = 0
+    cpu = time.process_time()
+    wall = time.perf_counter()
+
+    for tick in range(args.hours * TICKS_PER_HOUR):
+        harness.reset_cache()
+        for coordinator in coordinators:
+            if coordinator.data is None:
+                continue
+            # simulated clock: new issuance / new AQI hour
+            if tick % TICKS_PER_ISSUANCE == 0:
+                coordinator._force_refresh = True
+            if tick % TICKS_PER_HOUR == 0:
+                coordinator.aqi.force_refresh()
+        await asyncio.gather(*(_refresh(c, latencies) for c in coordinators))
+        failures += sum(1 for c in coordinators for x in c.coordinators if not x.last_update_success)
+
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    monitor.stop()
+    await session.async_close()
+    await server.async_stop()
+
+    ticks = args.hours * TICKS_PER_HOUR
+    print(f"entries: {args.entries}{' (zones)' if args.zones else ''}{' (national forecasts)' if args.national else ''}, simulated hours: {args.hours}, ticks: {ticks}")
+    print(f"upstream requests: {sum(server.requests.values())} ({sum(server.requests.values()) / ticks:.1f}/tick), injected errors: {server.errors}")
+    for name, n in server.requests.most_common():
+        print(f"  {name:<24} {n:>8}")
+    print(f"fetch layer requests: {metrics.requests}, failed refreshes: {failures}")
+    print(f"refresh latency p50: {_quantile(latencies, .5) * 1000:.1f}ms  p99: {_quantile(latencies, .99) * 1000:.1f}ms  max: {max(latencies) * 1000:.1f}ms")
+    print(f"event loop lag p50: {_quantile(monitor.lags, .5) * 1000:.1f}ms  p99: {_quantile(monitor.lags, .99) * 1000:.1f}ms  max: {max(monitor.lags, default=0) * 1000:.1f}ms")
+    print(f"cpu: {cpu:.2f}s over {wall:.2f}s wall ({cpu / wall * 100:.0f}%), per tick: {cpu / ticks * 1000:.1f}ms")
+    print(f"peak rss: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f}MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=50)
+    parser.add_argument("--hours", type=int, default=6, help="simulated hours, 6 refresh ticks each")
+    parser.add_argument("--zones", action="store_true", help="entries track scattered coordinates instead of a town")
+    parser.add_argument("--national", action="store_true", help="entries take their forecasts from the national index")
+    parser.add_argument("--latency", type=float, default=0.2, help="mean upstream latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="upstream latency standard deviation, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of upstream requests answered with 503")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
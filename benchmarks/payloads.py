@@ -0,0 +1,390 @@
+# Offline payloads for the benchmarks.
+#
+# Recorded responses are loaded from benchmarks/payloads/<dataid>.json when present,
+# otherwise a deterministic payload with the same shape as the upstream dataset is generated.
+#   https://opendata.cwa.gov.tw/dist/opendata-swagger.html
+#   https://data.moenv.gov.tw/swagger/
+
+import json
+import random
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+PAYLOAD_DIR = Path(__file__).parent / "payloads"
+
+TZ = timezone(timedelta(hours=8))
+# generated data is issued at the current hour, so the coordinator finds a current forecast
+ISSUE_TIME = datetime.now(TZ).replace(minute=0, second=0, microsecond=0)
+
+WEATHERS = [("晴", "01"), ("多雲", "04"), ("陰", "07"), ("短暫陣雨", "08"), ("午後短暫雷陣雨", "22")]
+# station observations use the 雲量 + 天氣現象 vocabulary, see CWA_WEATHER_CONDITION_TO_HASS
+OBSERVED_WEATHERS = ["晴", "多雲", "陰", "陰有雨", "多雲有雷聲", "晴有霾"]
+WIND_DIRECTIONS = ["偏北風", "西北風", "偏西風", "西南風", "偏南風", "東南風", "偏東風", "東北風"]
+
+
+def _rnd(seed):
+    return random.Random(seed)
+
+
+def _iso(dt):
+    return dt.isoformat()
+
+
+def _hourly_location(rnd, town, lat, lon):
+    def pointwise(name, key, fn):
+        return {"ElementName": name, "Time": [
+            {"DataTime": _iso(ISSUE_TIME + timedelta(hours=h)), "ElementValue": [{key: fn(h)}]} for h in range(72)
+        ]}
+
+    def periodwise(name, hours, fn):
+        return {"ElementName": name, "Time": [
+            {"StartTime": _iso(ISSUE_TIME + timedelta(hours=h)), "EndTime": _iso(ISSUE_TIME + timedelta(hours=h + hours)), "ElementValue": [fn(h)]}
+            for h in range(0, 72 + hours, hours)
+        ]}
+
+    def weather(h):
+        w, c = WEATHERS[(h // 3) % len(WEATHERS)]
+        return {"Weather": w, "WeatherCode": c}
+
+    return {
+        "LocationName": town,
+        "Geocode": f"{rnd.randrange(10000000, 99999999)}",
+        "Latitude": f"{lat:.6f}",
+        "Longitude": f"{lon:.6f}",
+        "WeatherElement": [
+            pointwise("溫度", "Temperature", lambda h: str(24 + rnd.randrange(10))),
+            pointwise("露點溫度", "DewPoint", lambda h: str(20 + rnd.randrange(5))),
+            pointwise("相對濕度", "RelativeHumidity", lambda h: str(60 + rnd.randrange(35))),
+            pointwise("體感溫度", "ApparentTemperature", lambda h: str(26 + rnd.randrange(12))),
+            {"ElementName": "舒適度指數", "Time": [
+                {"DataTime": _iso(ISSUE_TIME + timedelta(hours=h)), "ElementValue": [{"ComfortIndex": "27", "ComfortIndexDescription": "舒適至悶熱"}]} for h in range(72)
+            ]},
+            {"ElementName": "風速", "Time": [
+                {"DataTime": _iso(ISSUE_TIME + timedelta(hours=h)), "ElementValue": [{"WindSpeed": str(rnd.randrange(1, 8)), "BeaufortScale": "2"}]} for h in range(72)
+            ]},
+            pointwise("風向", "WindDirection", lambda h: WIND_DIRECTIONS[rnd.randrange(len(WIND_DIRECTIONS))]),
+            periodwise("3小時降雨機率", 3, lambda h: {"ProbabilityOfPrecipitation": str(rnd.randrange(0, 100, 10))}),
+            periodwise("天氣現象", 3, weather),
+            periodwise("天氣預報綜合描述", 3, lambda h: {"WeatherDescription": "多雲午後短暫雷陣雨。降雨機率30%。溫度攝氏28度。舒適至悶熱。偏南風 平均風速1-2級(每秒2公尺)。相對濕度80%。"}),
+        ],
+    }
+
+
+def _twice_daily_location(rnd, town, lat, lon):
+    start = ISSUE_TIME.replace(hour=6)
+
+    def periodwise(name, fn, daytime_only=False):
+        times = []
+        for i in range(14):
+            st = start + timedelta(hours=12 * i)
+            if daytime_only and st.hour != 6:
+                continue
+            times.append({"StartTime": _iso(st), "EndTime": _iso(st + timedelta(hours=12)), "ElementValue": [fn(i)]})
+        return {"ElementName": name, "Time": times}
+
+    def weather(i):
+        w, c = WEATHERS[i % len(WEATHERS)]
+        return {"Weather": w, "WeatherCode": c}
+
+    return {
+        "LocationName": town,
+        "Geocode": f"{rnd.randrange(10000000, 99999999)}",
+        "Latitude": f"{lat:.6f}",
+        "Longitude": f"{lon:.6f}",
+        "WeatherElement": [
+            periodwise("平均溫度", lambda i: {"Temperature": str(26 + rnd.randrange(6))}),
+            periodwise("最高溫度", lambda i: {"MaxTemperature": str(31 + rnd.randrange(4))}),
+            periodwise("最低溫度", lambda i: {"MinTemperature": str(24 + rnd.randrange(4))}),
+            periodwise("平均露點溫度", lambda i: {"DewPoint": str(22 + rnd.randrange(3))}),
+            periodwise("平均相對濕度", lambda i: {"RelativeHumidity": str(70 + rnd.randrange(20))}),
+            periodwise("最高體感溫度", lambda i: {"MaxApparentTemperature": str(36 + rnd.randrange(5))}),
+            periodwise("最低體感溫度", lambda i: {"MinApparentTemperature": str(27 + rnd.randrange(3))}),
+            periodwise("最大舒適度指數", lambda i: {"MaxComfortIndex": "30", "MaxComfortIndexDescription": "悶熱"}),
+            periodwise("最小舒適度指數", lambda i: {"MinComfortIndex": "26", "MinComfortIndexDescription": "舒適"}),
+            periodwise("風速", lambda i: {"WindSpeed": str(rnd.randrange(1, 6)), "BeaufortScale": "2"}),
+            periodwise("風向", lambda i: {"WindDirection": WIND_DIRECTIONS[rnd.randrange(len(WIND_DIRECTIONS))]}),
+            periodwise("12小時降雨機率", lambda i: {"ProbabilityOfPrecipitation": str(rnd.randrange(0, 100, 10))}),
+            periodwise("天氣現象", weather),
+            periodwise("紫外線指數", lambda i: {"UVIndex": str(rnd.randrange(1, 11)), "UVExposureLevel": "高量級"}, daytime_only=True),
+            periodwise("天氣預報綜合描述", lambda i: {"WeatherDescription": "多雲午後短暫雷陣雨。降雨機率30%。溫度攝氏26至33度。悶熱。"}),
+        ],
+    }
+
+
+def _forecast(dataid, county, towns, twice_daily, seed):
+    rnd = _rnd(seed)
+    build = _twice_daily_location if twice_daily else _hourly_location
+    return {
+        "success": "true",
+        "result": {"resource_id": dataid, "fields": []},
+        "records": {"Locations": [{
+            "DatasetDescription": "臺灣各鄉鎮市區預報資料",
+            "LocationsName": county,
+            "Dataid": dataid,
+            "Location": [build(rnd, town, 22.6 + rnd.random(), 120.3 + rnd.random()) for town in towns],
+        }]},
+    }
+
+
+def forecast_county(twice_daily=False, towns=38):
+    """F-D0047-0xx for one county with all its towns."""
+    dataid = "F-D0047-067" if twice_daily else "F-D0047-065"
+    return _forecast(dataid, "高雄市", [f"鄉鎮{i:02}區" for i in range(towns)], twice_daily, 65)
+
+
+def forecast_town(twice_daily=False):
+    """F-D0047-0xx filtered by LocationName, the shape fetched by the coordinator."""
+    return forecast_county(twice_daily, towns=1)
+
+
+def forecast_national(twice_daily=False):
+    """F-D0047-089 / 091, every county."""
+    dataid = "F-D0047-091" if twice_daily else "F-D0047-089"
+    return _forecast(dataid, "臺灣", [f"縣市{i:02}" for i in range(22)], twice_daily, 89)
+
+
+def forecast_all_towns(twice_daily=False):
+    """F-D0047-093 asked for every county, all their towns. Tens of MB, like upstream."""
+    from custom_components.cwaweather.const import TAIWAN_CITYS_TOWNS
+    locations = []
+    for county, (num, towns) in TAIWAN_CITYS_TOWNS.items():
+        dataid = f"F-D0047-{num + 2 if twice_daily else num:03}"
+        locations.extend(_forecast(dataid, county, towns, twice_daily, num)["records"]["Locations"])
+    return {"success": "true", "result": {"resource_id": "F-D0047-093", "fields": []}, "records": {"Locations": locations}}
+
+
+def _station(rnd, i):
+    lat = 21.9 + rnd.random() * 3.4
+    lon = 120.0 + rnd.random() * 2.0
+    w = OBSERVED_WEATHERS[i % len(OBSERVED_WEATHERS)]
+    return {
+        "StationName": f"測站{i:04}",
+        "StationId": f"C0{i:04}",
+        "ObsTime": {"DateTime": _iso(ISSUE_TIME)},
+        "GeoInfo": {
+            "Coordinates": [
+                {"CoordinateName": "TWD67", "CoordinateFormat": "decimal degrees", "StationLatitude": round(lat - 0.002, 6), "StationLongitude": round(lon - 0.008, 6)},
+                {"CoordinateName": "WGS84", "CoordinateFormat": "decimal degrees", "StationLatitude": round(lat, 6), "StationLongitude": round(lon, 6)},
+            ],
+            "StationAltitude": f"{rnd.randrange(2000)}.0",
+            "CountyName": "高雄市",
+            "TownName": "鳳山區",
+            "CountyCode": "64000",
+            "TownCode": "6400700",
+        },
+        "WeatherElement": {
+            "Weather": w if i % 3 == 0 else "-99",
+            "VisibilityDescription": ">30",
+            "SunshineDuration": 5.2,
+            "Now": {"Precipitation": 0.0},
+            "WindDirection": float(rnd.randrange(360)),
+            "WindSpeed": round(rnd.random() * 8, 1),
+            "AirTemperature": round(24 + rnd.random() * 10, 1),
+            "RelativeHumidity": float(rnd.randrange(50, 100)),
+            "AirPressure": round(1000 + rnd.random() * 15, 1),
+            "UVIndex": float(rnd.randrange(11)),
+            "Max10MinAverage": {"WindSpeed": 3.1, "Occurred_at": {"WindDirection": 200.0, "DateTime": _iso(ISSUE_TIME)}},
+            "GustInfo": {"PeakGustSpeed": round(rnd.random() * 12, 1), "Occurred_at": {"WindDirection": 210.0, "DateTime": _iso(ISSUE_TIME)}},
+            "DailyExtreme": {
+                "DailyHigh": {"TemperatureInfo": {"AirTemperature": 33.1, "Occurred_at": {"DateTime": _iso(ISSUE_TIME)}}},
+                "DailyLow": {"TemperatureInfo": {"AirTemperature": 25.3, "Occurred_at": {"DateTime": _iso(ISSUE_TIME)}}},
+            },
+        },
+    }
+
+
+def observation_stations(dataid="O-A0003-001", count=None):
+    """O-A0001-001 (automatic), O-A0002-001 (rain) or O-A0003-001 (manned) station list."""
+    count = count or {"O-A0001-001": 450, "O-A0002-001": 1300, "O-A0003-001": 30}.get(dataid, 30)
+    rnd = _rnd(dataid)
+    return {
+        "success": "true",
+        "result": {"resource_id": dataid, "fields": []},
+        "records": {"Station": [_station(rnd, i) for i in range(count)]},
+    }
+
+
+def aqi_sites(count=85):
+    """MOENV AQX_P_432, the hourly AQI of every site."""
+    rnd = _rnd("AQX_P_432")
+    records = []
+    for i in range(count):
+        records.append({
+            "sitename": f"站{i:02}", "county": "高雄市", "aqi": str(rnd.randrange(20, 150)), "pollutant": "" if i % 2 else "細懸浮微粒",
+            "status": "良好", "so2": "1.2", "co": "0.31", "o3": str(rnd.randrange(10, 80)), "o3_8hr": "35", "pm10": str(rnd.randrange(10, 90)),
+            "pm2.5": str(rnd.randrange(5, 60)), "no2": "8.1", "nox": "9.9", "no": "1.7", "wind_speed": "2.1", "wind_direc": "240",
+            "publishtime": f"{ISSUE_TIME:%Y/%m/%d %H:%M:%S}", "co_8hr": "0.3", "pm2.5_avg": "12", "pm10_avg": "30", "so2_avg": "1",
+            "longitude": f"{120.0 + rnd.random() * 2:.6f}", "latitude": f"{21.9 + rnd.random() * 3.4:.6f}", "siteid": str(i + 1),
+        })
+    return {
+        "fields": [{"id": k, "type": "text", "info": {"label": k}} for k in records[0]],
+        "resource_id": "4bd5a94e-2b7e-4f73-b9c4-c5d6e2a1d8a0",
+        "__extras": {"api_key": "redacted"},
+        "include_total": True,
+        "total": str(count),
+        "resource_format": "object",
+        "limit": "1000",
+        "offset": "0",
+        "_links": {"start": "", "next": ""},
+        "records": records,
+    }
+
+
+COUNTIES = ["基隆市", "臺北市", "新北市", "桃園市", "新竹市", "新竹縣", "苗栗縣", "臺中市", "彰化縣", "南投縣", "雲林縣",
+            "嘉義市", "嘉義縣", "臺南市", "高雄市", "屏東縣", "宜蘭縣", "花蓮縣", "臺東縣", "澎湖縣", "金門縣", "連江縣"]
+
+
+def earthquake_reports(dataid="E-A0015-001", count=50):
+    """E-A0015-001 (numbered) or E-A0016-001 (small area) earthquake reports, newest first."""
+    rnd = _rnd(dataid)
+    reports = []
+    for i in range(count):
+        origin = ISSUE_TIME - timedelta(hours=7 * i)
+        areas = []
+        for county in rnd.sample(COUNTIES, rnd.randrange(3, 12)):
+            areas.append({
+                "AreaDesc": f"最大震度{rnd.randrange(1, 5)}級地區",
+                "CountyName": county,
+                "InfoStatus": "observe",
+                "AreaIntensity": f"{rnd.randrange(1, 5)}級",
+                "EqStation": [{
+                    "pga": {"unit": "gal", "EWComponent": 1.2, "NSComponent": 1.5, "VComponent": 0.8, "IntScaleValue": 1.6},
+                    "pgv": {"unit": "kine", "EWComponent": 0.1, "NSComponent": 0.1, "VComponent": 0.0, "IntScaleValue": 1.2},
+                    "StationName": f"{county}{j}", "StationID": f"{county}{j}", "InfoStatus": "observe", "BackAzimuth": 12.3,
+                    "EpicenterDistance": 50.1, "SeismicIntensity": "1級", "StationLatitude": 23.1, "StationLongitude": 121.2,
+                    "WaveImageURI": "https://scweb.cwa.gov.tw/webdata/drawTrace/plotContour/2024/2024i.png",
+                } for j in range(rnd.randrange(1, 6))],
+            })
+        reports.append({
+            "EarthquakeNo": 113400 - i if dataid == "E-A0015-001" else 113000,
+            "ReportType": "地震報告",
+            "ReportColor": "綠色",
+            "ReportContent": f"{origin:%m/%d-%H:%M}花蓮縣政府南南東方 30.0 公里位於臺灣東部海域發生規模4.5有感地震，最大震度花蓮縣3級。",
+            "ReportImageURI": "https://scweb.cwa.gov.tw/webdata/OLDEQ/202408/2024080106001245_H.png",
+            "ReportRemark": "本報告係中央氣象署地震觀測網即時地震資料地震速報之結果。",
+            "Web": "https://scweb.cwa.gov.tw/zh-tw/earthquake/details/2024080106001245",
+            "ShakemapImageURI": "https://scweb.cwa.gov.tw/webdata/drawTrace/plotContour/2024/2024i.png",
+            "EarthquakeInfo": {
+                "OriginTime": f"{origin:%Y-%m-%d %H:%M:%S}",
+                "Source": "中央氣象署",
+                "FocalDepth": round(rnd.random() * 40, 1),
+                "Epicenter": {"Location": "花蓮縣政府南南東方 30.0 公里 (位於臺灣東部海域)", "EpicenterLatitude": round(23.0 + rnd.random(), 2), "EpicenterLongitude": round(121.2 + rnd.random(), 2)},
+                "EarthquakeMagnitude": {"MagnitudeType": "芮氏規模", "MagnitudeValue": round(3 + rnd.random() * 3, 1)},
+            },
+            "Intensity": {"ShakingArea": areas},
+        })
+    return {"success": "true", "result": {"resource_id": dataid, "fields": []}, "records": {"datasetDescription": "地震報告", "Earthquake": reports}}
+
+
+def weather_warnings():
+    """W-C0033-001, the active hazards of every county."""
+    rnd = _rnd("W-C0033-001")
+    locations = []
+    for i, county in enumerate(COUNTIES):
+        hazards = []
+        if i % 3 == 0:
+            hazards.append({
+                "info": {"language": "zh-TW", "phenomena": rnd.choice(["大雨", "豪雨", "陸上強風", "高溫"]), "significance": "特報"},
+                "validTime": {"startTime": f"{ISSUE_TIME:%Y-%m-%d %H:%M:%S}", "endTime": f"{ISSUE_TIME + timedelta(hours=12):%Y-%m-%d %H:%M:%S}"},
+            })
+        locations.append({"locationName": county, "geocode": 10000 + i, "hazardConditions": {"hazards": hazards}})
+    return {"success": "true", "result": {"resource_id": "W-C0033-001", "fields": []}, "records": {"datasetInfo": {"datasetDescription": "天氣特報-各別縣市地區目前之天氣警特報情形", "datasetLanguage": "zh-TW"}, "location": locations}}
+
+
+def cyclone_reports(storms=2):
+    """W-C0034-005, analysis and forecast tracks of the active tropical cyclones."""
+    rnd = _rnd("W-C0034-005")
+    cyclones = []
+    for n in range(storms):
+        lon, lat = 128.0 + n * 4, 18.0 + n * 2
+        analysis = []
+        for h in range(0, 72, 6):
+            analysis.append({
+                "fixTime": _iso(ISSUE_TIME - timedelta(hours=72 - h)),
+                "coordinate": f"{lon + h * 0.05:.1f},{lat + h * 0.03:.1f}",
+                "maxWindSpeed": "33", "maxGustSpeed": "43", "pressure": "975", "movingSpeed": "15", "movingDirection": "WNW",
+                "circleOf15Ms": {"radius": "200"},
+            })
+        forecast = []
+        for tau in range(6, 126, 6):
+            forecast.append({
+                "initTime": _iso(ISSUE_TIME),
+                "tau": str(tau),
+                "coordinate": f"{lon + 3.6 - tau * 0.06:.1f},{lat + 2.2 + tau * 0.02:.1f}",
+                "maxWindSpeed": "35", "maxGustSpeed": "45", "pressure": "970", "movingSpeed": "15", "movingDirection": "WNW",
+                "circleOf15Ms": {"radius": "220"},
+                "radiusOf70PercentProbability": str(40 + tau),
+            })
+        cyclones.append({
+            "year": "2024", "typhoonName": f"STORM{n}", "cwaTyphoonName": f"颱風{n}", "cwaTdNo": str(n + 3), "cwaTyNo": str(n + 5),
+            "analysisData": {"fix": analysis},
+            "forecastData": {"fix": forecast},
+        })
+    return {"success": "true", "result": {"resource_id": "W-C0034-005", "fields": []}, "records": {"tropicalCyclones": {"tropicalCyclone": cyclones}}}
+
+
+def temperature_grid(rows=120, cols=67):
+    """O-A0038-001, the hourly temperature analysis on a 0.03 degree grid, -999 off the island."""
+    rnd = _rnd("O-A0038-001")
+    values = []
+    for r in range(rows):
+        lat = 21.88 + r * 0.03
+        for c in range(cols):
+            lon = 120.0 + c * 0.03
+            # a tilted ellipse standing in for the main island
+            land = ((lat - 23.65) / 1.85) ** 2 + ((lon - 120.95 - (lat - 23.65) * 0.25) / 0.6) ** 2 <= 1
+            values.append(f"{30 - (lat - 21.88) * 1.2 - abs(lon - 121.0) * 3 + rnd.random():.1f}" if land else "-999.0")
+    content = "\n".join(",".join(values[r * cols:(r + 1) * cols]) for r in range(rows))
+    return {"cwaopendata": {
+        "identifier": "O-A0038-001", "sent": _iso(ISSUE_TIME + timedelta(minutes=15)), "status": "Actual", "msgType": "Issue", "dataid": "O-A0038-001",
+        "dataset": {
+            "datasetInfo": {"datasetDescription": "溫度分析格點資料", "datasetLanguage": "zh-TW", "DateTime": _iso(ISSUE_TIME)},
+            "GeoInfo": {"BottomLeftLongitude": "120.00", "BottomLeftLatitude": "21.88", "TopRightLongitude": "121.98", "TopRightLatitude": "25.45"},
+            "Resource": {"Content": content},
+        },
+    }}
+
+
+def town_village_point(county="高雄市", town="鳳山區"):
+    """NLSC TownVillagePointQuery answer, XML."""
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            f'<townVillageItem><ctyCode>E</ctyCode><ctyName>{county}</ctyName><townCode>E08</townCode><townName>{town}</townName>'
+            '<sectCode>6400700</sectCode><villageCode>64000070-001</villageCode><villageName>海光里</villageName></townVillageItem>')
+
+
+DATASETS = {
+    "F-D0047-065": lambda: forecast_town(False),
+    "F-D0047-067": lambda: forecast_town(True),
+    "F-D0047-065-county": lambda: forecast_county(False),
+    "F-D0047-067-county": lambda: forecast_county(True),
+    "F-D0047-089": lambda: forecast_national(False),
+    "F-D0047-091": lambda: forecast_national(True),
+    "F-D0047-093": lambda: forecast_all_towns(False),
+    "F-D0047-093-twice_daily": lambda: forecast_all_towns(True),
+    "O-A0001-001": lambda: observation_stations("O-A0001-001"),
+    "O-A0002-001": lambda: observation_stations("O-A0002-001"),
+    "O-A0003-001": lambda: observation_stations("O-A0003-001"),
+    "AQX_P_432": aqi_sites,
+    "E-A0015-001": lambda: earthquake_reports("E-A0015-001"),
+    "E-A0016-001": lambda: earthquake_reports("E-A0016-001"),
+    "W-C0033-001": weather_warnings,
+    "W-C0034-005": cyclone_reports,
+    "O-A0038-001": temperature_grid,
+}
+
+
+def load(name):
+    """Parsed payload of a dataset, recorded one first."""
+    if (path := PAYLOAD_DIR / f"{name}.json").exists():
+        return json.loads(path.read_bytes())
+    return DATASETS[name]()
+
+
+def load_bytes(name):
+    """Raw response body of a dataset, as it comes from the wire."""
+    if name == "TownVillagePointQuery":
+        path = PAYLOAD_DIR / f"{name}.xml"
+        return path.read_bytes() if path.exists() else town_village_point().encode()
+    if (path := PAYLOAD_DIR / f"{name}.json").exists():
+        return path.read_bytes()
+    return json.dumps(DATASETS[name](), ensure_ascii=False).encode()
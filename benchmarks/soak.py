@@ -0,0 +1,170 @@
+# Soak test: weeks of simulated refresh cycles with moving zones, checked against a memory ceiling.
+#
+#   python -m benchmarks.soak                          7 simulated days, 5 moving entries, generated payloads
+#   python -m benchmarks.soak --days 28 --entries 20
+#   python -m benchmarks.soak --replay rec.jsonl.gz    answer from a recorded archive (see replay.py)
+#
+# Every tick is one 10 minute coordinator interval, the fetch cache expires between ticks,
+# forecasts are reissued every 6 hours, AQI every hour, and each entry's zone wanders every --move-every ticks.
+# The first simulated day is the warm up, tracemalloc follows the heap from the start. The run fails when
+#   - the heap grows by more than --ceiling KiB between the end of the warm up and the end of the run,
+#   - a tick after the warm up allocates more than --cycle-budget KiB per entry (peak above the heap at the start of the tick),
+#   - any of the long lived containers (fetch cache, snapshots, metrics, rate limit budgets, attributes)
+#     is larger at the end than at the end of the warm up, or than its hard limit.
+
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tracemalloc
+from types import SimpleNamespace
+from . import harness
+
+from custom_components.cwaweather import utils
+from custom_components.cwaweather.session import HOST_NLSC
+from custom_components.cwaweather.resilience import snapshots
+from custom_components.cwaweather.ratelimit import limiter
+from custom_components.cwaweather.metrics import metrics
+from custom_components.cwaweather.replay import ReplaySession
+
+TICKS_PER_HOUR = 6
+TICKS_PER_DAY = 24 * TICKS_PER_HOUR
+TICKS_PER_ISSUANCE = 6 * TICKS_PER_HOUR
+
+
+class SoakSession:
+    """Replayed responses, with the point queries of the synthetic zone moves answered from the payloads."""
+
+    def __init__(self, replay):
+        self._replay = ReplaySession(replay, scale=0)
+        self._fixtures = harness.FixtureSession()
+
+    def get(self, url, **kwargs):
+        if HOST_NLSC in url:
+            return self._fixtures.get(url, **kwargs)
+        return self._replay.get(url, **kwargs)
+
+
+# containers with a hard size limit, the others must not grow after the warm up at all
+LIMITS = {
+    "snapshots": snapshots._size,
+    "extra attributes (max)": 12,      # 3 forecast_* and 9 station_* keys
+}
+
+
+def _sizes(coordinators) -> dict[str, int]:
+    return {
+        "fetch cache": len(utils._data_cache),
+        "snapshots": len(snapshots._data),
+        "datasets metrics": len(metrics._datasets),
+        "rate limit budgets": len(limiter._budgets),
+        "extra attributes (max)": max(len(c.extra_attributes_weather) for c in coordinators),
+        "aqi attributes (max)": max((len(c.aqi.data.aqi_extra_attributes or {}) for c in coordinators if c.aqi.data), default=0),
+        "recent refreshes (max)": max(len(c.refresh_metrics.recent) for c in coordinators),
+    }
+
+
+async def _move(coordinator, rnd):
+    # a zone update as delivered by async_track_state_change_event
+    lat = coordinator._latitude + rnd.uniform(-.02, .02)
+    lon = coordinator._longitude + rnd.uniform(-.02, .02)
+    event = SimpleNamespace(data={"new_state": SimpleNamespace(attributes={"latitude": lat, "longitude": lon})})
+    await coordinator._watched_entity_change(event)
+
+
+async def _tick(tick, coordinators, rnd, move_every):
+    utils.cache_clear()
+    for coordinator in coordinators:
+        if coordinator.data is None:
+            continue
+        # simulated clock: new issuance / new AQI hour
+        if tick % TICKS_PER_ISSUANCE == 0:
+            coordinator.force_refresh()
+        elif tick % TICKS_PER_HOUR == 0:
+            coordinator.aqi.force_refresh()
+    moving = [c for c in coordinators if c.data is not None and tick % move_every == 0]
+    await asyncio.gather(*(c.async_refresh_all() for c in coordinators if c not in moving), *(_move(c, rnd) for c in moving))
+
+
+async def run(args) -> int:
+    harness.unthrottle()
+    harness.reset_cache()
+    session = SoakSession(args.replay) if args.replay else harness.FixtureSession()
+    hass = await harness.async_make_hass(session)
+
+    rnd = random.Random(1)
+    coordinators = [
+        harness.make_coordinator(hass, harness.config_entry(f"soak{i}", location=None, latitude=round(22.6 + rnd.random(), 6), longitude=round(120.3 + rnd.random() * .5, 6)))
+        for i in range(args.entries)
+    ]
+
+    ticks = max(args.days, 2) * TICKS_PER_DAY
+    failures = 0
+    cycle_peak = 0
+    heap = []
+    wall = time.perf_counter()
+    tracemalloc.start()
+
+    for tick in range(ticks):
+        start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await _tick(tick, coordinators, rnd, args.move_every)
+        failures += sum(1 for c in coordinators if not c.last_update_success)
+
+        current, peak = tracemalloc.get_traced_memory()
+        if tick == TICKS_PER_DAY - 1:
+            # a day in, every long lived object has been replaced at least once: forecasts, AQI, snapshots
+            heap_warm = current
+            sizes_warm = _sizes(coordinators)
+        elif tick >= TICKS_PER_DAY:
+            cycle_peak = max(cycle_peak, peak - start)
+        if tick % TICKS_PER_DAY == TICKS_PER_DAY - 1:
+            heap.append(current)
+
+    sizes_end = _sizes(coordinators)
+    heap_end = tracemalloc.get_traced_memory()[0]
+    top = tracemalloc.take_snapshot().statistics("lineno")[:args.top] if args.top else []
+    tracemalloc.stop()
+    wall = time.perf_counter() - wall
+
+    errors = []
+    growth = (heap_end - heap_warm) / 1024
+    if growth > args.ceiling:
+        errors.append(f"heap grew {growth:.1f}KiB after warm up > ceiling {args.ceiling}KiB")
+    if cycle_peak / 1024 / args.entries > args.cycle_budget:
+        errors.append(f"a tick allocated {cycle_peak / 1024 / args.entries:.1f}KiB per entry > budget {args.cycle_budget}KiB")
+    for name, n in sizes_end.items():
+        if n > LIMITS.get(name, sizes_warm[name]):
+            errors.append(f"{name} grew from {sizes_warm[name]} to {n}")
+
+    print(f"entries: {args.entries}, simulated days: {args.days}, ticks: {ticks}, zone moves every {args.move_every} ticks, {wall:.1f}s wall")
+    print(f"failed refreshes: {failures}")
+    print(f"heap after the warm up: {heap_warm / 1024:.1f}KiB, at the end: {heap_end / 1024:.1f}KiB, growth: {growth:+.1f}KiB")
+    print(f"heap per day: {' '.join(f'{h / 1024:.0f}' for h in heap)} KiB")
+    print(f"largest tick allocation: {cycle_peak / 1024:.1f}KiB, {cycle_peak / 1024 / args.entries:.1f}KiB per entry")
+    for name, n in sizes_end.items():
+        print(f"  {name:<24} {sizes_warm[name]:>6} -> {n:<6}")
+
+    for stat in top:
+        print(f"  {stat}")
+
+    for e in errors:
+        print(f"FAIL {e}")
+    return 1 if errors or failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=5)
+    parser.add_argument("--days", type=int, default=7, help="simulated days, 144 refresh ticks each")
+    parser.add_argument("--move-every", type=int, default=3, help="ticks between zone moves of an entry")
+    parser.add_argument("--ceiling", type=float, default=256, help="allowed heap growth after the warm up day, KiB")
+    parser.add_argument("--cycle-budget", type=float, default=1024, help="allowed allocation peak of one tick per entry, KiB")
+    parser.add_argument("--replay", help="recorded archive to answer requests from")
+    parser.add_argument("--top", type=int, default=0, help="print the largest traced allocations left at the end, by line")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# The integration's share of the Home Assistant startup, with 1, 10 and 50 entries.
+#
+#   python -m benchmarks.startup
+#   python -m benchmarks.startup --entries 1 10 50 --latency 2.0
+#
+# All entries are set up concurrently, like HA does, against upstream answering after --latency seconds.
+# "setup" is until every async_setup_entry returned (the startup waits for it), "ready" until every entry
+# also finished its first refresh. "blocking" replays the previous setup, which awaited the first refresh
+# before setting up the platforms, "new" is a first setup without saved data and "restored" a restart
+# after it. Every entity is added and its state read right away, before any data arrived in "new".
+# "requests" are the upstream requests until ready. "import" is the integration and its platforms,
+# in a fresh interpreter with the HA core and aiohttp already imported.
+
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import importlib
+import subprocess
+from . import harness
+
+from custom_components.cwaweather import async_setup_entry, PLATFORMS
+from custom_components.cwaweather.coordinator import CWAWeatherCoordinator
+from custom_components.cwaweather.locations import catalog
+
+_IMPORT = """
+import time, aiohttp, voluptuous, homeassistant.core
+start = time.perf_counter()
+import custom_components.cwaweather
+for platform in ("weather", "sensor", "air_quality", "event", "binary_sensor"):
+    __import__(f"custom_components.cwaweather.{platform}")
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+async def _blocking_setup_entry(hass, config_entry):
+    """The setup before the restored data and background first refresh."""
+    coordinator = CWAWeatherCoordinator(hass, config_entry)
+    config_entry.runtime_data = coordinator
+    await coordinator.async_config_entry_first_refresh()
+    await asyncio.gather(coordinator.observation.async_refresh(), coordinator.aqi.async_refresh())
+    await hass.config_entries.async_forward_entry_setups(config_entry, PLATFORMS)
+    return True
+
+
+def _first_state(entity):
+    """Read every property of an available entity, like its first state write does."""
+    cls = type(entity)
+    if entity.available:
+        for name in dir(cls):
+            if isinstance(getattr(cls, name), property):
+                getattr(entity, name)
+
+
+async def _make_hass(session, config_dir):
+    hass = await harness.async_make_hass(session, config_dir)
+    background = []
+    create_background_task = hass.async_create_background_task
+
+    def track(coro, name, eager_start = True):
+        task = create_background_task(coro, name)
+        background.append(task)
+        return task
+    hass.async_create_background_task = track
+
+    async def forward(config_entry, platforms):
+        for platform in platforms:
+            module = importlib.import_module(f"custom_components.cwaweather.{platform.value}")
+            entities = []
+            await module.async_setup_entry(hass, config_entry, lambda new, update_before_add = False: entities.extend(new))
+            for entity in entities:
+                entity.hass = hass
+                await entity.async_added_to_hass()
+                _first_state(entity)
+    hass.config_entries = type("ConfigEntries", (), {"async_forward_entry_setups": staticmethod(forward)})()
+    return hass, background
+
+
+async def _start(entries, config_dir, latency, setup) -> tuple[float, float, int, list]:
+    harness.reset_cache()
+    session = harness.FixtureSession(delay=latency)
+    hass, background = await _make_hass(session, config_dir)
+    start = time.perf_counter()
+    await asyncio.gather(*(setup(hass, entry) for entry in entries))
+    setup_s = time.perf_counter() - start
+    while pending := [t for t in background if not t.done()]:
+        await asyncio.gather(*pending)
+    return setup_s, time.perf_counter() - start, session.requests, [entry.runtime_data for entry in entries]
+
+
+def _entries(n):
+    towns = catalog.options()
+    return [harness.config_entry(f"startup{i}", location=towns[i * len(towns) // n]) for i in range(n)]
+
+
+async def run(args):
+    harness.unthrottle()
+    import_ms = float(subprocess.run([sys.executable, "-c", _IMPORT], capture_output=True, text=True, check=True).stdout)
+    print(f"upstream latency: {args.latency}s, import: {import_ms:.1f}ms")
+    print(f"{'entries':>7} {'mode':<10} {'setup':>10} {'ready':>10} {'requests':>9}")
+    for n in args.entries:
+        with tempfile.TemporaryDirectory() as blocking_dir, tempfile.TemporaryDirectory() as config_dir:
+            rows = [("blocking", await _start(_entries(n), blocking_dir, args.latency, _blocking_setup_entry))]
+            rows.append(("new", res := await _start(_entries(n), config_dir, args.latency, async_setup_entry)))
+            for coordinator in res[3]:
+                await coordinator.store.async_save(coordinator)
+            rows.append(("restored", await _start(_entries(n), config_dir, args.latency, async_setup_entry)))
+        for mode, (setup_s, ready_s, requests, _) in rows:
+            print(f"{n:>7} {mode:<10} {setup_s * 1000:>8.1f}ms {ready_s * 1000:>8.1f}ms {requests:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--latency", type=float, default=1.0, help="upstream latency of every request, seconds")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
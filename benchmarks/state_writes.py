@@ -0,0 +1,143 @@
+# Entity state writes (one recorder states row each) of a day of refreshes, with and without change detection.
+#
+#   python -m benchmarks.state_writes
+#   python -m benchmarks.state_writes --hours 72 --jitter 0.5
+#
+# Station temperature and humidity take small random steps every 10 minute tick, like the real observations do,
+# AQI changes hourly, forecasts every 6 hours. Every sensor and the weather entity are enabled.
+# "before" replays the previous rules: every refresh calls every listener, every sensor writes on any value change,
+# the weather entity on every refresh.
+# "callbacks" counts the entity update callbacks run, observation and AQI refreshes only call their own entities.
+
+import json
+import random
+import asyncio
+import argparse
+import dataclasses
+from collections import Counter
+from . import payloads, harness
+
+from custom_components.cwaweather import utils, sensor
+from custom_components.cwaweather.weather import CWAWeatherEntity
+
+TICKS_PER_HOUR = 6
+
+
+class SimulatedClock:
+    """Stands in for the time module of the sensor platform, so the max age writes happen on simulated time."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class JitterSession(harness.FixtureSession):
+    """Fixture answers, with the station observations drifting a little on every tick."""
+
+    def __init__(self, jitter, seed = 0):
+        super().__init__()
+        self.jitter = jitter
+        self._rnd = random.Random(seed)
+        self._stations = payloads.load("O-A0003-001")
+
+    def tick(self):
+        for st in self._stations["records"]["Station"]:
+            we = st["WeatherElement"]
+            if self._rnd.random() < self.jitter:
+                we["AirTemperature"] = round(we["AirTemperature"] + self._rnd.choice((-.1, .1)), 1)
+            if self._rnd.random() < self.jitter:
+                we["RelativeHumidity"] = max(1, min(100, we["RelativeHumidity"] + self._rnd.choice((-1, 1))))
+        self._bodies["O-A0003-001"] = json.dumps(self._stations, ensure_ascii=False).encode()
+
+
+def _legacy(entities):
+    """The rules before change detection."""
+    for entity in entities:
+        if isinstance(entity, CWAWeatherEntity):
+            def write_always(entity = entity):
+                entity.coordinator.refresh_metrics.state_writes["weather"] += 1
+                entity.async_write_ha_state()
+                entity.coordinator.config_entry.async_create_task(entity.hass, entity.async_update_listeners(None))
+            entity._handle_coordinator_update = write_always
+
+            async def one_refresh(entity = entity):
+                # a single coordinator refreshed everything
+                entity.coordinator.async_add_listener(entity._handle_coordinator_update, entity.coordinator_context)
+            entity.async_added_to_hass = one_refresh
+        else:
+            entity.entity_description = dataclasses.replace(entity.entity_description, fields=frozenset(), deadband=0, max_age=None)
+
+
+def _count_callbacks(entity, callbacks):
+    handle = entity._handle_coordinator_update
+    def counted():
+        callbacks[0] += 1
+        handle()
+    entity._handle_coordinator_update = counted
+
+
+async def _run(hours, jitter, legacy) -> tuple[Counter, int, int]:
+    harness.unthrottle()
+    harness.reset_cache()
+    sensor.time = clock = SimulatedClock()
+    session = JitterSession(jitter)
+    hass = await harness.async_make_hass(session)
+    coordinator = harness.make_coordinator(hass, harness.config_entry())
+    await coordinator.async_refresh_all()
+
+    entities = [sensor.CWAWeatherSensorEntity(coordinator, d) for d in sensor.SENSOR_TYPES]
+    entities.extend(sensor.MOENVSensorEntity(coordinator, d) for d in sensor.MOENV_SENSOR_TYPES)
+    entities.append(CWAWeatherEntity(coordinator))
+    if legacy:
+        _legacy(entities)
+        for c in coordinator.coordinators:
+            c.always_update = True
+    listeners = Counter()
+    callbacks = [0]
+    for entity in entities:
+        entity.hass = hass
+        entity.async_write_ha_state = lambda: None
+
+        async def update_listeners(kinds, listeners = listeners):
+            listeners.update(kinds or ("hourly", "twice_daily", "daily"))
+        entity.async_update_listeners = update_listeners
+        _count_callbacks(entity, callbacks)
+        await entity.async_added_to_hass()
+
+    coordinator.refresh_metrics.state_writes.clear()
+    for tick in range(hours * TICKS_PER_HOUR):
+        clock.now += 3600 / TICKS_PER_HOUR
+        utils.cache_clear()
+        session.tick()
+        if tick % (6 * TICKS_PER_HOUR) == 0:
+            coordinator.force_refresh()
+        elif tick % TICKS_PER_HOUR == 0:
+            coordinator.aqi.force_refresh()
+        await coordinator.async_refresh_all()
+    await asyncio.sleep(0)
+    return coordinator.refresh_metrics.state_writes, sum(listeners.values()), callbacks[0]
+
+
+async def run(args):
+    before, before_listeners, before_callbacks = await _run(args.hours, args.jitter, legacy=True)
+    after, after_listeners, after_callbacks = await _run(args.hours, args.jitter, legacy=False)
+    print(f"simulated hours: {args.hours}, ticks: {args.hours * TICKS_PER_HOUR}, station jitter: {args.jitter}")
+    print(f"{'entity':<24} {'before/h':>10} {'after/h':>10}")
+    for key in sorted(before.keys() | after.keys()):
+        print(f"{key:<24} {before[key] / args.hours:>10.2f} {after[key] / args.hours:>10.2f}")
+    print(f"{'state writes':<24} {sum(before.values()) / args.hours:>10.2f} {sum(after.values()) / args.hours:>10.2f}")
+    print(f"{'forecast updates':<24} {before_listeners / args.hours:>10.2f} {after_listeners / args.hours:>10.2f}")
+    print(f"{'callbacks':<24} {before_callbacks / args.hours:>10.2f} {after_callbacks / args.hours:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--jitter", type=float, default=0.3, help="chance of a 0.1 degree / 1 percent step per station and tick")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,28 +4,46 @@ from homeassistant.core import HomeAssistant
 from homeassistant.const import Platform
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.typing import ConfigType
 from .coordinator import CWAWeatherCoordinator
+from .restore import EntryStore
 from .const import (
     DOMAIN,
 )
 
 # _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = [Platform.WEATHER, Platform.SENSOR, Platform.AIR_QUALITY]
+PLATFORMS = [Platform.WEATHER, Platform.SENSOR, Platform.AIR_QUALITY, Platform.EVENT, Platform.BINARY_SENSOR]
 CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    # the profiler and the prefetcher are not loaded with the integration, only when set up
+    from .profiling import async_setup_services
+    async_setup_services(hass)
+    return True
+
 async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
     coordinator = CWAWeatherCoordinator(hass, config_entry)
     config_entry.runtime_data = coordinator
 
-    await coordinator.async_config_entry_first_refresh()
+    # the entities come up with the data saved before the restart (unknown for a new entry),
+    # the first refresh runs in the background and doesn't hold up the startup
+    await coordinator.async_restore()
     await hass.config_entries.async_forward_entry_setups(config_entry, PLATFORMS)
+    config_entry.async_create_background_task(hass, coordinator.async_refresh_all(), f"{DOMAIN} first refresh {config_entry.entry_id}")
+    from .prefetch import prefetcher
+    config_entry.async_on_unload(prefetcher.register(coordinator))
 
     config_entry.async_on_unload(config_entry.add_update_listener(_async_update_entry))
     return True
 
 async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
+    # a reload comes up with the latest data
+    await config_entry.runtime_data.store.async_save(config_entry.runtime_data)
     return await hass.config_entries.async_unload_platforms(config_entry, PLATFORMS)
 
+async def async_remove_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    await EntryStore(hass, config_entry.entry_id).async_remove()
+
 async def _async_update_entry(hass: HomeAssistant, config_entry: ConfigEntry):
     await hass.config_entries.async_reload(config_entry.entry_id)
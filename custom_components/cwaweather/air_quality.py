@@ -7,6 +7,7 @@ from homeassistant.helpers.typing import StateType
 from homeassistant.components.air_quality import AirQualityEntity
 from homeassistant.components.sensor import SensorDeviceClass, EntityCategory
 
+from .coordinator import DATASET_AQI
 from .const import (
     DOMAIN,
     ATTRIBUTION_MOENV,
@@ -28,44 +29,50 @@ class MOENVAQIAirQualityEntity(CoordinatorEntity, AirQualityEntity):
     _attr_entity_category = EntityCategory.DIAGNOSTIC
 
     def __init__(self, coordinator):
-        super().__init__(coordinator)
-        self._attr_device_info = self.coordinator.device_info
-        self._attr_unique_id = self.coordinator.config_entry.entry_id
-        self._aqi_data = self.coordinator.data.aqi_station
+        super().__init__(coordinator.aqi, context=frozenset({DATASET_AQI}))
+        self._main = coordinator
+        self._attr_device_info = coordinator.device_info
+        self._attr_unique_id = coordinator.config_entry.entry_id
+        self._aqi_data = self._station()
+
+    def _station(self):
+        return self.coordinator.data.aqi_station if self.coordinator.data else None
 
     def _handle_coordinator_update(self) -> None:
-        if self._aqi_data != self.coordinator.data.aqi_station:
-            self._aqi_data = self.coordinator.data.aqi_station
-            _LOGGER.debug(f"Updating {self.coordinator.name} aqi data")
+        if self._aqi_data != (station := self._station()):
+            self._aqi_data = station
+            _LOGGER.debug(f"Updating {self._main.name} aqi data")
+            self._main.refresh_metrics.state_writes["air_quality"] += 1
             self.async_write_ha_state()
 
+    # unknown until the first AQI refresh, setup does not wait for it
     @property
     def air_quality_index(self) -> StateType:
-        return self._aqi_data.aqi
+        return self._aqi_data.aqi if self._aqi_data else None
 
     @property
     def particulate_matter_2_5(self) -> StateType:
-        return self._aqi_data.pm2_5
+        return self._aqi_data.pm2_5 if self._aqi_data else None
 
     @property
     def particulate_matter_10(self) -> StateType:
-        return self._aqi_data.pm10
+        return self._aqi_data.pm10 if self._aqi_data else None
 
     @property
     def ozone(self) -> StateType:
-        return self._aqi_data.o3
+        return self._aqi_data.o3 if self._aqi_data else None
 
     @property
     def carbon_monoxide(self) -> StateType:
-        return self._aqi_data.co
+        return self._aqi_data.co if self._aqi_data else None
 
     @property
     def sulphur_dioxide(self) -> StateType:
-        return self._aqi_data.so2
+        return self._aqi_data.so2 if self._aqi_data else None
 
     @property
     def state(self) -> StateType:
-        return self._aqi_data.status
+        return self._aqi_data.status if self._aqi_data else None
 
     @property
     def unit_of_measurement(self) -> str:
@@ -73,4 +80,4 @@ class MOENVAQIAirQualityEntity(CoordinatorEntity, AirQualityEntity):
 
     @property
     def extra_state_attributes(self) -> dict:
-        return self.coordinator.data.aqi_extra_attributes
+        return self.coordinator.data.aqi_extra_attributes if self.coordinator.data else None
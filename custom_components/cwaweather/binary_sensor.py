@@ -0,0 +1,105 @@
+import logging
+from dataclasses import dataclass
+from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.components.binary_sensor import BinarySensorDeviceClass, BinarySensorEntity, BinarySensorEntityDescription
+
+from .coordinator import DATASET_WARNING
+from .warning import Hazard
+from .const import (
+    ATTRIBUTION_CWA,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, kw_only=True)
+class WarningBinarySensorEntityDescription(BinarySensorEntityDescription):
+    # the W-C0033-001 phenomena the sensor is on for, any when empty
+    phenomena: frozenset[str] = frozenset()
+
+
+WARNING_TYPES: tuple[WarningBinarySensorEntityDescription, ...] = (
+    WarningBinarySensorEntityDescription(
+        key="warning",
+        translation_key="warning",
+    ),
+    WarningBinarySensorEntityDescription(
+        key="warning_rain",
+        translation_key="warning_rain",
+        phenomena=frozenset({"大雨", "豪雨", "大豪雨", "超大豪雨"}),
+        entity_registry_enabled_default=False,
+    ),
+    WarningBinarySensorEntityDescription(
+        key="warning_wind",
+        translation_key="warning_wind",
+        phenomena=frozenset({"陸上強風"}),
+        entity_registry_enabled_default=False,
+    ),
+    WarningBinarySensorEntityDescription(
+        key="warning_typhoon",
+        translation_key="warning_typhoon",
+        phenomena=frozenset({"颱風"}),
+        entity_registry_enabled_default=False,
+    ),
+    WarningBinarySensorEntityDescription(
+        key="warning_high_temperature",
+        translation_key="warning_high_temperature",
+        phenomena=frozenset({"高溫"}),
+        entity_registry_enabled_default=False,
+    ),
+    WarningBinarySensorEntityDescription(
+        key="warning_low_temperature",
+        translation_key="warning_low_temperature",
+        phenomena=frozenset({"低溫"}),
+        entity_registry_enabled_default=False,
+    ),
+    WarningBinarySensorEntityDescription(
+        key="warning_fog",
+        translation_key="warning_fog",
+        phenomena=frozenset({"濃霧"}),
+        entity_registry_enabled_default=False,
+    ),
+)
+
+
+async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
+    coordinator = config_entry.runtime_data
+    async_add_entities([CWAWarningBinarySensorEntity(coordinator, description) for description in WARNING_TYPES], False)
+
+
+class CWAWarningBinarySensorEntity(CoordinatorEntity, BinarySensorEntity):
+    _attr_has_entity_name = True
+    _attr_attribution = ATTRIBUTION_CWA
+    _attr_device_class = BinarySensorDeviceClass.SAFETY
+
+    def __init__(self, coordinator, description: WarningBinarySensorEntityDescription):
+        super().__init__(coordinator.warning, context=frozenset({DATASET_WARNING}))
+        self._main = coordinator
+        self.entity_description = description
+        self._attr_device_info = coordinator.device_info
+        self._attr_unique_id = f"{coordinator.config_entry.entry_id}-{description.key}"
+        self._hazards = self._own_hazards()
+
+    def _own_hazards(self) -> tuple[Hazard, ...] | None:
+        if (data := self.coordinator.data) is None:
+            return None
+        phenomena = self.entity_description.phenomena
+        return tuple(h for h in data.hazards if not phenomena or h.phenomena in phenomena)
+
+    def _handle_coordinator_update(self) -> None:
+        # the coordinator calls on any change of the entry's hazards, only a change of this sensor's is written
+        if self._hazards != (hazards := self._own_hazards()):
+            self._hazards = hazards
+            self._main.refresh_metrics.state_writes[self.entity_description.key] += 1
+            self.async_write_ha_state()
+
+    @property
+    def is_on(self) -> bool | None:
+        return bool(self._hazards) if self._hazards is not None else None
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        return {"hazards": [h.as_dict() for h in self._hazards or ()]}
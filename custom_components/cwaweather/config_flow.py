@@ -1,4 +1,6 @@
 import re
+import time
+import asyncio
 from homeassistant.config_entries import (
     ConfigFlow,
     ConfigFlowResult,
@@ -7,11 +9,11 @@ from homeassistant.config_entries import (
 )
 import voluptuous as vol
 from homeassistant.helpers import config_validation as cv
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.components import zone
 from .cwa import CWA
 from .moenv import MOENV
 from .datagovtw import DataGovTw
+from .session import async_get_session
 from .const import (
     DOMAIN,
     CONF_API_KEY,
@@ -19,8 +21,9 @@ from .const import (
     CONF_LOCATION,
     CONF_LATITUDE,
     CONF_LONGITUDE,
-    TAIWAN_CITYS_TOWNS,
+    CONF_NATIONAL_FORECAST,
 )
+from .locations import catalog
 from homeassistant.helpers.selector import (
     LocationSelector,
 )
@@ -29,6 +32,10 @@ SELECT_ITEM_TRACK_PREFIX = "tracking: "
 SELECT_ITEM_TRACK_REGEX = r'tracking:\s*(?P<name>.*\S)\s*\((?P<zone>zone\..*)\)'
 SELECT_ITEM_SELECT_ON_MAP = "[Select on map]"
 
+# keys that passed the check recently, reopening the options dialog does not check them again
+KEY_CHECK_TTL = 3600
+_valid_keys: dict[tuple[str, str], float] = {}
+
 
 def zone_info(hass, entity):
     if isinstance(entity, str):
@@ -43,21 +50,37 @@ def _build_schema(hass, is_options_flow: bool = False, show_advanced_options: bo
     for entity in hass.states.async_all(zone.DOMAIN):
         taiwanlocations.append(zone_info(hass, entity))
     taiwanlocations.append(SELECT_ITEM_SELECT_ON_MAP)
-    for k, v in TAIWAN_CITYS_TOWNS.items():
-        taiwanlocations.extend(f"{k}-{vi}" for vi in v[1])
+    taiwanlocations.extend(catalog.options())
 
     return vol.Schema({
         vol.Required(CONF_API_KEY): cv.string,
         vol.Required(CONF_API_KEY_MOENV): cv.string,
         vol.Required(CONF_LOCATION): vol.In(taiwanlocations),
+        vol.Optional(CONF_NATIONAL_FORECAST, default=False): cv.boolean,
     })
 
 
+async def _check_api_key(session, conf, check, api_key):
+    key = (conf, api_key)
+    if (ts := _valid_keys.get(key)) is not None and time.monotonic() - ts < KEY_CHECK_TTL:
+        return True
+    if valid := await check(session, api_key):
+        now = time.monotonic()
+        for k in [k for k, ts in _valid_keys.items() if now - ts >= KEY_CHECK_TTL]:
+            del _valid_keys[k]
+        _valid_keys[key] = now
+    return valid
+
+
 async def async_validate_input(hass, data, errors):
-    session = async_get_clientsession(hass, verify_ssl=False)
-    if not await CWA.check_api_key(session, data[CONF_API_KEY]):
+    session = async_get_session(hass)
+    valid_cwa, valid_moenv = await asyncio.gather(
+        _check_api_key(session, CONF_API_KEY, CWA.check_api_key, data[CONF_API_KEY]),
+        _check_api_key(session, CONF_API_KEY_MOENV, MOENV.check_api_key, data[CONF_API_KEY_MOENV]),
+    )
+    if not valid_cwa:
         errors[CONF_API_KEY] = "invalid_api_key"
-    if not await MOENV.check_api_key(session, data[CONF_API_KEY_MOENV]):
+    if not valid_moenv:
         errors[CONF_API_KEY_MOENV] = "invalid_api_key"
 
     name = data[CONF_LOCATION]
@@ -108,7 +131,7 @@ class CWAWeatherConfigFlow(ConfigFlow, domain=DOMAIN):
         errors = {}
 
         if user_input is not None:
-            session = async_get_clientsession(self.hass, verify_ssl=False)
+            session = async_get_session(self.hass)
             try:
                 res = await DataGovTw.town_village_point_query(session, user_input[CONF_LOCATION][CONF_LATITUDE], user_input[CONF_LOCATION][CONF_LONGITUDE])
                 if res is None:
@@ -158,6 +181,7 @@ class CWAWeatherOptionsFlow(OptionsFlow):
                 CONF_API_KEY: self.config_entry.data.get(CONF_API_KEY, ""),
                 CONF_API_KEY_MOENV: self.config_entry.data.get(CONF_API_KEY_MOENV, ""),
                 CONF_LOCATION: self.config_entry.data.get(CONF_LOCATION, ""),
+                CONF_NATIONAL_FORECAST: self.config_entry.data.get(CONF_NATIONAL_FORECAST, False),
             }
             if (loc := user_input.get(CONF_LOCATION)) is None:
                 user_input[CONF_LOCATION] = SELECT_ITEM_SELECT_ON_MAP
@@ -191,7 +215,7 @@ class CWAWeatherOptionsFlow(OptionsFlow):
             )
 
         else:
-            session = async_get_clientsession(self.hass, verify_ssl=False)
+            session = async_get_session(self.hass)
             try:
                 res = await DataGovTw.town_village_point_query(session, user_input[CONF_LOCATION][CONF_LATITUDE], user_input[CONF_LOCATION][CONF_LONGITUDE])
                 if res is None:
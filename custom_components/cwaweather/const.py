@@ -9,6 +9,7 @@ MANUFACTURER = "CWA Open Weather Data"
 MODEL_NAME = "CWA Weather"
 HOME_URL = "https://github.com/wctang/cwaweather"
 
+from datetime import timedelta
 from homeassistant.const import (
     CONF_API_KEY,
     CONF_LOCATION,
@@ -16,6 +17,10 @@ from homeassistant.const import (
     CONF_LONGITUDE,
 )
 CONF_API_KEY_MOENV = "api_key_moenv"
+CONF_NATIONAL_FORECAST = "national_forecast"
+
+# a sensor value held back by its deadband is still written once the last write is this old
+STATE_MAX_AGE = timedelta(hours=1)
 
 TAIWAN_CITYS_TOWNS = {
     "新北市": (69, ("板橋區", "三重區", "中和區", "永和區", "新莊區", "新店區", "樹林區", "鶯歌區", "三峽區", "淡水區", "汐止區", "瑞芳區", "土城區", "蘆洲區", "五股區", "泰山區", "林口區", "深坑區", "石碇區", "坪林區", "三芝區", "石門區", "八里區", "平溪區", "雙溪區", "貢寮區", "金山區", "萬里區", "烏來區")),
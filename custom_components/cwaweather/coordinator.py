@@ -1,16 +1,17 @@
 import logging
+import asyncio
 import math
-import re
-from pprint import pprint
+import importlib.util
+from abc import ABC, abstractmethod
 from operator import attrgetter
 from datetime import timedelta, datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, replace
 from collections import Counter
+from aiohttp import ClientError
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.event import async_track_state_change_event, Event, EventStateChangedData
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
 from homeassistant.components import weather
 from homeassistant.const import (
@@ -19,6 +20,18 @@ from homeassistant.const import (
 from .cwa import CWA
 from .moenv import MOENV, AQIStation
 from .datagovtw import DataGovTw
+from .session import async_get_session
+from .resilience import CircuitOpenError
+from .metrics import RefreshMetrics
+from .forecast_store import ForecastStore
+from .restore import EntryStore
+from .locations import catalog
+from .national import national
+from .earthquake import feed as earthquake_feed, Report
+from .warning import weather_warnings, Hazard
+from .ratelimit import limiter
+from .session import HOST_CWA
+from .schedule import FORECAST, AQI, REFRESH_INTERVAL, next_refresh
 from .const import (
     DOMAIN,
     MANUFACTURER,
@@ -29,10 +42,40 @@ from .const import (
     CONF_LOCATION,
     CONF_LATITUDE,
     CONF_LONGITUDE,
+    CONF_NATIONAL_FORECAST,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# What an entity reads, passed as its coordinator context. The forecasts (hourly, twice daily) come from the
+# entry's CWAWeatherCoordinator, observations and AQI from its own coordinators with their own schedules.
+# A dataset is only fetched while an entity asks for it, disabled entities are never added and enabling one
+# reloads the entry.
+DATASET_FORECAST = "forecast"
+DATASET_TWICE_DAILY = "twice_daily"
+DATASET_OBSERVATION = "observation"
+DATASET_AQI = "aqi"
+DATASET_EARTHQUAKE = "earthquake"
+DATASET_WARNING = "warning"
+DATASET_CYCLONE = "cyclone"
+DATASET_GRID = "grid"
+DATASETS_ALL = frozenset({DATASET_FORECAST, DATASET_TWICE_DAILY, DATASET_OBSERVATION, DATASET_AQI, DATASET_EARTHQUAKE, DATASET_WARNING, DATASET_CYCLONE, DATASET_GRID})
+
+# numpy is not a requirement of the integration, the datasets computed with it stay off (no entities) without it
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+# The hourly AQI is queried for the nearest sites only (at least this many, up to the one in use).
+# The whole table is fetched again when the position changes, the site set is older than a day,
+# or none of the sites reports an AQI.
+AQI_NEAREST_SITES = 3
+AQI_SITES_MAX_AGE = timedelta(days=1)
+
+# the shared earthquake feed is polled this often, longer while the API key's budget runs low
+EARTHQUAKE_INTERVAL = timedelta(minutes=1)
+
+# forecasts starting longer ago than this are fetched again on every refresh, a publication came late
+FORECAST_STALE = timedelta(hours=6.5)
+
 # https://opendata.cwa.gov.tw/opendatadoc/MFC/A0012-001.pdf
 CWA_WEATHER_SYMBOL_TO_HASS = [
     (weather.ATTR_CONDITION_HAIL, ()),
@@ -130,46 +173,98 @@ def _observe_weather_to_ha_condition(weathers, _now):
     return res
 
 
+def _forecast_number(v):
+    return float(v.replace("<","").replace(">","").replace("=",""))
+
+
+@dataclass(slots=True)
+class ForecastPeriod:
+    """One forecast period, the weather.Forecast dict is only built when an entity asks for it."""
+    time: datetime
+    condition: str = None
+    native_temperature: int = None
+    native_templow: int = None
+    native_apparent_temperature: float = None
+    native_dew_point: float = None
+    humidity: float = None
+    native_wind_speed: float = None
+    wind_bearing: str = None
+    uv_index: float = None
+    precipitation_probability: int = None
+    is_daytime: bool = None
+    cwa_weather: str = None
+    cwa_description: str = None
+    cwa_comfort: str = None
+
+    @staticmethod
+    def from_cwa(fc) -> "ForecastPeriod":
+        p = ForecastPeriod(fc[CWA.ATTR_DataTime if CWA.ATTR_DataTime in fc else CWA.ATTR_StartTime], _forecast_weather_to_ha_condition(fc))
+        if CWA.ATTR_RelativeHumidity in fc:
+            p.humidity = _forecast_number(fc[CWA.ATTR_RelativeHumidity])
+        if CWA.ATTR_ApparentTemperature in fc:
+            p.native_apparent_temperature = _forecast_number(fc[CWA.ATTR_ApparentTemperature])
+        if CWA.ATTR_DewPoint in fc:
+            p.native_dew_point = _forecast_number(fc[CWA.ATTR_DewPoint])
+        if CWA.ATTR_WindSpeed in fc:
+            p.native_wind_speed = _forecast_number(fc[CWA.ATTR_WindSpeed])
+        if CWA.ATTR_UVIndex in fc:
+            p.uv_index = _forecast_number(fc[CWA.ATTR_UVIndex])
+        if CWA.ATTR_ProbabilityOfPrecipitation in fc:
+            p.precipitation_probability = 0 if fc[CWA.ATTR_ProbabilityOfPrecipitation] == '-' else int(fc[CWA.ATTR_ProbabilityOfPrecipitation])
+        if CWA.ATTR_MinTemperature in fc and CWA.ATTR_MaxTemperature in fc:
+            p.native_temperature = int(fc[CWA.ATTR_MaxTemperature])
+            p.native_templow = int(fc[CWA.ATTR_MinTemperature])
+        else:
+            p.native_temperature = int(fc[CWA.ATTR_Temperature])
+        if CWA.ATTR_EndTime in fc:
+            p.is_daytime = fc[CWA.ATTR_EndTime].hour == 18
+        if CWA.ATTR_WindDirection in fc and fc[CWA.ATTR_WindDirection] in CWA_WIND_DIRECTION_TO_HASS:
+            p.wind_bearing = CWA_WIND_DIRECTION_TO_HASS[fc[CWA.ATTR_WindDirection]]
+
+        # extra attributes
+        p.cwa_weather = fc[CWA.ATTR_Weather]
+        p.cwa_description = fc[CWA.ATTR_WeatherDescription]
+        p.cwa_comfort = fc.get(CWA.ATTR_ComfortIndexDescription)
+        return p
+
+    def as_forecast(self) -> weather.Forecast:
+        forcast: weather.Forecast = {
+            weather.ATTR_FORECAST_TIME: self.time,
+            weather.ATTR_FORECAST_CONDITION: self.condition,
+        }
+        for key, attr in _FORECAST_KEYS:
+            if (v := getattr(self, attr)) is not None:
+                forcast[key] = v
+        return forcast
+
+
+_FORECAST_KEYS = (
+    (weather.ATTR_FORECAST_HUMIDITY, "humidity"),
+    (weather.ATTR_FORECAST_NATIVE_APPARENT_TEMP, "native_apparent_temperature"),
+    (weather.ATTR_FORECAST_NATIVE_DEW_POINT, "native_dew_point"),
+    (weather.ATTR_FORECAST_NATIVE_WIND_SPEED, "native_wind_speed"),
+    (weather.ATTR_FORECAST_UV_INDEX, "uv_index"),
+    (weather.ATTR_FORECAST_PRECIPITATION_PROBABILITY, "precipitation_probability"),
+    (weather.ATTR_FORECAST_NATIVE_TEMP, "native_temperature"),
+    (weather.ATTR_FORECAST_NATIVE_TEMP_LOW, "native_templow"),
+    (weather.ATTR_FORECAST_IS_DAYTIME, "is_daytime"),
+    (weather.ATTR_FORECAST_WIND_BEARING, "wind_bearing"),
+    (CWA.ATTR_Weather, "cwa_weather"),
+    (CWA.ATTR_WeatherDescription, "cwa_description"),
+    (CWA.ATTR_ComfortIndexDescription, "cwa_comfort"),
+)
+
+
 def convet_cwa_to_ha_forcast(fc) -> weather.Forecast:
-    def _convert_to(f, k1, fc, k2, is_number = True):
-        if k2 in fc:
-            f[k1] = fc[k2] if not is_number else float(fc[k2].replace("<","").replace(">","").replace("=",""))
-
-    forcast: weather.Forecast = {
-        weather.ATTR_FORECAST_TIME: fc[CWA.ATTR_DataTime if CWA.ATTR_DataTime in fc else CWA.ATTR_StartTime],
-        weather.ATTR_FORECAST_CONDITION: _forecast_weather_to_ha_condition(fc),
-    }
-
-    _convert_to(forcast, weather.ATTR_FORECAST_HUMIDITY, fc, CWA.ATTR_RelativeHumidity)
-    _convert_to(forcast, weather.ATTR_FORECAST_NATIVE_APPARENT_TEMP, fc, CWA.ATTR_ApparentTemperature)
-    _convert_to(forcast, weather.ATTR_FORECAST_NATIVE_DEW_POINT, fc, CWA.ATTR_DewPoint)
-    _convert_to(forcast, weather.ATTR_FORECAST_NATIVE_WIND_SPEED, fc, CWA.ATTR_WindSpeed)
-    _convert_to(forcast, weather.ATTR_FORECAST_UV_INDEX, fc, CWA.ATTR_UVIndex)
-    if CWA.ATTR_ProbabilityOfPrecipitation in fc:
-        forcast[weather.ATTR_FORECAST_PRECIPITATION_PROBABILITY] = 0 if fc[CWA.ATTR_ProbabilityOfPrecipitation] == '-' else int(fc[CWA.ATTR_ProbabilityOfPrecipitation])
-    if CWA.ATTR_MinTemperature in fc and CWA.ATTR_MaxTemperature in fc:
-        forcast[weather.ATTR_FORECAST_NATIVE_TEMP] = int(fc[CWA.ATTR_MaxTemperature])
-        forcast[weather.ATTR_FORECAST_NATIVE_TEMP_LOW] = int(fc[CWA.ATTR_MinTemperature])
-    else:
-        forcast[weather.ATTR_FORECAST_NATIVE_TEMP] = int(fc[CWA.ATTR_Temperature])
-    if CWA.ATTR_EndTime in fc:
-        forcast[weather.ATTR_FORECAST_IS_DAYTIME] = fc[CWA.ATTR_EndTime].hour == 18
-    if CWA.ATTR_WindDirection in fc and fc[CWA.ATTR_WindDirection] in CWA_WIND_DIRECTION_TO_HASS:
-        forcast[weather.ATTR_FORECAST_WIND_BEARING] = CWA_WIND_DIRECTION_TO_HASS[fc[CWA.ATTR_WindDirection]]
-
-    # extra attributes
-    forcast[CWA.ATTR_Weather] = fc[CWA.ATTR_Weather]
-    forcast[CWA.ATTR_WeatherDescription] = fc[CWA.ATTR_WeatherDescription]
-    if CWA.ATTR_ComfortIndexDescription in fc:
-        forcast[CWA.ATTR_ComfortIndexDescription] = fc[CWA.ATTR_ComfortIndexDescription]
-    return forcast
+    return ForecastPeriod.from_cwa(fc).as_forecast()
 
 
 @dataclass
 class CWAWeatherData:
-    hourly: list[weather.Forecast] = None
-    twice_daily: list[weather.Forecast] = None
+    hourly: ForecastStore = None
+    twice_daily: ForecastStore = None
     forecast_time: datetime = None
+    forecast_fetched: datetime = None
 
     condition: str = None
     native_temperature: float = None
@@ -179,14 +274,86 @@ class CWAWeatherData:
     native_wind_speed: float = None
     wind_bearing: float = None
     uv_index: float = None
+    forecast_attributes: dict = None
+    # where the "from now on" forecasts of every kind start, moving on wakes the forecast subscribers
+    forecast_views: tuple = None
+
+
+@dataclass
+class ObservationData:
+    condition: str = None
+    native_temperature: float = None
+    humidity: float = None
     native_pressure: float = None
+    station_attributes: dict = None
+
 
+@dataclass
+class AQIData:
     aqi_publishtime: datetime = None
     aqi_station: AQIStation = None
     aqi_extra_attributes: dict = None
 
 
+@dataclass
+class EarthquakeData:
+    # the newest sequence number of the shared feed, the event entities take the reports after the one they saw
+    seq: int = 0
+    # the newest report felt in the entry's county
+    felt: Report = None
+
+
+@dataclass
+class WarningData:
+    # the hazards in effect for the entry's county and town
+    hazards: tuple[Hazard, ...] = ()
+
+
+@dataclass
+class CycloneData:
+    # the storm coming closest to the entry's position, see cyclone.Approach
+    storm: str = None
+    distance: float = None
+    closest_distance: float = None
+    closest_time: datetime = None
+    eta: datetime = None
+
+
+@dataclass
+class GridData:
+    # interpolated at the entry's position from the temperature analysis grid
+    native_temperature: float = None
+    issued: datetime = None
+
+
+# how far back the "from now on" forecasts of every kind start
+FORECAST_CUTS = {"hourly": timedelta(minutes=45), "twice_daily": timedelta(hours=8), "daily": timedelta(hours=8)}
+
+
+async def _async_import(hass: HomeAssistant, name):
+    # the typhoon and grid subsystems (and numpy with them) are loaded on first use, in the executor
+    return await hass.async_add_executor_job(importlib.import_module, f".{name}", __package__)
+
+
+def _restore_periods(rows) -> ForecastStore:
+    return ForecastStore([ForecastPeriod(**{**row, "time": datetime.fromisoformat(row["time"])}) for row in rows])
+
+
+def _forecast_store(data: CWAWeatherData, kind) -> ForecastStore | None:
+    if kind == "hourly":
+        return data.hourly
+    if data.twice_daily is None:
+        return None
+    return data.twice_daily if kind == "twice_daily" else data.twice_daily.daytime()
+
+
+def _changed_fields(old: dict, values: dict) -> frozenset[str]:
+    # every refresh assigns new objects instead of mutating the old ones, a shallow compare is enough
+    return frozenset(k for k, v in values.items() if k not in old or (old[k] is not v and old[k] != v))
+
+
 class CWAWeatherCoordinator(DataUpdateCoordinator[CWAWeatherData]):
+    dataset = DATASET_FORECAST
     native_temperature_unit = weather.UnitOfTemperature.CELSIUS
     native_wind_speed_unit = weather.UnitOfSpeed.METERS_PER_SECOND
     native_pressure_unit = weather.UnitOfPressure.HPA
@@ -194,10 +361,10 @@ class CWAWeatherCoordinator(DataUpdateCoordinator[CWAWeatherData]):
 
     def __init__(self, hass: HomeAssistant, config_entry: ConfigEntry):
         name = config_entry.title
-        super().__init__(hass, _LOGGER, config_entry=config_entry, name=name, update_interval=timedelta(minutes=10)) # check every 10 minutes
+        # checked every 10 minutes, listeners are only called when the forecasts, the current period or a view moved on
+        super().__init__(hass, _LOGGER, config_entry=config_entry, name=name, update_interval=REFRESH_INTERVAL, always_update=False)
         _LOGGER.info("%s, %s, %s", name, config_entry.entry_id, config_entry.data)
 
-        self.extra_attributes_weather = {}
         self.device_info = DeviceInfo(
             name=name,
             entry_type=DeviceEntryType.SERVICE,
@@ -207,9 +374,17 @@ class CWAWeatherCoordinator(DataUpdateCoordinator[CWAWeatherData]):
             configuration_url=HOME_URL,
         )
         self._force_refresh = False
+        self.store = EntryStore(hass, config_entry.entry_id)
+        # forecasts from the shared national index (F-D0047-093) instead of a per county request
+        self._national = config_entry.data.get(CONF_NATIONAL_FORECAST, False)
+        self._forecast_town = None
+        self.refresh_metrics = RefreshMetrics()
+        # names of the CWAWeatherData fields the last refresh changed,
+        # entities skip their state write when none of theirs is in it
+        self.changed_fields: frozenset[str] = frozenset()
+        self._field_values = {}
 
         self._api_key = config_entry.data.get(CONF_API_KEY)
-        self._api_key_moenv = config_entry.data.get(CONF_API_KEY_MOENV)
 
         location = config_entry.data.get(CONF_LOCATION)
         if location and location.startswith("zone."):
@@ -226,164 +401,482 @@ class CWAWeatherCoordinator(DataUpdateCoordinator[CWAWeatherData]):
         if self._latitude and self._longitude:
             self._city = None
             self._town = None
-        elif (locs := re.split(r"[\s\,\.\\\/\-\_\~\|]+", location)):
-            self._city = locs[0]
-            self._town = locs[1]
+        elif (town := catalog.resolve(location)) is not None:
+            self._city = town.county
+            self._town = town.name
         else:
             raise Exception(f"Cant find tracking zone entity: {location}")
 
+        self.observation = CWAObservationCoordinator(self)
+        self.aqi = MOENVAQICoordinator(self)
+        self.earthquake = CWAEarthquakeCoordinator(self)
+        self.warning = CWAWarningCoordinator(self)
+        self.cyclone = CWACycloneCoordinator(self)
+        self.grid = CWAGridCoordinator(self)
+
+
+    @property
+    def coordinators(self) -> tuple[DataUpdateCoordinator, ...]:
+        return (self, self.observation, self.aqi, self.earthquake, self.warning, self.cyclone, self.grid)
+
+
+    def coordinators_for(self, datasets) -> list[DataUpdateCoordinator]:
+        """The coordinators an entity reading `datasets` listens to, the one it is bound to first."""
+        res = [c for c, ds in ((self.aqi, DATASET_AQI), (self.observation, DATASET_OBSERVATION), (self.earthquake, DATASET_EARTHQUAKE), (self.warning, DATASET_WARNING), (self.cyclone, DATASET_CYCLONE), (self.grid, DATASET_GRID)) if ds in datasets]
+        if not res or not datasets.isdisjoint({DATASET_FORECAST, DATASET_TWICE_DAILY}):
+            res.append(self)
+        return res
+
+
+    async def async_refresh_all(self):
+        # the forecast first, a town entry only knows its position from it
+        await self.async_refresh()
+        await asyncio.gather(*(c.async_refresh() for c in self.coordinators[1:]))
+
+
+    def force_refresh(self):
+        """Refetch every dataset on the next refresh, regardless of issuance times."""
+        self._force_refresh = True
+        self.aqi.force_refresh()
+
+
+    async def async_restore(self) -> bool:
+        """Take the data saved before the restart, see restore.py. False when nothing saved applies."""
+        if (stored := await self.store.async_load()) is None:
+            return False
+        pos = stored["position"]
+        if self._latitude and self._longitude:
+            same = (pos["latitude"], pos["longitude"]) == (self._latitude, self._longitude)
+        else:
+            same = (pos["county"], pos["town"]) == (self._city, self._town)
+        if not same:
+            _LOGGER.debug("%s: location changed since the data was saved", self.name)
+            return False
+        self._city, self._town = pos["county"], pos["town"]
+        self._latitude, self._longitude = pos["latitude"], pos["longitude"]
+
+        if (fc := stored.get("forecast")) is not None and fc["hourly"]:
+            data = CWAWeatherData(hourly=_restore_periods(fc["hourly"]))
+            if fc["twice_daily"]:
+                data.twice_daily = _restore_periods(fc["twice_daily"])
+            data.forecast_time = data.hourly[0].time
+            # a forecast of the current publication is not fetched again
+            if fc.get("fetched"):
+                data.forecast_fetched = datetime.fromisoformat(fc["fetched"])
+            self._update_current(data, datetime.now().astimezone())
+            self._forecast_town = (self._city, self._town)
+            self.data = data
+        if (obs := stored.get("observation")) is not None:
+            self.observation.data = ObservationData(**obs)
+        if (aqi := stored.get("aqi")) is not None:
+            self.aqi.data = AQIData(datetime.fromisoformat(aqi["publishtime"]), AQIStation(**aqi["station"]), aqi["attributes"])
+        _LOGGER.debug("%s: restored %s", self.name, ", ".join(k for k in ("forecast", "observation", "aqi") if k in stored))
+        return True
+
+
+    def current(self, name):
+        """A current value, observed when the station reports it, otherwise from the forecasts. None before any data."""
+        if (obs := self.observation.data) is not None and (v := getattr(obs, name, None)) is not None:
+            return v
+        return getattr(self.data, name, None)
+
+
+    @property
+    def extra_attributes_weather(self) -> dict:
+        obs = self.observation.data
+        forecast = self.data.forecast_attributes if self.data is not None else None
+        return {**(forecast or {}), **(obs.station_attributes if obs else {})}
+
 
     async def _watched_entity_change(self, event: Event[EventStateChangedData]) -> None:
         newstate = event.data["new_state"]
         if newstate.attributes.get("latitude") == self._latitude and newstate.attributes.get("longitude") == self._longitude:
             return
 
-        _LOGGER.info("update location: ", newstate)
+        _LOGGER.info("update location: %s", newstate)
         self._latitude = newstate.attributes.get("latitude")
         self._longitude = newstate.attributes.get("longitude")
         self._city = None
         self._town = None
-        await self.async_refresh()
+        await self.async_refresh_all()
 
 
-    async def _async_update_data(self):
-        data = self.data or CWAWeatherData()
+    def needed_datasets(self) -> frozenset[str]:
+        # the platforms are set up before the first refresh, the contexts of the entities tell what they read.
+        # Without any (refreshed before the platforms are set up, the weather entity always listens) every dataset is.
+        if not (contexts := list(self.async_contexts())):
+            return DATASETS_ALL
+        return frozenset().union(*contexts)
+
+
+    def wants_twice_daily(self) -> bool:
+        return DATASET_TWICE_DAILY in self.needed_datasets()
 
-        _now = datetime.now().astimezone()
-        session = async_get_clientsession(self.hass, verify_ssl=False)
 
+    async def _async_update_data(self):
+        self.changed_fields = frozenset()
+        with self.refresh_metrics.refresh():
+            needs = self.needed_datasets()
+            # a new object every refresh, the coordinator compares it with the last one
+            data = replace(self.data) if self.data is not None else CWAWeatherData()
+
+            _now = datetime.now().astimezone()
+            # at the phase of the entry, not in lockstep with the others
+            self.update_interval = next_refresh(f"{self.config_entry.entry_id}-{DATASET_FORECAST}", _now)
+            session = async_get_session(self.hass)
+
+            with self.refresh_metrics.stage("location"):
+                if not await self._update_location(session):
+                    return data
+
+            await self._run_stage("forecast", self._update_forecast(session, data, _now, DATASET_TWICE_DAILY in needs), required=data.hourly is None)
+            with self.refresh_metrics.stage("current"):
+                self._update_current(data, _now)
+            self._diff(data)
+            if self.changed_fields:
+                self.store.schedule_save(self)
+            return data
+
+
+    def _diff(self, data: CWAWeatherData):
+        values = {f.name: getattr(data, f.name) for f in fields(CWAWeatherData)}
+        self.changed_fields = _changed_fields(self._field_values, values)
+        self._field_values = values
+        self.refresh_metrics.changed.update(self.changed_fields)
+
+
+    async def _run_stage(self, stage, coro, required = False):
+        # a failing dataset keeps its last values instead of failing the whole refresh
+        try:
+            with self.refresh_metrics.stage(stage):
+                await coro
+        except (ClientError, asyncio.TimeoutError, CircuitOpenError) as err:
+            if required:
+                raise UpdateFailed(f"{stage}: {err!r}") from err
+            _LOGGER.warning("%s: %s refresh failed, keep last data: %r", self.name, stage, err)
+
+
+    async def _update_location(self, session) -> bool:
         if (self._city is None or self._town is None) and self._latitude and self._longitude:
             # get city and town by lat and lon
             res = await DataGovTw.town_village_point_query(session, self._latitude, self._longitude)
-            if res:
-                self._city = res[0]
-                self._town = res[1]
+            if res and (town := catalog.lookup(*res)) is not None:
+                self._city = town.county
+                self._town = town.name
             else:
                 _LOGGER.warning(f"Cant get location from lat,long: {self._latitude}, {self._longitude}")
-                return data
+                return False
 
             self._force_refresh = True
+        return True
+
 
-        # refresh forecasts
-        # 發布時機：每日 05:30、11:30、17:30、23:30,  更新頻率：每 6 小時
-        if self._force_refresh or data.forecast_time is None or _now > (data.forecast_time + timedelta(hours=5.8)):
+    async def _update_forecast(self, session, data: CWAWeatherData, _now, twice_daily = True):
+        # refresh forecasts once a publication was served after the last fetch, see schedule.FORECAST
+        issued = (self._force_refresh or data.forecast_fetched is None or data.forecast_fetched < FORECAST.last_served(_now)
+                  or _now > data.forecast_time + FORECAST_STALE)
+        if issued or self._forecast_town != (self._city, self._town):
             # get forecast by city-town
-            res = await CWA.get_forcast_hourly(session, self._api_key, self._city, self._town)
+            res = await self._get_forecast(session, False, issued)
             if self._latitude is None and self._longitude is None:
                 self._latitude = res["Latitude"]
                 self._longitude = res["Longitude"]
                 _LOGGER.info(f"Update location '{self._city}-{self._town}' positon as ({self._latitude},{self._longitude})")
-            data.hourly = [convet_cwa_to_ha_forcast(fc) for fc in res["Forecasts"]]
-            data.forecast_time = data.hourly[0][weather.ATTR_FORECAST_TIME]
-
-            res = await CWA.get_forcast_twice_daily(session, self._api_key, self._city, self._town)
-            data.twice_daily = [convet_cwa_to_ha_forcast(fc) for fc in res["Forecasts"]]
+            if (town := catalog.lookup(self._city, self._town)) is not None and town.code is None:
+                town.code = res.get("Geocode")
+            hourly = ForecastStore([ForecastPeriod.from_cwa(fc) for fc in res["Forecasts"]])
+
+            if twice_daily:
+                res = await self._get_forecast(session, True, issued)
+                data.twice_daily = ForecastStore([ForecastPeriod.from_cwa(fc) for fc in res["Forecasts"]])
+            data.hourly = hourly
+            data.forecast_time = data.hourly[0].time
+            data.forecast_fetched = _now
             self._force_refresh = False
-            _LOGGER.debug(f"refresh forecasts '{self._city}-{self._town}', {_now}, {data.hourly[0][weather.ATTR_FORECAST_TIME]}")
-
-        hourly = next(f for f in data.hourly if f[weather.ATTR_FORECAST_TIME] > (_now - timedelta(hours=1)))
-        daily = next(f for f in data.twice_daily if f[weather.ATTR_FORECAST_TIME] > (_now - timedelta(hours=12)))
-
-        data.condition = hourly[weather.ATTR_FORECAST_CONDITION]
-        data.native_temperature = hourly[weather.ATTR_FORECAST_NATIVE_TEMP]
-        data.native_apparent_temperature = hourly[weather.ATTR_FORECAST_NATIVE_APPARENT_TEMP]
-        data.humidity = hourly[weather.ATTR_FORECAST_HUMIDITY]
-        data.native_dew_point = hourly[weather.ATTR_FORECAST_NATIVE_DEW_POINT]
-        if weather.ATTR_FORECAST_NATIVE_WIND_SPEED in hourly:
-            data.native_wind_speed = hourly[weather.ATTR_FORECAST_NATIVE_WIND_SPEED]
-            data.wind_bearing = hourly[weather.ATTR_FORECAST_WIND_BEARING]
-        if weather.ATTR_FORECAST_UV_INDEX in daily:
-            data.uv_index = daily[weather.ATTR_FORECAST_UV_INDEX]
-
-        self.extra_attributes_weather["forecast_weather"] = hourly[CWA.ATTR_Weather]
-        # self.extra_attributes_weather[CWA.ATTR_WeatherCode] = hourly[CWA.ATTR_WeatherCode]
-        self.extra_attributes_weather["forecast_weather_description"] = hourly[CWA.ATTR_WeatherDescription]
-        if CWA.ATTR_ComfortIndexDescription in hourly:
-            self.extra_attributes_weather["forecast_comfort_description"] = hourly[CWA.ATTR_ComfortIndexDescription]
+            self._forecast_town = (self._city, self._town)
+            _LOGGER.debug(f"refresh forecasts '{self._city}-{self._town}', {_now}, {data.hourly[0].time}")
+
+
+    async def _get_forecast(self, session, twice_daily, issued):
+        if self._national and self._town is not None:
+            # a town change alone is answered from the index, a new issuance fetches it again
+            if (res := await national.town(self.hass, session, self._api_key, self._city, self._town, twice_daily, refresh=issued)) is not None:
+                return res
+            _LOGGER.warning("%s-%s not in the national forecasts, fetch its county", self._city, self._town)
+        if twice_daily:
+            return await CWA.get_forcast_twice_daily(session, self._api_key, self._city, self._town)
+        return await CWA.get_forcast_hourly(session, self._api_key, self._city, self._town)
+
+
+    def _update_current(self, data: CWAWeatherData, _now):
+        hourly = data.hourly.at(_now - timedelta(hours=1))
+
+        data.condition = hourly.condition
+        data.native_temperature = hourly.native_temperature
+        data.native_apparent_temperature = hourly.native_apparent_temperature
+        data.humidity = hourly.humidity
+        data.native_dew_point = hourly.native_dew_point
+        if hourly.native_wind_speed is not None:
+            data.native_wind_speed = hourly.native_wind_speed
+            data.wind_bearing = hourly.wind_bearing
+        if data.twice_daily is not None and (daily := data.twice_daily.at(_now - timedelta(hours=12))).uv_index is not None:
+            data.uv_index = daily.uv_index
+
+        attrs = {}
+        attrs["forecast_weather"] = hourly.cwa_weather
+        attrs["forecast_weather_description"] = hourly.cwa_description
+        if hourly.cwa_comfort is not None:
+            attrs["forecast_comfort_description"] = hourly.cwa_comfort
+        data.forecast_attributes = attrs
+        data.forecast_views = tuple(store.index(_now - FORECAST_CUTS[kind]) if (store := _forecast_store(data, kind)) else None for kind in FORECAST_CUTS)
 
-        if self._latitude and self._longitude:
-            # get observation by lat and lon
-            sts: list[CWA.Station] = await CWA.get_observation_stations(session, self._api_key)
-            for st in sts:
-                st._distance = math.sqrt(math.pow(st.StationLatitude - self._latitude, 2) + math.pow(st.StationLongitude - self._longitude, 2))
-
-            weathers = []
-            has_station = False
-            has_persure = False
-            for st in sorted(sts, key=attrgetter("_distance")):
-                if st._distance > 0.3:
-                    break
 
+    def get_forcasts(self, kind) -> list[weather.Forecast] | None:
+        if self.data is None or (store := _forecast_store(self.data, kind)) is None:
+            return None
+        return store.since(datetime.now().astimezone() - FORECAST_CUTS[kind])
+
+
+class _DatasetCoordinator(DataUpdateCoordinator, ABC):
+    """A dataset on its own schedule, at the position of the entry's CWAWeatherCoordinator.
+    Listeners are only called when the data changed, a failing fetch keeps the last data."""
+    dataset: str
+    interval: timedelta = REFRESH_INTERVAL
+
+    def __init__(self, main: CWAWeatherCoordinator):
+        self.main = main
+        super().__init__(main.hass, _LOGGER, config_entry=main.config_entry, name=f"{main.name} {self.dataset}", update_interval=self.interval, always_update=False)
+        self.refresh_metrics = RefreshMetrics()
+        self.changed_fields: frozenset[str] = frozenset()
+        self._field_values = {}
+        self._force = False
+
+    def force_refresh(self):
+        self._force = True
+
+    def wanted(self) -> bool:
+        """Whether an entity reads the dataset, every one before the platforms are set up, see needed_datasets."""
+        return self.dataset in self.main.needed_datasets() or any(self.dataset in ctx for ctx in self.async_contexts())
+
+    async def _async_update_data(self):
+        self.changed_fields = frozenset()
+        with self.refresh_metrics.refresh():
+            if not (self.main._latitude and self.main._longitude):
+                return self.data
+            if not self.wanted():
+                return self.data
+            _now = datetime.now().astimezone()
+            self.update_interval = next_refresh(f"{self.config_entry.entry_id}-{self.dataset}", _now, self.interval)
+            try:
+                with self.refresh_metrics.stage(self.dataset):
+                    data = await self._fetch(async_get_session(self.hass), _now)
+            except (ClientError, asyncio.TimeoutError, CircuitOpenError) as err:
+                if self.data is None:
+                    raise UpdateFailed(f"{self.dataset}: {err!r}") from err
+                _LOGGER.warning("%s: %s refresh failed, keep last data: %r", self.main.name, self.dataset, err)
+                return self.data
+
+            values = {f.name: getattr(data, f.name) for f in fields(data)}
+            self.changed_fields = _changed_fields(self._field_values, values)
+            self._field_values = values
+            self.refresh_metrics.changed.update(self.changed_fields)
+            if self.changed_fields:
+                self.main.store.schedule_save(self.main)
+            return data
+
+    @abstractmethod
+    async def _fetch(self, session, _now):
+        """The data at the entry's position, a ClientError, TimeoutError or CircuitOpenError keeps the last one."""
+
+
+class CWAObservationCoordinator(_DatasetCoordinator):
+    dataset = DATASET_OBSERVATION
+    # stations report every 10 minutes
+    interval = REFRESH_INTERVAL
+
+    async def _fetch(self, session, _now) -> ObservationData:
+        # get observation by lat and lon
+        latitude, longitude = self.main._latitude, self.main._longitude
+        sts: list[CWA.Station] = await CWA.get_observation_stations(session, self.main._api_key)
+        for st in sts:
+            st._distance = math.sqrt(math.pow(st.StationLatitude - latitude, 2) + math.pow(st.StationLongitude - longitude, 2))
+
+        data = ObservationData()
+        weathers = []
+        attrs = {}
+        has_station = False
+        has_persure = False
+        for st in sorted(sts, key=attrgetter("_distance")):
+            if st._distance > 0.3:
+                break
+
+            if st.Weather is not None:
+                weathers.append(st.Weather)
+
+            if not has_persure and st.AirPressure is not None:
+                has_persure = True
+                data.native_pressure = st.AirPressure
+
+            if not has_station and st.AirTemperature is not None and st.RelativeHumidity is not None:
+                has_station = True
+                data.native_temperature = st.AirTemperature
+                data.humidity = st.RelativeHumidity
+
+                attrs["station_name"] = st.StationName
+                attrs["station_id"] = st.StationId
+                attrs["latitude"] = st.StationLatitude
+                attrs["longitude"] = st.StationLongitude
+                attrs["station_air_temperature"] = st.AirTemperature
+                attrs["station_relative_humidity"] = st.RelativeHumidity
+                if st.ObsTime is not None:
+                    attrs["station_obs_time"] = st.ObsTime
                 if st.Weather is not None:
-                    weathers.append(st.Weather)
-
-                if not has_persure and st.AirPressure is not None:
-                    has_persure = True
-                    data.native_pressure = st.AirPressure
-
-                if not has_station and st.AirTemperature is not None and st.RelativeHumidity is not None:
-                    has_station = True
-                    # _LOGGER.debug(f"refresh observation {self._location}")
-                    data.native_temperature = st.AirTemperature
-                    data.humidity = st.RelativeHumidity
-
-                    self.extra_attributes_weather["station_name"] = st.StationName
-                    self.extra_attributes_weather["station_id"] = st.StationId
-                    self.extra_attributes_weather["latitude"] = st.StationLatitude
-                    self.extra_attributes_weather["longitude"] = st.StationLongitude
-                    self.extra_attributes_weather["station_air_temperature"] = st.AirTemperature
-                    self.extra_attributes_weather["station_relative_humidity"] = st.RelativeHumidity
-                    if st.ObsTime is not None:
-                        self.extra_attributes_weather["station_obs_time"] = st.ObsTime
-                    if st.Weather is not None:
-                        self.extra_attributes_weather["station_weather"] = st.Weather
-
-            self.extra_attributes_weather["station_weathers"] = ",".join(weathers)
-            condition = _observe_weather_to_ha_condition(weathers, _now)
-            if condition:
-                if condition == weather.ATTR_CONDITION_SUNNY:
-                    if _now.hour >= 18 or _now.hour <= 5:
-                        condition = weather.ATTR_CONDITION_CLEAR_NIGHT
-                data.condition = condition
-
-            if data.aqi_station is None or _now > data.aqi_publishtime + timedelta(hours=1.1):
-                sts: list[AQIStation] = await MOENV.get_aqi_hourly(session, self._api_key_moenv)
-                for st in sts:
-                    st._distance = math.sqrt(math.pow(float(st.latitude) - self._latitude, 2) + math.pow(float(st.longitude) - self._longitude, 2))
-
-                for st in sorted(sts, key=attrgetter("_distance")):
-                    if st.aqi is not None:
-                        data.aqi_station = st
-                        data.aqi_publishtime = datetime.strptime(st.publishtime, '%Y/%m/%d %H:%M:%S').astimezone()
-                        _LOGGER.debug(f"refresh aqi {_now}, {data.aqi_publishtime}")
-
-                        data.aqi_extra_attributes = data.aqi_extra_attributes or {}
-                        data.aqi_extra_attributes["siteid"] = st.siteid
-                        data.aqi_extra_attributes["sitename"] = st.sitename
-                        data.aqi_extra_attributes["county"] = st.county
-                        data.aqi_extra_attributes["latitude"] = st.latitude
-                        data.aqi_extra_attributes["longitude"] = st.longitude
-                        data.aqi_extra_attributes["publishtime"] = st.publishtime
-                        data.aqi_extra_attributes["pollutant"] = st.pollutant
-                        data.aqi_extra_attributes["station_aqi"] = st.aqi
-                        data.aqi_extra_attributes["station_pm25"] = st.pm2_5
-                        data.aqi_extra_attributes["station_pm10"] = st.pm10
-                        break
+                    attrs["station_weather"] = st.Weather
+
+        attrs["station_weathers"] = ",".join(weathers)
+        data.station_attributes = attrs
+        condition = _observe_weather_to_ha_condition(weathers, _now)
+        if condition:
+            if condition == weather.ATTR_CONDITION_SUNNY:
+                if _now.hour >= 18 or _now.hour <= 5:
+                    condition = weather.ATTR_CONDITION_CLEAR_NIGHT
+            data.condition = condition
         return data
 
 
-    def get_forcasts(self, kind) -> list[weather.Forecast] | None:
-        _now = datetime.now().astimezone()
-        if kind == "hourly":
-            if self.data.hourly is not None:
-                return [f for f in self.data.hourly if f[weather.ATTR_FORECAST_TIME] >= (_now - timedelta(minutes=45))]
+class MOENVAQICoordinator(_DatasetCoordinator):
+    dataset = DATASET_AQI
+
+    def __init__(self, main: CWAWeatherCoordinator):
+        # checked every 10 minutes, fetched once the next hourly publication is served
+        super().__init__(main)
+        self._api_key = main.config_entry.data.get(CONF_API_KEY_MOENV)
+        self._sites: tuple[str, ...] = ()
+        self._sites_key = None
+        self._sites_time = None
+
+    async def _fetch(self, session, _now) -> AQIData:
+        data = self.data or AQIData()
+        if not (self._force or data.aqi_station is None or data.aqi_publishtime < AQI.latest(_now)):
+            return data
+        self._force = False
+        latitude, longitude = self.main._latitude, self.main._longitude
+        key = (latitude, longitude)
+        sts: list[AQIStation] = None
+        if self._sites and self._sites_key == key and _now < self._sites_time + AQI_SITES_MAX_AGE:
+            sts = await MOENV.get_aqi_hourly(session, self._api_key, self._sites)
+            if not any(st.aqi is not None for st in sts):
+                sts = None
+        if full := sts is None:
+            sts = await MOENV.get_aqi_hourly(session, self._api_key)
+            self._sites_key = key
+            self._sites_time = _now
+        for st in sts:
+            st._distance = math.sqrt(math.pow(float(st.latitude) - latitude, 2) + math.pow(float(st.longitude) - longitude, 2))
+
+        sts.sort(key=attrgetter("_distance"))
+        for i, st in enumerate(sts):
+            if st.aqi is not None:
+                if full:
+                    self._sites = tuple(s.siteid for s in sts[:max(i + 1, AQI_NEAREST_SITES)] if s.siteid)
+                data = replace(data, aqi_station=st, aqi_publishtime=datetime.strptime(st.publishtime, '%Y/%m/%d %H:%M:%S').astimezone())
+                _LOGGER.debug(f"refresh aqi {_now}, {data.aqi_publishtime}")
+
+                data.aqi_extra_attributes = {}
+                data.aqi_extra_attributes["siteid"] = st.siteid
+                data.aqi_extra_attributes["sitename"] = st.sitename
+                data.aqi_extra_attributes["county"] = st.county
+                data.aqi_extra_attributes["latitude"] = st.latitude
+                data.aqi_extra_attributes["longitude"] = st.longitude
+                data.aqi_extra_attributes["publishtime"] = st.publishtime
+                data.aqi_extra_attributes["pollutant"] = st.pollutant
+                data.aqi_extra_attributes["station_aqi"] = st.aqi
+                data.aqi_extra_attributes["station_pm25"] = st.pm2_5
+                data.aqi_extra_attributes["station_pm10"] = st.pm10
+                break
+        return data
 
-        elif kind == "twice_daily":
-            if self.data.twice_daily is not None:
-                return [f for f in self.data.twice_daily if f[weather.ATTR_FORECAST_TIME] >= (_now - timedelta(hours=8))]
 
-        elif kind == "daily":
-            if self.data.twice_daily is not None:
-                return [f for f in self.data.twice_daily if f[weather.ATTR_FORECAST_TIME] >= (_now - timedelta(hours=8)) and f[weather.ATTR_FORECAST_IS_DAYTIME]]
+class CWAEarthquakeCoordinator(_DatasetCoordinator):
+    dataset = DATASET_EARTHQUAKE
 
-        return None
+    @property
+    def interval(self) -> timedelta:
+        # a background dataset, see ratelimit.BACKGROUND_DATASETS
+        return EARTHQUAKE_INTERVAL * limiter.interval_scale(self.main._api_key, HOST_CWA)
+
+    async def _fetch(self, session, _now) -> EarthquakeData:
+        seq = await earthquake_feed.async_update(session, self.main._api_key)
+        if self.data is not None and self.data.seq == seq:
+            return self.data
+        return EarthquakeData(seq, earthquake_feed.felt(self.main._city))
+
+
+class CWAWarningCoordinator(_DatasetCoordinator):
+    dataset = DATASET_WARNING
+
+    @property
+    def interval(self) -> timedelta:
+        return REFRESH_INTERVAL * limiter.interval_scale(self.main._api_key, HOST_CWA)
+
+    async def _fetch(self, session, _now) -> WarningData:
+        index = await weather_warnings.async_update(session, self.main._api_key)
+        hazards = index.active(self.main._city, self.main._town, _now) if self.main._city else ()
+        if self.data is not None and self.data.hazards == hazards:
+            return self.data
+        return WarningData(hazards)
+
+
+class CWACycloneCoordinator(_DatasetCoordinator):
+    dataset = DATASET_CYCLONE
+
+    def __init__(self, main: CWAWeatherCoordinator):
+        super().__init__(main)
+        self.tracker = None     # cyclone.tracker, loaded on the first fetch
+
+    def wanted(self) -> bool:
+        return HAS_NUMPY and super().wanted()
+
+    @property
+    def interval(self) -> timedelta:
+        return REFRESH_INTERVAL * limiter.interval_scale(self.main._api_key, HOST_CWA)
+
+    async def _fetch(self, session, _now) -> CycloneData:
+        key = self.config_entry.entry_id
+        if (tracker := self.tracker) is None:
+            tracker = self.tracker = (await _async_import(self.hass, "cyclone")).tracker
+            # the position stays in the shared tracker until the entry is unloaded
+            self.config_entry.async_on_unload(lambda: tracker.untrack(key))
+        tracker.locate(key, self.main._latitude, self.main._longitude)
+        await tracker.async_update(session, self.main._api_key)
+        if (approach := tracker.approach(key)) is None:
+            data = CycloneData()
+        else:
+            data = CycloneData(approach.storm, approach.distance, approach.closest_distance, approach.closest_time, approach.eta)
+        return self.data if data == self.data else data
+
+
+class CWAGridCoordinator(_DatasetCoordinator):
+    dataset = DATASET_GRID
+
+    def __init__(self, main: CWAWeatherCoordinator):
+        # checked every 10 minutes, fetched once the next hourly analysis is served
+        super().__init__(main)
+        self.grids = None       # grid.grids, loaded on the first fetch
+        self._product = None
+
+    def wanted(self) -> bool:
+        return HAS_NUMPY and super().wanted()
+
+    async def _fetch(self, session, _now) -> GridData:
+        key = self.config_entry.entry_id
+        if (grids := self.grids) is None:
+            module = await _async_import(self.hass, "grid")
+            grids = self.grids = module.grids
+            self._product = module.TEMPERATURE
+            self.config_entry.async_on_unload(lambda: grids.untrack(key))
+        grids.locate(key, self.main._latitude, self.main._longitude)
+        if (grid := await grids.async_update(self.hass, session, self.main._api_key, self._product)) is None:
+            return GridData()
+        data = GridData(grids.value(self._product, key), grid.issued)
+        return self.data if data == self.data else data
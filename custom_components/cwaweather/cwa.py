@@ -14,21 +14,25 @@
 
 
 import logging
-from pprint import pprint, pformat
+from pprint import pformat
 from datetime import datetime, timedelta
-import re
 import math
 import urllib.parse
 import asyncio
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from aiohttp import ClientResponseError
-from .utils import url_get, parse_element
-from .const import TAIWAN_CITYS_TOWNS
+from .utils import url_get, parse_element, to_float
+from .metrics import metrics
+from .locations import catalog
 
 _LOGGER = logging.getLogger(__name__)
 
 async def _api_v1(session, dataid, params, is_json=True):
-    return await url_get(session, f"https://opendata.cwa.gov.tw/api/v1/rest/datastore/{dataid}?{urllib.parse.urlencode(params)}", is_json=is_json)
+    return await url_get(session, f"https://opendata.cwa.gov.tw/api/v1/rest/datastore/{dataid}?{urllib.parse.urlencode(params)}", is_json=is_json, dataset=dataid, api_key=params.get("Authorization"))
+
+async def _file_api(session, dataid, params):
+    # the datasets only published as files, the gridded products among them
+    return await url_get(session, f"https://opendata.cwa.gov.tw/fileapi/v1/opendataapi/{dataid}?{urllib.parse.urlencode({**params, 'format': 'JSON'})}", dataset=dataid, api_key=params.get("Authorization"))
 
 class CWA:
     ATTR_StartTime = "StartTime"
@@ -76,14 +80,19 @@ class CWA:
             dataid = f"F-D0047-091"
             lname = city
         else:
-            dataid = f"F-D0047-{TAIWAN_CITYS_TOWNS[city][0] + 2:03}"
-            lname = town
+            if (t := catalog.lookup(city, town)) is None:
+                raise ValueError(f"Unknown town: {city}-{town}")
+            dataid = t.twice_daily_dataid
+            lname = t.name
 
         data = await _api_v1(session, dataid, {"Authorization": api_key, "LocationName": lname})
         # _LOGGER.debug(pformat(data))
 
-        locs = data["records"]["Locations"][0]
-        loc = locs["Location"][0]
+        with metrics.parse_timer(dataid):
+            return CWA._parse_forcast_twice_daily(data["records"]["Locations"][0]["Location"][0])
+
+    @staticmethod
+    def _parse_forcast_twice_daily(loc):
         we = loc["WeatherElement"]
 
         forcasts = []
@@ -102,6 +111,7 @@ class CWA:
             "Latitude": float(loc["Latitude"]),
             "Longitude": float(loc["Longitude"]),
             "LocationName": loc["LocationName"],
+            "Geocode": loc.get("Geocode"),
             "Forecasts": forcasts
         }
 
@@ -112,15 +122,19 @@ class CWA:
             dataid = f"F-D0047-089"
             lname = city
         else:
-            dataid = f"F-D0047-{TAIWAN_CITYS_TOWNS[city][0]:03}"
-            lname = town
+            if (t := catalog.lookup(city, town)) is None:
+                raise ValueError(f"Unknown town: {city}-{town}")
+            dataid = t.hourly_dataid
+            lname = t.name
 
         data = await _api_v1(session, dataid, {"Authorization": api_key, "LocationName": lname})
         # _LOGGER.debug(pformat(data))
 
-        locs = data["records"]["Locations"][0]
-        loc = locs["Location"][0]
+        with metrics.parse_timer(dataid):
+            return CWA._parse_forcast_hourly(data["records"]["Locations"][0]["Location"][0])
 
+    @staticmethod
+    def _parse_forcast_hourly(loc):
         we = loc["WeatherElement"]
         if (item := next((x for x in we if x['ElementName'] == '溫度'), None)) is None:
             return None
@@ -132,54 +146,53 @@ class CWA:
             forcasts.append({CWA.ATTR_DataTime: st})
             st += timedelta(hours=1)
 
+        # the payload may be the cached one shared with other entries, leave it untouched
         for item in we:
             itime = item["Time"]
-            for it in itime:
-                it[CWA.ATTR_DataTime] = datetime.fromisoformat(it[CWA.ATTR_DataTime if CWA.ATTR_DataTime in it else CWA.ATTR_StartTime])
+            times = [datetime.fromisoformat(it[CWA.ATTR_DataTime if CWA.ATTR_DataTime in it else CWA.ATTR_StartTime]) for it in itime]
 
+            i = 0
             for forcast in forcasts:
                 fot = forcast[CWA.ATTR_DataTime]
-                it = next(it for it in itime if fot <= it[CWA.ATTR_DataTime])
-                forcast.update(it["ElementValue"][0])
+                while times[i] < fot:
+                    i += 1
+                forcast.update(itime[i]["ElementValue"][0])
 
         return {
             "Latitude": float(loc["Latitude"]),
             "Longitude": float(loc["Longitude"]),
             "LocationName": loc["LocationName"],
+            "Geocode": loc.get("Geocode"),
             "Forecasts": forcasts
         }
 
 
 
-    async def get_weather_warning(session, api_key):
-        dataid = f"W-C0033-002"
-        data = await _api_v1(session, dataid, {"Authorization": api_key})
+    @staticmethod
+    async def get_forcast_all_towns(session, api_key, twice_daily):
+        """F-D0047-093 for every county, the raw payload. See national.py."""
+        dataid = "F-D0047-093"
+        return await _api_v1(session, dataid, {"Authorization": api_key, "locationId": ",".join(catalog.dataids(twice_daily))})
+
 
-        for record in data["records"]["record"]:
-            pprint(record['contents']['content']['contentText'])
-            pprint(record['datasetInfo']['datasetDescription'])
-            print("=======")
 
+    @staticmethod
+    async def get_weather_warning(session, api_key):
+        """W-C0033-002, the texts of the warnings in effect, the raw payload."""
+        return await _api_v1(session, "W-C0033-002", {"Authorization": api_key})
 
 
-    async def get_weather_warning_by_location(session, api_key, location):
-        dataid = f"W-C0033-001"
-        locs = [x for x in re.split(r"[\s\,\.\\\/\-\_\~\|]+", location) if len(x) > 0]
-        data = await _api_v1(session, dataid, {"Authorization": api_key, "locationName": locs[0]})
 
-        locs = data["records"]["location"][0]
-        hazards = locs["hazardConditions"]['hazards']
-        for haz in hazards:
-            print(haz)
-            info = f"{haz['info']['phenomena']} {haz['info']['significance']}"
-            startTime = haz['validTime']['startTime']
-            endTime = haz['validTime']['endTime']
-            return info, startTime, endTime
+    @staticmethod
+    async def get_weather_warnings(session, api_key):
+        """W-C0033-001, the hazards of every county, the raw payload. See warning.py."""
+        return await _api_v1(session, "W-C0033-001", {"Authorization": api_key})
 
     async def check_api_key(session, api_key):
         dataid = "O-A0003-001"
         try:
-            data = await _api_v1(session, dataid, {"Authorization": api_key})
+            # one element of one station, the key is checked all the same
+            data = await _api_v1(session, dataid, {"Authorization": api_key, "limit": 1, "WeatherElement": "AirTemperature"})
             return True
         except ClientResponseError as err:
             if err.status == 401:
@@ -190,7 +203,7 @@ class CWA:
             raise
 
 
-    @dataclass
+    @dataclass(slots=True)
     class Station:
         _distance: float = None
         StationName: str = None
@@ -200,35 +213,35 @@ class CWA:
         TownName: str = None
         CountyCode: str = None
         TownCode: str = None
-        StationLatitude: str = None
-        StationLongitude: str = None
-        StationAltitude: str = None
-        AirPressure: str = None
-        AirTemperature: str = None
-        WindSpeed: str = None
-        WindDirection: str = None
-        RelativeHumidity: str = None
-        Precipitation: str = None
-        PeakGustSpeed: str = None
-        SunshineDuration: str = None
-        UVIndex: str = None
+        StationLatitude: float = None
+        StationLongitude: float = None
+        StationAltitude: float = None
+        AirPressure: float = None
+        AirTemperature: float = None
+        WindSpeed: float = None
+        WindDirection: float = None
+        RelativeHumidity: float = None
+        Precipitation: float = None
+        PeakGustSpeed: float = None
+        SunshineDuration: float = None
+        UVIndex: float = None
         VisibilityDescription: str = None
         Weather: str = None
-        PrecipitationNow: str = None
-        PrecipitationPast10Min: str = None
-        PrecipitationPast1hr: str = None
-        PrecipitationPast3hr: str = None
-        PrecipitationPast6Hr: str = None
-        PrecipitationPast12hr: str = None
-        PrecipitationPast24hr: str = None
-        PrecipitationPast2days: str = None
-        PrecipitationPast3days: str = None
+        PrecipitationNow: float = None
+        PrecipitationPast10Min: float = None
+        PrecipitationPast1hr: float = None
+        PrecipitationPast3hr: float = None
+        PrecipitationPast6Hr: float = None
+        PrecipitationPast12hr: float = None
+        PrecipitationPast24hr: float = None
+        PrecipitationPast2days: float = None
+        PrecipitationPast3days: float = None
 
         def __repr__(self):
             res = []
-            for k, v in self.__dict__.items():
-                if v is not None:
-                    res.append(f"{k}={v}")
+            for f in fields(self):
+                if (v := getattr(self, f.name)) is not None:
+                    res.append(f"{f.name}={v}")
             return f'{{{" ".join(res)}}}'
 
 
@@ -241,7 +254,7 @@ class CWA:
         def parse_rainfallelement(v, r):
             for k in ['Now', 'Past10Min', 'Past1hr', 'Past3hr', 'Past6Hr', 'Past12hr', 'Past24hr', 'Past2days', 'Past3days']:
                 if k in v:
-                    r.__setattr__(f"Precipitation{k}", v[k]['Precipitation'])
+                    r.__setattr__(f"Precipitation{k}", to_float(v[k]['Precipitation']))
 
         r = CWA.Station()
         for k in ["StationName", "StationId"]:
@@ -249,12 +262,13 @@ class CWA:
         r.ObsTime = st["ObsTime"]['DateTime']
 
         geo = st["GeoInfo"]
-        for k in ["StationAltitude", "CountyName", "TownName", "CountyCode", "TownCode"]:
+        for k in ["CountyName", "TownName", "CountyCode", "TownCode"]:
             r.__setattr__(k, geo[k])
+        r.StationAltitude = to_float(geo["StationAltitude"])
 
         coord = next(x for x in geo['Coordinates'] if x['CoordinateName'] == 'WGS84')
-        for k in ["StationLatitude", "StationLongitude"]:
-            r.__setattr__(k, coord[k])
+        r.StationLatitude = float(coord["StationLatitude"])
+        r.StationLongitude = float(coord["StationLongitude"])
 
         if "WeatherElement" in st:
             parse_element(_attrs, st["WeatherElement"], r)
@@ -269,7 +283,8 @@ class CWA:
         for dataid in ["O-A0003-001"]: # ["O-A0001-001", "O-A0002-001", "O-A0003-001"]:
             data = await _api_v1(session, dataid, {"Authorization": api_key})
             # _LOGGER.debug(pformat(data))
-            sts.extend(CWA._parse_a000x(st) for st in data["records"]["Station"])
+            with metrics.parse_timer(dataid):
+                sts.extend(CWA._parse_a000x(st) for st in data["records"]["Station"])
         return sts
 
     @staticmethod
@@ -281,28 +296,32 @@ class CWA:
             sts.extend(CWA._parse_a000x(st) for st in data["records"]["Station"])
         return sts
 
-    @dataclass
+    @dataclass(slots=True)
     class Area:
         AreaDesc: str = None
         AreaIntensity: str = None
         CountyName: str = None
 
-    @dataclass
+    @dataclass(slots=True)
     class Earthquake:
         EarthquakeNo: str = None
-        MagnitudeValue: str = None
-        EpicenterLatitude: str = None
-        EpicenterLongitude: str = None
+        MagnitudeValue: float = None
+        EpicenterLatitude: float = None
+        EpicenterLongitude: float = None
         Location: str = None
-        FocalDepth: str = None
+        FocalDepth: float = None
         OriginTime: str = None
         ReportContent: str = None
         ReportImageURI: str = None
         Web: str = None
         areas: list = None
 
+    EARTHQUAKE_DATASETS = ("E-A0015-001", "E-A0016-001")
+
     @staticmethod
-    async def get_earthquake_reports(session, api_key) -> list[Earthquake]:
+    async def get_earthquake_reports(session, api_key, since: datetime = None, known = ()) -> list[Earthquake]:
+        """Numbered and small area reports. With `since` only the ones from that origin time on are asked for (timeFrom),
+        reports with their (EarthquakeNo, OriginTime) in `known` are skipped before they are parsed."""
         _attrs = ["EarthquakeInfo/EarthquakeMagnitude/MagnitudeValue",
                   "EarthquakeInfo/Epicenter/EpicenterLatitude", "EarthquakeInfo/Epicenter/EpicenterLongitude", "EarthquakeInfo/Epicenter/Location",
                   "EarthquakeInfo/FocalDepth", "EarthquakeInfo/OriginTime",
@@ -310,33 +329,35 @@ class CWA:
 
         _attrs2 = ["AreaDesc", 'AreaIntensity', 'CountyName']
 
+        params = {"Authorization": api_key}
+        after = None
+        if since is not None:
+            params["timeFrom"] = f"{since:%Y-%m-%dT%H:%M:%S}"
+            after = f"{since:%Y-%m-%d %H:%M:%S}"
+        datas = await asyncio.gather(*(_api_v1(session, dataid, params) for dataid in CWA.EARTHQUAKE_DATASETS))
+
         res = []
-        for dataid in ["E-A0015-001", "E-A0016-001"]:
-            data = await _api_v1(session, dataid, {"Authorization": api_key})
-            for da in data["records"]["Earthquake"]:
-                r = parse_element(_attrs, da, CWA.Earthquake())
-                r.areas = [parse_element(_attrs2, area, CWA.Area()) for area in da['Intensity']['ShakingArea']]
-                res.append(r)
+        for dataid, data in zip(CWA.EARTHQUAKE_DATASETS, datas):
+            with metrics.parse_timer(dataid):
+                for da in data["records"]["Earthquake"]:
+                    # a cached response may still hold older ones
+                    origin = da["EarthquakeInfo"]["OriginTime"]
+                    if (after is not None and origin < after) or (str(da["EarthquakeNo"]), origin) in known:
+                        continue
+                    r = parse_element(_attrs, da, CWA.Earthquake())
+                    r.areas = [parse_element(_attrs2, area, CWA.Area()) for area in da['Intensity']['ShakingArea']]
+                    res.append(r)
         return res
 
-    @dataclass
-    class Typhoon:
-        cwaTyphoonName: str = None
-        typhoonName: str = None
-        year: str = None
-
     @staticmethod
-    async def get_cyclone_reports(session, api_key) -> list[Typhoon]:
-        _attrs = ["cwaTyphoonName", "typhoonName", "year"]
-        res = []
-        for dataid in ["W-C0034-005"]:
-            data = await _api_v1(session, dataid, {"Authorization": api_key})
+    async def get_grid(session, api_key, dataid):
+        """A gridded product (O-A0038-001 temperature analysis, ...), the raw payload. See grid.py."""
+        return await _file_api(session, dataid, {"Authorization": api_key})
 
-            for da in data["records"]["tropicalCyclones"]["tropicalCyclone"]:
-                r = parse_element(_attrs, da, CWA.Typhoon())
-            #     r['areas'] = [parse_element(_attrs2, area) for area in eq['Intensity']['ShakingArea']]
-                res.append(r)
-        return res
+    @staticmethod
+    async def get_tropical_cyclones(session, api_key):
+        """W-C0034-005, analysis and forecast tracks of the active tropical cyclones, the raw payload. See cyclone.py."""
+        return await _api_v1(session, "W-C0034-005", {"Authorization": api_key})
 
 
     @staticmethod
@@ -419,7 +440,7 @@ async def main():
         # for r in res:
         #     pprint(r.ReportContent)
 
-        # res = await CWA.get_cyclone_reports(session, API_KEY)
+        # res = await CWA.get_tropical_cyclones(session, API_KEY)
         # pprint(res)
 
         # sts = await CWA.get_observation_stations(session, API_KEY)
@@ -0,0 +1,183 @@
+# Tropical cyclone tracks (W-C0034-005), one tracker shared by all entries.
+#   Every storm's analysis and forecast fixes are kept as arrays (time, latitude, longitude, radius of the 15 m/s
+#   wind circle), rebuilt only when the storm has a new advisory. Storms left out of the dataset are dropped, so
+#   the memory follows the storms active now. The distance of every entry's position to every fix of every storm
+#   is one numpy pass, redone when an advisory or a position changed: the distance now, the closest approach
+#   and the arrival (ETA) of the 15 m/s wind circle.
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+import numpy as np
+from .cwa import CWA
+from .shared import SharedFeed
+from .metrics import metrics
+
+_LOGGER = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+# entries refreshing in between share the last fetch, advisories come every 3 or 6 hours
+REFETCH_AFTER = 600
+
+
+@dataclass(slots=True, eq=False)
+class Track:
+    name: str
+    advisory: str
+    times: np.ndarray       # epoch seconds
+    lat: np.ndarray         # radians
+    lon: np.ndarray
+    radius: np.ndarray      # km, nan when not given
+    # index of the latest analysis fix, the ones after it are forecasts
+    current: int
+
+    @staticmethod
+    def from_cwa(tc) -> "Track":
+        analysis = (tc.get("analysisData") or {}).get("fix") or []
+        forecast = (tc.get("forecastData") or {}).get("fix") or []
+        times, coords, radius = [], [], []
+        for fix in analysis:
+            times.append(datetime.fromisoformat(fix["fixTime"]).timestamp())
+            coords.append(fix["coordinate"].split(","))
+            radius.append((fix.get("circleOf15Ms") or {}).get("radius"))
+        for fix in forecast:
+            times.append(datetime.fromisoformat(fix["initTime"]).timestamp() + float(fix["tau"]) * 3600)
+            coords.append(fix["coordinate"].split(","))
+            radius.append((fix.get("circleOf15Ms") or {}).get("radius"))
+        coords = np.radians(np.array(coords, dtype=np.float64).reshape(-1, 2))
+        return Track(
+            name=tc.get("cwaTyphoonName") or tc.get("typhoonName"),
+            advisory=_advisory(analysis, forecast),
+            times=np.array(times, dtype=np.float64),
+            lat=coords[:, 1].copy(),
+            lon=coords[:, 0].copy(),
+            radius=np.array([np.nan if r in (None, "") else float(r) for r in radius], dtype=np.float64),
+            current=max(len(analysis) - 1, 0),
+        )
+
+
+def _key(tc) -> str:
+    return f"{tc.get('year')}-{tc.get('cwaTdNo') or tc.get('typhoonName')}"
+
+
+def _advisory(analysis, forecast) -> str:
+    return f"{analysis[-1]['fixTime'] if analysis else ''}/{forecast[0]['initTime'] if forecast else ''}"
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km between points in radians, broadcasting like numpy does."""
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+@dataclass(frozen=True, slots=True)
+class Approach:
+    storm: str
+    distance: float         # km, from the latest analysis fix
+    closest_distance: float
+    closest_time: datetime
+    # the 15 m/s wind circle reaches the position, None when no fix does
+    eta: datetime = None
+
+
+class CycloneTracker:
+    def __init__(self):
+        self._tracks: dict[str, Track] = {}
+        self._payload = None
+        self._shared = SharedFeed("tropical cyclones", REFETCH_AFTER)
+        self._locations: dict[str, tuple[float, float]] = {}
+        self._approaches: dict[str, Approach | None] = {}
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def locate(self, key, latitude, longitude):
+        if self._locations.get(key) != (latitude, longitude):
+            self._locations[key] = (latitude, longitude)
+            self._dirty = True
+
+    def untrack(self, key):
+        self._locations.pop(key, None)
+        self._approaches.pop(key, None)
+
+    async def async_update(self, session, api_key):
+        """Fetch the storms when the last fetch is REFETCH_AFTER old, rebuild the ones with a new advisory."""
+        async def fetch():
+            self._apply(await CWA.get_tropical_cyclones(session, api_key))
+        await self._shared.async_update(fetch, has_data=lambda: self._payload is not None)
+
+    def _apply(self, payload):
+        if payload is self._payload:
+            return
+        self._payload = payload
+        with metrics.parse_timer("W-C0034-005"):
+            tracks = {}
+            for tc in (payload["records"].get("tropicalCyclones") or {}).get("tropicalCyclone") or ():
+                key = _key(tc)
+                old = self._tracks.get(key)
+                analysis = (tc.get("analysisData") or {}).get("fix") or []
+                forecast = (tc.get("forecastData") or {}).get("fix") or []
+                if not analysis and not forecast:
+                    continue
+                tracks[key] = old if old is not None and old.advisory == _advisory(analysis, forecast) else Track.from_cwa(tc)
+        if tracks.keys() != self._tracks.keys() or any(tracks[k] is not self._tracks[k] for k in tracks):
+            _LOGGER.debug("tropical cyclones: %s", ", ".join(t.name for t in tracks.values()) or "none")
+            self._tracks = tracks
+            self._dirty = True
+
+    def approach(self, key) -> Approach | None:
+        """The storm coming closest to the position of `key`, None without storms or a position."""
+        if self._dirty:
+            self._compute()
+        return self._approaches.get(key)
+
+    def _compute(self):
+        self._dirty = False
+        keys = list(self._locations)
+        tracks = list(self._tracks.values())
+        if not keys or not tracks:
+            self._approaches = dict.fromkeys(keys)
+            return
+
+        pos = np.radians(np.array([self._locations[k] for k in keys], dtype=np.float64))
+        bounds = np.cumsum([0] + [len(t.times) - t.current for t in tracks])
+        lat = np.concatenate([t.lat[t.current:] for t in tracks])
+        lon = np.concatenate([t.lon[t.current:] for t in tracks])
+        times = np.concatenate([t.times[t.current:] for t in tracks])
+        radius = np.concatenate([t.radius[t.current:] for t in tracks])
+
+        # positions x fixes of every storm from its latest analysis on
+        dist = haversine(pos[:, 0:1], pos[:, 1:2], lat[None, :], lon[None, :])
+        with np.errstate(invalid="ignore"):
+            inside = dist <= radius[None, :]
+        rows = np.arange(len(keys))
+        closest = np.empty((len(tracks), len(keys)))
+        closest_at = np.empty((len(tracks), len(keys)), dtype=np.intp)
+        for s, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+            closest_at[s] = a + dist[:, a:b].argmin(axis=1)
+            closest[s] = dist[rows, closest_at[s]]
+
+        storm = closest.argmin(axis=0)
+        self._approaches = {}
+        for i, key in enumerate(keys):
+            s = storm[i]
+            a, b = bounds[s], bounds[s + 1]
+            entering = np.flatnonzero(inside[i, a:b])
+            self._approaches[key] = Approach(
+                storm=tracks[s].name,
+                distance=round(float(dist[i, a]), 1),
+                closest_distance=round(float(closest[s, i]), 1),
+                closest_time=datetime.fromtimestamp(times[closest_at[s, i]]).astimezone(),
+                eta=datetime.fromtimestamp(times[a + entering[0]]).astimezone() if len(entering) else None,
+            )
+
+    def diagnostics(self) -> dict:
+        return {
+            "storms": {key: {"name": t.name, "advisory": t.advisory, "fixes": len(t.times), "forecasts": len(t.times) - t.current - 1} for key, t in self._tracks.items()},
+            "locations": len(self._locations),
+            "fetched": datetime.fromtimestamp(fetched).isoformat() if (fetched := self._shared.fetched) else None,
+        }
+
+
+tracker = CycloneTracker()
@@ -3,9 +3,14 @@
 from .utils import url_get
 from xml.etree import ElementTree
 
+# ~11m, plenty for a town lookup. Full precision zone coordinates would make every move a new cache / snapshot key.
+POINT_QUERY_PRECISION = 4
+
 class DataGovTw:
     async def town_village_point_query(session, lat, lon):
-        res = await url_get(session, f"https://api.nlsc.gov.tw/other/TownVillagePointQuery/{lon}/{lat}", is_json = False)
+        lat = round(float(lat), POINT_QUERY_PRECISION)
+        lon = round(float(lon), POINT_QUERY_PRECISION)
+        res = await url_get(session, f"https://api.nlsc.gov.tw/other/TownVillagePointQuery/{lon}/{lat}", is_json = False, dataset = "TownVillagePointQuery")
         res = ElementTree.fromstring(res)
 
         city_name = res.find(".//ctyName")
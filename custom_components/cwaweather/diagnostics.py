@@ -0,0 +1,50 @@
+"""Diagnostics support for CWA Weather."""
+from typing import Any
+from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.components.diagnostics import async_redact_data
+from .session import async_get_session
+from .ratelimit import limiter
+from .resilience import breakers, snapshots
+from .metrics import metrics
+from .locations import catalog
+from .national import national
+from .earthquake import feed as earthquake_feed
+from .warning import weather_warnings
+from .const import (
+    CONF_API_KEY,
+    CONF_API_KEY_MOENV,
+)
+
+TO_REDACT = {CONF_API_KEY, CONF_API_KEY_MOENV}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, config_entry: ConfigEntry) -> dict[str, Any]:
+    coordinator = config_entry.runtime_data
+    town = catalog.lookup(coordinator._city, coordinator._town) if coordinator._city and coordinator._town else None
+    return {
+        "entry": async_redact_data(config_entry.as_dict(), TO_REDACT),
+        "town": {"county": town.county, "name": town.name, "code": town.code, "hourly": town.hourly_dataid, "twice_daily": town.twice_daily_dataid} if town else None,
+        "refresh": {
+            "forecast": coordinator.refresh_metrics.diagnostics(),
+            "observation": coordinator.observation.refresh_metrics.diagnostics(),
+            "aqi": coordinator.aqi.refresh_metrics.diagnostics(),
+            "earthquake": coordinator.earthquake.refresh_metrics.diagnostics(),
+            "warning": coordinator.warning.refresh_metrics.diagnostics(),
+            "cyclone": coordinator.cyclone.refresh_metrics.diagnostics(),
+            "grid": coordinator.grid.refresh_metrics.diagnostics(),
+        },
+        "datasets_needed": sorted(coordinator.needed_datasets()),
+        "next_refresh_s": {c.name: round(c.update_interval.total_seconds()) for c in coordinator.coordinators},
+        "datasets": metrics.diagnostics(),
+        "http": async_get_session(hass).diagnostics(),
+        "rate_limits": limiter.diagnostics(),
+        "circuit_breakers": breakers.diagnostics(),
+        "snapshots": len(snapshots),
+        "national_forecasts": national.diagnostics(),
+        "earthquakes": earthquake_feed.diagnostics(),
+        "weather_warnings": weather_warnings.diagnostics(),
+        # loaded on the first fetch of an entity reading them
+        "tropical_cyclones": tracker.diagnostics() if (tracker := coordinator.cyclone.tracker) else None,
+        "grids": grids.diagnostics() if (grids := coordinator.grid.grids) else None,
+    }
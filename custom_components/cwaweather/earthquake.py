@@ -0,0 +1,145 @@
+# Earthquake reports (E-A0015-001 numbered, E-A0016-001 small area), one feed shared by all entries.
+#   The first fetch takes the recent history, every later one only asks for reports from a while before the
+#   newest origin time on (timeFrom) and skips the known ones before parsing them. A numbered report is published
+#   later than a small area one, the look back catches it. Every report gets a sequence number and its shaking
+#   areas indexed by county (the strongest one), the newest report felt in a county is kept per county too.
+#   The history is bounded, the oldest reports drop out of both indexes.
+
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from .cwa import CWA
+from .shared import SharedFeed
+from .locations import normalize
+
+_LOGGER = logging.getLogger(__name__)
+
+HISTORY_SIZE = 50
+# the later fetches ask for reports with an origin from this long before the newest known one
+LOOKBACK = timedelta(hours=1)
+# entries polling in between share the last fetch, as long as the fetch cache keeps the response
+REFETCH_AFTER = 60
+
+# 交通部中央氣象署地震震度分級
+INTENSITY_LEVELS = ("0級", "1級", "2級", "3級", "4級", "5弱", "5強", "6弱", "6強", "7級")
+_INTENSITY_RANK = {v: i for i, v in enumerate(INTENSITY_LEVELS)}
+
+
+def intensity_rank(intensity) -> int:
+    """Position of an intensity on the scale, -1 when unknown."""
+    return _INTENSITY_RANK.get(intensity, -1)
+
+
+@dataclass(slots=True, eq=False)
+class Report:
+    seq: int
+    earthquake: CWA.Earthquake
+    # county -> the strongest shaking area of the report in it
+    counties: dict
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return str(self.earthquake.EarthquakeNo), self.earthquake.OriginTime
+
+    def attributes(self, county = None) -> dict:
+        """Event attributes, with the intensity in `county` when it was felt there."""
+        eq = self.earthquake
+        area = self.counties.get(normalize(county)) if county else None
+        return {
+            "earthquake_no": eq.EarthquakeNo,
+            "origin_time": eq.OriginTime,
+            "magnitude": eq.MagnitudeValue,
+            "focal_depth": eq.FocalDepth,
+            "location": eq.Location,
+            "latitude": eq.EpicenterLatitude,
+            "longitude": eq.EpicenterLongitude,
+            "intensity": area.AreaIntensity if area else None,
+            "max_intensity": max((a.AreaIntensity for a in self.counties.values()), key=intensity_rank, default=None),
+            "report": eq.ReportContent,
+            "image": eq.ReportImageURI,
+            "web": eq.Web,
+        }
+
+
+def _counties(eq: CWA.Earthquake) -> dict:
+    res = {}
+    for area in eq.areas or ():
+        if area.CountyName is None:
+            continue
+        county = normalize(area.CountyName)
+        if (old := res.get(county)) is None or intensity_rank(area.AreaIntensity) > intensity_rank(old.AreaIntensity):
+            res[county] = area
+    return res
+
+
+class EarthquakeFeed:
+    def __init__(self):
+        # (EarthquakeNo, OriginTime) -> report, oldest first
+        self._reports: OrderedDict[tuple[str, str], Report] = OrderedDict()
+        # county -> the newest report felt in it
+        self._felt: dict[str, Report] = {}
+        self._newest: str = None
+        self._shared = SharedFeed("earthquake reports", REFETCH_AFTER)
+        self.seq = 0
+
+    def __len__(self):
+        return len(self._reports)
+
+    @property
+    def fetched(self) -> float | None:
+        return self._shared.fetched
+
+    async def async_update(self, session, api_key) -> int:
+        """Fetch the reports published since the last fetch, returns the newest sequence number."""
+        async def fetch():
+            since = datetime.fromisoformat(self._newest) - LOOKBACK if self._newest else None
+            reports = await CWA.get_earthquake_reports(session, api_key, since, self._reports)
+            for eq in sorted(reports, key=lambda eq: eq.OriginTime):
+                self._add(eq)
+            if reports:
+                _LOGGER.debug("%d new earthquake reports, %d kept", len(reports), len(self._reports))
+        await self._shared.async_update(fetch, has_data=lambda: self.fetched is not None)
+        return self.seq
+
+    def _add(self, eq: CWA.Earthquake):
+        self.seq += 1
+        report = Report(self.seq, eq, _counties(eq))
+        self._reports[report.key] = report
+        if self._newest is None or eq.OriginTime > self._newest:
+            self._newest = eq.OriginTime
+        for county in report.counties:
+            if (old := self._felt.get(county)) is None or old.earthquake.OriginTime <= eq.OriginTime:
+                self._felt[county] = report
+
+        while len(self._reports) > HISTORY_SIZE:
+            _, old = self._reports.popitem(last=False)
+            for county in old.counties:
+                if self._felt.get(county) is old:
+                    del self._felt[county]
+
+    def since(self, seq: int) -> list[Report]:
+        """The reports added after `seq`, oldest first."""
+        res = []
+        for report in reversed(self._reports.values()):
+            if report.seq <= seq:
+                break
+            res.append(report)
+        res.reverse()
+        return res
+
+    def felt(self, county) -> Report | None:
+        """The newest report with shaking in `county`."""
+        return self._felt.get(normalize(county)) if county else None
+
+    def diagnostics(self) -> dict:
+        return {
+            "reports": len(self._reports),
+            "seq": self.seq,
+            "newest": self._newest,
+            "counties": len(self._felt),
+            "fetched": datetime.fromtimestamp(self.fetched).isoformat() if self.fetched else None,
+        }
+
+
+feed = EarthquakeFeed()
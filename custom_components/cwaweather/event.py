@@ -0,0 +1,53 @@
+import logging
+from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.components.event import EventEntity
+
+from .coordinator import DATASET_EARTHQUAKE
+from .earthquake import feed
+from .const import (
+    ATTRIBUTION_CWA,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# felt: the report lists shaking in the entry's county, reported: elsewhere
+EVENT_FELT = "felt"
+EVENT_REPORTED = "reported"
+
+
+async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
+    coordinator = config_entry.runtime_data
+    async_add_entities([CWAEarthquakeEventEntity(coordinator)], False)
+
+
+class CWAEarthquakeEventEntity(CoordinatorEntity, EventEntity):
+    _attr_has_entity_name = True
+    _attr_translation_key = "earthquake"
+    _attr_attribution = ATTRIBUTION_CWA
+    _attr_event_types = [EVENT_FELT, EVENT_REPORTED]
+
+    def __init__(self, coordinator):
+        super().__init__(coordinator.earthquake, context=frozenset({DATASET_EARTHQUAKE}))
+        self._main = coordinator
+        self._attr_device_info = coordinator.device_info
+        self._attr_unique_id = f"{coordinator.config_entry.entry_id}-earthquake"
+        # the reports of the first fetch are history, only the ones coming after it are events
+        self._seq = feed.seq if feed.fetched is not None else None
+
+    def _handle_coordinator_update(self) -> None:
+        if self.coordinator.data is None:
+            return
+        if self._seq is None:
+            self._seq = feed.seq
+            return
+        county = self._main._city
+        for report in feed.since(self._seq):
+            attrs = report.attributes(county)
+            self._trigger_event(EVENT_FELT if attrs["intensity"] else EVENT_REPORTED, attrs)
+            self._main.refresh_metrics.state_writes["earthquake"] += 1
+            self.async_write_ha_state()
+        # another entry may have fetched since this coordinator did, its reports are taken now
+        self._seq = feed.seq
@@ -0,0 +1,43 @@
+# Forecast periods indexed by time.
+#   The weather entity asks for the forecasts "from now on" for every subscriber and card render,
+#   the cut is a bisect on the sorted period times and the resulting list of weather.Forecast dicts is
+#   kept until the cut moves to another period. A refresh with new forecasts builds a new store.
+
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from homeassistant.components import weather
+
+
+class ForecastStore:
+    def __init__(self, periods: list):
+        self.periods = sorted(periods, key=lambda p: p.time)
+        self._times: list[datetime] = [p.time for p in self.periods]
+        self._view: tuple[int, list[weather.Forecast]] = None
+        self._daytime: ForecastStore = None
+
+    def __len__(self):
+        return len(self.periods)
+
+    def __getitem__(self, i):
+        return self.periods[i]
+
+    def at(self, after: datetime):
+        """The first period later than `after`, the last one once the forecasts ran out."""
+        i = bisect_right(self._times, after)
+        return self.periods[min(i, len(self.periods) - 1)]
+
+    def index(self, cut: datetime) -> int:
+        """Where the periods at or after `cut` start."""
+        return bisect_left(self._times, cut)
+
+    def since(self, cut: datetime) -> list[weather.Forecast]:
+        """weather.Forecast dicts of the periods at or after `cut`, the same list until the cut moves on."""
+        i = self.index(cut)
+        if self._view is None or self._view[0] != i:
+            self._view = (i, [p.as_forecast() for p in self.periods[i:]])
+        return self._view[1]
+
+    def daytime(self) -> "ForecastStore":
+        if self._daytime is None:
+            self._daytime = ForecastStore([p for p in self.periods if p.is_daytime])
+        return self._daytime
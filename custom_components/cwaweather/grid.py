@@ -0,0 +1,177 @@
+# Gridded products (O-A0038-001 temperature analysis, 0.03° over Taiwan), one store shared by all entries.
+#   A new issuance is decoded once (in the executor) into a float32 array, saved in the cache directory and used as
+#   a read-only memory map from then on, also after a restart while the issuance is current. Only the pages of the
+#   cells asked for are read. The value at every entry's position is one bilinear interpolation over all of
+#   them, redone when a new issuance came or a position changed. A cell without data (-999, the sea) is left out
+#   of the interpolation, a position without any data around it is None.
+
+import os
+import re
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+import numpy as np
+from homeassistant.core import HomeAssistant
+from .cwa import CWA
+from .shared import SharedFeed
+from .metrics import metrics
+from .schedule import Publication, TEMPERATURE_GRID
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# a publication served later than its lag is looked for this often
+REFETCH_AFTER = 600
+# under the config directory, raw arrays are no Store files to keep in .storage
+CACHE_DIR = (".cache", DOMAIN)
+MISSING = -999
+
+
+@dataclass(frozen=True)
+class GridProduct:
+    dataid: str
+    publication: Publication
+    resolution: float = 0.03
+
+
+TEMPERATURE = GridProduct("O-A0038-001", TEMPERATURE_GRID)
+
+
+@dataclass(slots=True, eq=False)
+class Grid:
+    values: np.ndarray      # rows (south to north) x columns (west to east), nan without data
+    latitude: float         # of the south west cell
+    longitude: float
+    resolution: float
+    issued: datetime
+
+    def sample(self, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+        """Bilinear interpolation at the positions, nan outside the grid or without data around."""
+        rows, cols = self.values.shape
+        y = (latitude - self.latitude) / self.resolution
+        x = (longitude - self.longitude) / self.resolution
+        outside = (y < 0) | (y > rows - 1) | (x < 0) | (x > cols - 1)
+        i = np.clip(np.floor(y).astype(np.intp), 0, rows - 2)
+        j = np.clip(np.floor(x).astype(np.intp), 0, cols - 2)
+        fy = (y - i)[:, None]
+        fx = (x - j)[:, None]
+        corners = np.stack([self.values[i, j], self.values[i, j + 1], self.values[i + 1, j], self.values[i + 1, j + 1]], axis=1)
+        weights = np.concatenate([(1 - fy) * (1 - fx), (1 - fy) * fx, fy * (1 - fx), fy * fx], axis=1)
+        valid = ~np.isnan(corners)
+        total = (weights * valid).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            res = np.where(valid, weights * corners, 0).sum(axis=1) / total
+        res[outside | (total == 0)] = np.nan
+        return res
+
+
+def _issued(payload) -> datetime:
+    data = payload["cwaopendata"]
+    dataset = data["dataset"]
+    issued = dataset.get("DateTime") or dataset["datasetInfo"].get("DateTime") or data["sent"]
+    return datetime.fromisoformat(issued)
+
+
+def _decode(payload, product: GridProduct, path: str) -> Grid:
+    """Decode the payload, save it at `path` and map it from there."""
+    dataset = payload["cwaopendata"]["dataset"]
+    geo = dataset["GeoInfo"]
+    latitude, longitude = float(geo["BottomLeftLatitude"]), float(geo["BottomLeftLongitude"])
+    cols = round((float(geo["TopRightLongitude"]) - longitude) / product.resolution) + 1
+    values = np.array(re.split(r"[,\s]+", dataset["Resource"]["Content"].strip()), dtype=np.float32)
+    values[values <= MISSING] = np.nan
+    values = values.reshape(-1, cols)
+    meta = {"issued": _issued(payload).isoformat(), "latitude": latitude, "longitude": longitude, "resolution": product.resolution}
+
+    # the old metadata is removed before the array is replaced and the new one put after it, a crash in between
+    # leaves no saved grid instead of an array with the metadata of another issuance
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.npy.tmp", "wb") as f:
+        np.save(f, values)
+    with open(f"{path}.json.tmp", "w") as f:
+        json.dump(meta, f)
+    try:
+        os.remove(f"{path}.json")
+    except FileNotFoundError:
+        pass
+    os.replace(f"{path}.npy.tmp", f"{path}.npy")
+    os.replace(f"{path}.json.tmp", f"{path}.json")
+    return _load(path)
+
+
+def _load(path: str) -> Grid | None:
+    try:
+        with open(f"{path}.json") as f:
+            meta = json.load(f)
+        values = np.load(f"{path}.npy", mmap_mode="r")
+    except (OSError, ValueError) as err:
+        if not isinstance(err, FileNotFoundError):
+            _LOGGER.warning("%s: saved grid unreadable: %r", path, err)
+        return None
+    return Grid(values, meta["latitude"], meta["longitude"], meta["resolution"], datetime.fromisoformat(meta["issued"]))
+
+
+class GridStore:
+    def __init__(self):
+        self._grids: dict[str, Grid] = {}
+        self._shared: dict[str, SharedFeed] = {}
+        self._locations: dict[str, tuple[float, float]] = {}
+        # dataid -> key -> value at the key's position
+        self._values: dict[str, dict[str, float | None]] = {}
+
+    def locate(self, key, latitude, longitude):
+        if self._locations.get(key) != (latitude, longitude):
+            self._locations[key] = (latitude, longitude)
+            self._values.clear()
+
+    def untrack(self, key):
+        self._locations.pop(key, None)
+        for values in self._values.values():
+            values.pop(key, None)
+
+    async def async_update(self, hass: HomeAssistant, session, api_key, product: GridProduct) -> Grid | None:
+        """The grid of the current issuance, from disk or fetched. The last one while upstream has no newer."""
+        if (shared := self._shared.get(product.dataid)) is None:
+            shared = self._shared[product.dataid] = SharedFeed(product.dataid, REFETCH_AFTER)
+        path = hass.config.path(*CACHE_DIR, product.dataid)
+
+        async def load():
+            if product.dataid not in self._grids and (grid := await hass.async_add_executor_job(_load, path)) is not None:
+                self._grids[product.dataid] = grid
+                _LOGGER.debug("%s: saved grid of %s", product.dataid, grid.issued)
+
+        async def fetch():
+            payload = await CWA.get_grid(session, api_key, product.dataid)
+            if (grid := self._grids.get(product.dataid)) is not None and _issued(payload) <= grid.issued:
+                return
+            with metrics.parse_timer(product.dataid):
+                grid = self._grids[product.dataid] = await hass.async_add_executor_job(_decode, payload, product, path)
+            self._values.pop(product.dataid, None)
+            _LOGGER.debug("%s: grid %s of %s", product.dataid, grid.values.shape, grid.issued)
+
+        def due(now) -> bool:
+            return self._grids[product.dataid].issued < product.publication.latest(datetime.now().astimezone()) and shared.due(now)
+
+        await shared.async_update(fetch, has_data=lambda: product.dataid in self._grids, due=due, prepare=load)
+        return self._grids.get(product.dataid)
+
+    def value(self, product: GridProduct, key) -> float | None:
+        """The value at the position of `key`, interpolated with every other position on the first ask."""
+        if (grid := self._grids.get(product.dataid)) is None:
+            return None
+        if (values := self._values.get(product.dataid)) is None:
+            keys = list(self._locations)
+            pos = np.array([self._locations[k] for k in keys], dtype=np.float64).reshape(-1, 2)
+            sampled = grid.sample(pos[:, 0], pos[:, 1])
+            values = self._values[product.dataid] = {k: None if np.isnan(v) else round(float(v), 1) for k, v in zip(keys, sampled)}
+        return values.get(key)
+
+    def diagnostics(self) -> dict:
+        return {
+            dataid: {"issued": grid.issued.isoformat(), "shape": list(grid.values.shape), "cells": int(np.count_nonzero(~np.isnan(grid.values)))}
+            for dataid, grid in self._grids.items()
+        }
+
+
+grids = GridStore()
@@ -0,0 +1,67 @@
+# Counties and towns of TAIWAN_CITYS_TOWNS, indexed once at import.
+#   Every town knows its county and its hourly / twice daily F-D0047 dataset ids, "台" is read as "臺"
+#   and the town alone is enough when the name is unique. The TownCode is only known from the
+#   forecasts (the Geocode of the location), it is filled in by the first forecast of the town.
+
+import re
+from dataclasses import dataclass
+from .const import TAIWAN_CITYS_TOWNS
+
+_SEPARATORS = re.compile(r"[\s\,\.\\\/\-\_\~\|]+")
+
+
+@dataclass(slots=True)
+class Town:
+    county: str
+    name: str
+    hourly_dataid: str
+    twice_daily_dataid: str
+    code: str = None
+
+    def __str__(self):
+        return f"{self.county}-{self.name}"
+
+
+def normalize(name: str) -> str:
+    return name.strip().replace("台", "臺")
+
+
+class LocationCatalog:
+    def __init__(self, counties: dict[str, tuple[int, tuple[str, ...]]]):
+        self._towns: dict[tuple[str, str], Town] = {}
+        self._by_name: dict[str, list[Town]] = {}
+        for county, (num, towns) in counties.items():
+            for name in towns:
+                town = Town(county, name, f"F-D0047-{num:03}", f"F-D0047-{num + 2:03}")
+                self._towns[county, name] = town
+                self._by_name.setdefault(name, []).append(town)
+        self.counties = frozenset(counties)
+        self._options: tuple[str, ...] = None
+
+    def __len__(self):
+        return len(self._towns)
+
+    def lookup(self, county: str, town: str) -> Town | None:
+        return self._towns.get((normalize(county), normalize(town)))
+
+    def resolve(self, location: str) -> Town | None:
+        """The town of a "縣市-鄉鎮" string (any separator), or of a town name found in one county only."""
+        parts = [p for p in _SEPARATORS.split(location) if p]
+        if len(parts) >= 2:
+            return self.lookup(parts[0], parts[1])
+        if len(parts) == 1 and len(towns := self._by_name.get(normalize(parts[0]), ())) == 1:
+            return towns[0]
+        return None
+
+    def dataids(self, twice_daily: bool) -> tuple[str, ...]:
+        """F-D0047 dataset ids of every county, hourly or twice daily."""
+        return tuple(dict.fromkeys(t.twice_daily_dataid if twice_daily else t.hourly_dataid for t in self._towns.values()))
+
+    def options(self) -> tuple[str, ...]:
+        """"縣市-鄉鎮" of every town, the choices of the config flow."""
+        if self._options is None:
+            self._options = tuple(str(town) for town in self._towns.values())
+        return self._options
+
+
+catalog = LocationCatalog(TAIWAN_CITYS_TOWNS)
@@ -0,0 +1,170 @@
+# Timing and cache instrumentation of the fetch layer and the coordinator refresh.
+#   Cheap enough to be always on, read through diagnostics and the diagnostic sensors.
+
+import time
+import bisect
+from collections import Counter, deque
+from collections.abc import Callable
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# bucket upper bounds in milliseconds
+BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# the RefreshMetrics of the refresh running in the task, upstream requests are counted to it
+_refreshing: ContextVar["RefreshMetrics | None"] = ContextVar("cwaweather_refreshing", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets = BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = None
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.last = ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q) -> float | None:
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 2) if self.count else None,
+            "p50_ms": self.quantile(.5),
+            "p95_ms": self.quantile(.95),
+            "max_ms": round(self.max, 2),
+            "last_ms": round(self.last, 2) if self.last is not None else None,
+            "buckets": {f"le_{b}": n for b, n in zip(self.buckets + ("inf",), self.counts) if n},
+        }
+
+
+class DatasetMetrics:
+    def __init__(self):
+        self.latency = Histogram()
+        self.decode = Histogram()
+        self.parse = Histogram()
+        self.requests = 0           # sent upstream, retries, hedges and failed ones included
+        self.bytes_total = 0
+        self.bytes_last = 0
+        self.cache = Counter()      # hit / miss / stale (served from snapshot on a miss) / wait
+
+    def as_dict(self) -> dict:
+        lookups = self.cache["hit"] + self.cache["miss"]
+        return {
+            "latency": self.latency.as_dict(),
+            "decode": self.decode.as_dict(),
+            "parse": self.parse.as_dict(),
+            "requests": self.requests,
+            "bytes_total": self.bytes_total,
+            "bytes_last": self.bytes_last,
+            "cache": dict(self.cache),
+            "cache_hit_ratio": round(self.cache["hit"] / lookups, 3) if lookups else None,
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._datasets: dict[str, DatasetMetrics] = {}
+
+    def dataset(self, dataset) -> DatasetMetrics:
+        if (m := self._datasets.get(dataset)) is None:
+            m = self._datasets[dataset] = DatasetMetrics()
+        return m
+
+    def request(self, dataset):
+        """Count a request sent upstream, to the dataset and to the refresh that sent it."""
+        self.dataset(dataset).requests += 1
+        if (refresh := _refreshing.get()) is not None:
+            refresh.requests += 1
+
+    @contextmanager
+    def parse_timer(self, dataset):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.dataset(dataset).parse.add((time.perf_counter() - start) * 1000)
+
+    @property
+    def requests(self) -> int:
+        return sum(m.requests for m in self._datasets.values())
+
+    def diagnostics(self) -> dict:
+        return {str(k): m.as_dict() for k, m in self._datasets.items()}
+
+
+class RefreshMetrics:
+    """Per coordinator refresh duration, broken down by stage."""
+
+    def __init__(self, keep = 48):
+        self.total = Histogram()
+        self.stages: dict[str, Histogram] = {}
+        self.last: dict[str, float] = {}
+        self.recent = deque(maxlen=keep)    # last refreshes, about 8 hours at the 10 minute interval
+        self.changed = Counter()            # refreshes that changed each CWAWeatherData field
+        self.state_writes = Counter()       # entity state writes, by entity key
+        self.requests = 0                   # sent upstream by the refreshes, shared fetches count to the one sending them
+        self._listeners: list[Callable[[], None]] = []
+
+    def async_add_listener(self, update_callback: Callable[[], None]) -> Callable[[], None]:
+        """Call `update_callback` after every refresh, also the ones not changing the coordinator data."""
+        self._listeners.append(update_callback)
+        return lambda: self._listeners.remove(update_callback)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            if (h := self.stages.get(name)) is None:
+                h = self.stages[name] = Histogram()
+            h.add(ms)
+            self.last[name] = round(ms, 2)
+
+    @contextmanager
+    def refresh(self):
+        self.last = {}
+        token = _refreshing.set(self)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            _refreshing.reset(token)
+            ms = (time.perf_counter() - start) * 1000
+            self.total.add(ms)
+            self.recent.append({"at": round(time.time()), "total_ms": round(ms, 2), **self.last})
+            for update_callback in list(self._listeners):
+                update_callback()
+
+    def diagnostics(self) -> dict:
+        return {
+            "total": self.total.as_dict(),
+            "stages": {k: h.as_dict() for k, h in self.stages.items()},
+            "last": self.last,
+            "recent": list(self.recent),
+            "changed": dict(self.changed),
+            "state_writes": dict(self.state_writes),
+            "requests": self.requests,
+        }
+
+
+metrics = Metrics()
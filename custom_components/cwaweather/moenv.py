@@ -4,14 +4,18 @@ import logging
 import urllib.parse
 import asyncio
 from aiohttp import ClientResponseError
-from dataclasses import dataclass
-from .utils import url_get
+from dataclasses import dataclass, fields
+from .utils import url_get, float_fields, to_float
+from .metrics import metrics
+
+# rows per request of a paged query, the most the v2 API returns at once
+PAGE_SIZE = 1000
 
 async def _api_v2(session, dataset, params, is_json=True):
-    return await url_get(session, f"https://data.moenv.gov.tw/api/v2/{dataset}?{urllib.parse.urlencode(params)}", is_json=is_json)
+    return await url_get(session, f"https://data.moenv.gov.tw/api/v2/{dataset}?{urllib.parse.urlencode(params)}", is_json=is_json, dataset=dataset, api_key=params.get("api_key"))
 
 
-@dataclass
+@dataclass(slots=True)
 class AQIStation:
     aqi: float = None
     co: float = None
@@ -39,11 +43,59 @@ class AQIStation:
     wind_speed: float = None
     _distance: float = None
 
+# wire field name -> (AQIStation attribute, converter), built once instead of an annotation lookup per key and row.
+# The dotted upstream names ("pm2.5") are stored as pm2_5, either spelling is accepted.
+_AQI_CONVERTERS = {}
+for _f in fields(AQIStation):
+    if not _f.name.startswith("_"):
+        _AQI_CONVERTERS[_f.name] = _AQI_CONVERTERS[_f.name.replace("pm2_5", "pm2.5")] = (_f.name, to_float if _f.name in float_fields(AQIStation) else str)
+# the upstream columns queried, the ones read by the AQI sensors, the air quality entity (status is its state)
+# and AQIData.aqi_extra_attributes. The other AQIStation fields stay unset.
+AQI_FIELDS = ("siteid", "sitename", "county", "latitude", "longitude", "publishtime", "status", "pollutant", "aqi", "pm2.5", "pm10", "o3", "co", "so2", "no2", "no")
+
+
+class MOENVQuery:
+    """A v2 dataset query with the filtering and the projection done upstream.
+    Filters are sent as `field,EQ,value[,value...]`, several conditions joined by `|`."""
+
+    def __init__(self, dataset, api_key):
+        self.dataset = dataset
+        self.api_key = api_key
+        self._filters = []
+        self._fields = None
+
+    def where(self, field, *values) -> "MOENVQuery":
+        self._filters.append(f"{field},EQ,{','.join(values)}")
+        return self
+
+    def select(self, *names) -> "MOENVQuery":
+        self._fields = names
+        return self
+
+    def params(self, limit = PAGE_SIZE, offset = 0) -> dict:
+        params = {"api_key": self.api_key, "limit": limit, "offset": offset}
+        if self._filters:
+            params["filters"] = "|".join(self._filters)
+        if self._fields:
+            params["fields"] = ",".join(self._fields)
+        return params
+
+    async def records(self, session, page_size = PAGE_SIZE) -> list[dict]:
+        """Every matching record, page by page until a short page or the reported total."""
+        records = []
+        while True:
+            data = await _api_v2(session, self.dataset, self.params(page_size, len(records)))
+            page = data["records"]
+            records.extend(page)
+            total = data.get("total")
+            if len(page) < page_size or (total is not None and len(records) >= int(total)):
+                return records
+
 class MOENV:
     async def check_api_key(session, api_key):
         dataid = "AQX_P_432"
         try:
-            data = await _api_v2(session, dataid, {"api_key": api_key})
+            data = await _api_v2(session, dataid, MOENVQuery(dataid, api_key).select("siteid").params(limit=1))
             # print(data)
             # if not data.startswith("{"):
             #     return False
@@ -52,22 +104,25 @@ class MOENV:
             return False
 
     @staticmethod
-    async def get_aqi_hourly(session, api_key) -> list[AQIStation]:
+    async def get_aqi_hourly(session, api_key, siteids = None) -> list[AQIStation]:
+        """AQI of the given sites only, or of every site (paged) without siteids."""
         dataid = "AQX_P_432"
-        data = await _api_v2(session, dataid, {"api_key": api_key})
+        query = MOENVQuery(dataid, api_key).select(*AQI_FIELDS)
+        if siteids:
+            query.where("siteid", *siteids)
+        records = await query.records(session)
+        with metrics.parse_timer(dataid):
+            return MOENV._parse_aqi(records)
+
+    @staticmethod
+    def _parse_aqi(records) -> list[AQIStation]:
         res = []
-        for rec in  data["records"]:
+        for rec in records:
             s = AQIStation()
             for k, v in rec.items():
-                if v in ['', '-']:
+                if v == '' or v == '-' or (conv := _AQI_CONVERTERS.get(k)) is None:
                     continue
-                if k in s.__annotations__ or (k := k.replace(".", "_")) in s.__annotations__:
-                    if s.__annotations__[k] == float:
-                        setattr(s, k, float(v))
-                    elif s.__annotations__[k] == str:
-                        setattr(s, k, v)
-                    else:
-                        raise Exception(f"{s}, {k}, {v}")
+                setattr(s, conv[0], conv[1](v))
             res.append(s)
         return res
 
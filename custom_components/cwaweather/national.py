@@ -0,0 +1,89 @@
+# Forecasts of every town from one bulk F-D0047-093 request per issuance, shared by all entries in national mode.
+#   The payload is parsed once (in the executor) into columns: one list per forecast field, every town a range
+#   of rows, repeated values stored once. A town's forecasts are rebuilt from its rows when asked, so an entry
+#   tracking a zone across county lines needs no request until the next issuance.
+
+import logging
+from datetime import datetime
+from .cwa import CWA
+from .shared import SharedFeed
+from .locations import normalize
+from .metrics import metrics
+from .schedule import FORECAST
+
+_LOGGER = logging.getLogger(__name__)
+
+# a refresh is fetched again once a publication was served after the last fetch, so the entries refreshing
+# at their own time after an issuance share one request. A late publication is looked for this often.
+REFETCH_AFTER = 600
+
+
+class ForecastColumns:
+    def __init__(self, payload, twice_daily: bool):
+        parse = CWA._parse_forcast_twice_daily if twice_daily else CWA._parse_forcast_hourly
+        rows = []
+        # (county, town) -> first row, end row, latitude, longitude, geocode
+        self.towns: dict[tuple[str, str], tuple[int, int, float, float, str]] = {}
+        for locs in payload["records"]["Locations"]:
+            county = normalize(locs["LocationsName"])
+            for loc in locs["Location"]:
+                if (res := parse(loc)) is None:
+                    continue
+                start = len(rows)
+                rows.extend(res["Forecasts"])
+                self.towns[county, normalize(res["LocationName"])] = (start, len(rows), res["Latitude"], res["Longitude"], res["Geocode"])
+
+        pool = {}
+        self.columns: dict[str, list] = {
+            k: [pool.setdefault(v, v) if (v := row.get(k)) is not None else None for row in rows]
+            for k in dict.fromkeys(k for row in rows for k in row)
+        }
+        self.fetched = datetime.now().timestamp()
+
+    def __len__(self):
+        return len(self.towns)
+
+    def town(self, county: str, town: str) -> dict | None:
+        """The forecasts of a town, in the shape of CWA.get_forcast_hourly / get_forcast_twice_daily."""
+        if (row := self.towns.get((normalize(county), normalize(town)))) is None:
+            return None
+        start, stop, lat, lon, geocode = row
+        columns = self.columns.items()
+        return {
+            "Latitude": lat,
+            "Longitude": lon,
+            "LocationName": town,
+            "Geocode": geocode,
+            "Forecasts": [{k: col[i] for k, col in columns if col[i] is not None} for i in range(start, stop)],
+        }
+
+
+class NationalForecasts:
+    def __init__(self):
+        self._columns: dict[bool, ForecastColumns] = {}
+        self._shared = {kind: SharedFeed(f"national {'twice daily' if kind else 'hourly'} forecasts", REFETCH_AFTER) for kind in (False, True)}
+
+    async def town(self, hass, session, api_key, county, town, twice_daily = False, refresh = False) -> dict | None:
+        """A town's forecasts from the national index, fetched first when there is none yet or on `refresh`."""
+        shared = self._shared[twice_daily]
+
+        async def fetch():
+            payload = await CWA.get_forcast_all_towns(session, api_key, twice_daily)
+            with metrics.parse_timer("F-D0047-093"):
+                columns = self._columns[twice_daily] = await hass.async_add_executor_job(ForecastColumns, payload, twice_daily)
+            _LOGGER.debug("national %s forecasts of %d towns", "twice daily" if twice_daily else "hourly", len(columns))
+
+        def due(now) -> bool:
+            return refresh and (self._columns[twice_daily].fetched < FORECAST.last_served(datetime.now().astimezone()).timestamp() or shared.due(now))
+
+        await shared.async_update(fetch, has_data=lambda: twice_daily in self._columns, due=due)
+        return self._columns[twice_daily].town(county, town)
+
+    def diagnostics(self) -> dict:
+        return {
+            "twice_daily" if kind else "hourly": {"towns": len(c), "rows": len(next(iter(c.columns.values()), ())), "fetched": datetime.fromtimestamp(c.fetched).isoformat()}
+            for kind, c in self._columns.items()
+        }
+
+
+national = NationalForecasts()
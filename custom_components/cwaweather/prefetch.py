@@ -0,0 +1,107 @@
+# Fetches the datasets shared by the entries right after a publication is served, see schedule.py.
+#   The observations once for all entries, the forecasts once per town (spread over a few minutes, every
+#   town at its own phase) or the national index. The responses stay in the fetch cache until the next
+#   publication, the coordinators refreshing at their own phase afterwards find them there instead of all
+#   asking upstream when they notice the issuance. A failing prefetch is only logged, the coordinators
+#   fetch for themselves then.
+
+import asyncio
+import logging
+from functools import partial
+from datetime import datetime, timedelta
+from aiohttp import ClientError
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_utc_time
+from .cwa import CWA
+from .session import async_get_session
+from .resilience import CircuitOpenError
+from .national import national
+from .schedule import Publication, FORECAST, OBSERVATION, phase
+
+_LOGGER = logging.getLogger(__name__)
+
+# the towns' forecasts are fetched over this long after a publication is served
+FORECAST_WINDOW = timedelta(minutes=5)
+
+
+class Prefetcher:
+    def __init__(self):
+        self._coordinators = set()
+        self._unsubscribe = {}
+        # town key -> the cancel callback of its pending forecast prefetch
+        self._town_timers = {}
+
+    def register(self, coordinator):
+        """Prefetch for the entry of `coordinator` (a CWAWeatherCoordinator), returns the unregister callback."""
+        if not self._coordinators:
+            self._schedule(coordinator.hass, OBSERVATION, self._observations)
+            self._schedule(coordinator.hass, FORECAST, self._forecasts)
+        self._coordinators.add(coordinator)
+
+        @callback
+        def unregister():
+            self._coordinators.discard(coordinator)
+            towns = self._towns()
+            for key in [key for key in self._town_timers if key not in towns]:
+                self._town_timers.pop(key)()
+            if not self._coordinators:
+                for unsubscribe in self._unsubscribe.values():
+                    unsubscribe()
+                self._unsubscribe.clear()
+        return unregister
+
+    def _schedule(self, hass: HomeAssistant, publication: Publication, job):
+        async def run(now):
+            try:
+                await job(hass)
+            except Exception:
+                _LOGGER.exception("prefetch %s failed", job.__name__)
+            finally:
+                # the next publication is prefetched whatever happened to this one
+                if self._coordinators:
+                    self._schedule(hass, publication, job)
+
+        self._unsubscribe[job] = async_track_point_in_utc_time(hass, run, publication.next_served(datetime.now().astimezone()))
+
+    def _towns(self) -> dict:
+        """Town key -> a coordinator of an entry in the town, "national" for the entries on the national index."""
+        towns = {}
+        for c in self._coordinators:
+            if c._town is not None:
+                towns.setdefault("national" if c._national else f"{c._city}-{c._town}", c)
+        return towns
+
+    async def _observations(self, hass: HomeAssistant):
+        if coordinators := [c for c in self._coordinators if c.observation.wanted()]:
+            await _quietly(CWA.get_observation_stations(async_get_session(hass), coordinators[0]._api_key))
+
+    async def _forecasts(self, hass: HomeAssistant):
+        served = FORECAST.last_served(datetime.now().astimezone())
+        for key in self._towns():
+            if (unsubscribe := self._town_timers.pop(key, None)) is not None:
+                unsubscribe()
+            self._town_timers[key] = async_track_point_in_utc_time(hass, partial(self._forecast, hass, key), served + timedelta(seconds=phase(key, FORECAST_WINDOW)))
+
+    async def _forecast(self, hass: HomeAssistant, key, now):
+        self._town_timers.pop(key, None)
+        # an entry of the town still set up, the one the prefetch was scheduled for may be gone
+        if (c := self._towns().get(key)) is None:
+            return
+        session = async_get_session(hass)
+        for twice_daily in (False, True) if c.wants_twice_daily() else (False,):
+            if c._national:
+                await _quietly(national.town(hass, session, c._api_key, c._city, c._town, twice_daily, refresh=True))
+            elif twice_daily:
+                await _quietly(CWA.get_forcast_twice_daily(session, c._api_key, c._city, c._town))
+            else:
+                await _quietly(CWA.get_forcast_hourly(session, c._api_key, c._city, c._town))
+
+
+async def _quietly(coro):
+    try:
+        await coro
+    except (ClientError, asyncio.TimeoutError, CircuitOpenError, ValueError) as err:
+        _LOGGER.debug("prefetch failed: %r", err)
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,119 @@
+# On demand profiling of the coordinator refresh path.
+#   cwaweather.profile_refresh runs N refresh cycles of an entry under cProfile, optionally with tracemalloc
+#   allocation snapshots, and writes the report into the config directory.
+#   The always on part is the per stage timing in metrics.RefreshMetrics, see diagnostics.
+
+import io
+import time
+import logging
+from datetime import datetime
+import voluptuous as vol
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from .utils import cache_clear
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_PROFILE_REFRESH = "profile_refresh"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_CYCLES = "cycles"
+ATTR_TRACEMALLOC = "tracemalloc"
+ATTR_COLD = "cold"
+
+PROFILE_REFRESH_SCHEMA = vol.Schema({
+    vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+    vol.Optional(ATTR_CYCLES, default=5): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+    vol.Optional(ATTR_TRACEMALLOC, default=False): cv.boolean,
+    vol.Optional(ATTR_COLD, default=False): cv.boolean,
+})
+
+TOP_FUNCTIONS = 60
+TOP_ALLOCATIONS = 30
+
+
+async def _async_profile_refresh(hass: HomeAssistant, coordinator, cycles, trace_malloc, cold) -> dict:
+    # only loaded when asked for
+    import pstats
+    import cProfile
+    import tracemalloc
+
+    profiler = cProfile.Profile()
+    durations = []
+    stages = []
+    snapshot_before = None
+    started_tracemalloc = False
+
+    if trace_malloc:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            started_tracemalloc = True
+        snapshot_before = tracemalloc.take_snapshot()
+
+    try:
+        for _ in range(cycles):
+            if cold:
+                # every cycle fetches, decodes and parses everything again
+                cache_clear()
+                coordinator.force_refresh()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                await coordinator.async_refresh_all()
+            finally:
+                profiler.disable()
+            durations.append((time.perf_counter() - start) * 1000)
+            stages.append({k: v for c in coordinator.coordinators for k, v in c.refresh_metrics.last.items()})
+
+        snapshot_after = tracemalloc.take_snapshot() if trace_malloc else None
+    finally:
+        if started_tracemalloc:
+            tracemalloc.stop()
+
+    out = io.StringIO()
+    out.write(f"# {coordinator.name} refresh profile, {datetime.now().isoformat()}\n")
+    out.write(f"# cycles: {cycles}, cold: {cold}, tracemalloc: {trace_malloc}\n")
+    out.write("# other event loop tasks running during the refreshes are included in the profile\n\n")
+    out.write("## refresh durations (ms)\n")
+    for i, (ms, st) in enumerate(zip(durations, stages)):
+        out.write(f"{i + 1:>3} {ms:>10.2f}  {st}\n")
+
+    out.write("\n## cProfile, by cumulative time\n")
+    pstats.Stats(profiler, stream=out).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+    out.write("\n## cProfile, by own time\n")
+    pstats.Stats(profiler, stream=out).sort_stats(pstats.SortKey.TIME).print_stats(TOP_FUNCTIONS)
+
+    if snapshot_after is not None:
+        out.write("\n## tracemalloc, allocations grown over the cycles\n")
+        for stat in snapshot_after.compare_to(snapshot_before, "lineno")[:TOP_ALLOCATIONS]:
+            out.write(f"{stat}\n")
+
+    path = hass.config.path(f"{DOMAIN}_profile_{coordinator.config_entry.entry_id}_{datetime.now():%Y%m%d_%H%M%S}.txt")
+    await hass.async_add_executor_job(_write, path, out.getvalue())
+    _LOGGER.info("refresh profile of %s written to %s", coordinator.name, path)
+    return {
+        "path": path,
+        "durations_ms": [round(ms, 2) for ms in durations],
+    }
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    async def _async_profile_refresh_service(call: ServiceCall) -> ServiceResponse:
+        entry_id = call.data[ATTR_CONFIG_ENTRY_ID]
+        if (entry := hass.config_entries.async_get_entry(entry_id)) is None or entry.domain != DOMAIN or not hasattr(entry, "runtime_data"):
+            raise ServiceValidationError(f"{entry_id} is not a loaded {DOMAIN} entry")
+        return await _async_profile_refresh(hass, entry.runtime_data, call.data[ATTR_CYCLES], call.data[ATTR_TRACEMALLOC], call.data[ATTR_COLD])
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE_REFRESH,
+        _async_profile_refresh_service,
+        schema=PROFILE_REFRESH_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
@@ -0,0 +1,133 @@
+# Token bucket rate limiting and daily quota accounting per API key and host.
+#   All config entries sharing one key share one budget, so many entries can't trip upstream throttling together.
+
+import logging
+import time
+import asyncio
+import hashlib
+from collections import Counter
+from datetime import date
+from .session import HOST_CWA, HOST_MOENV
+
+_LOGGER = logging.getLogger(__name__)
+
+# (requests per second, burst, daily quota)
+HOST_RATES = {
+    HOST_CWA: (2.0, 20, 20000),
+    HOST_MOENV: (1.0, 10, 10000),
+}
+DEFAULT_RATE = (1.0, 10, 10000)
+
+# datasets nobody is waiting on interactively, they back off first when a budget runs low.
+BACKGROUND_DATASETS = {"E-A0015-001", "E-A0016-001", "W-C0033-001", "W-C0033-002", "W-C0034-005"}
+BACKGROUND_RESERVE = 0.5
+
+MAX_INTERVAL_SCALE = 4
+
+
+def key_id(api_key) -> str:
+    """Short stable id of an API key, safe to log and show."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:8] if api_key else "-"
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, reserve = 0.0):
+        # keep `reserve` tokens free for callers without one
+        need = 1 + reserve * self.burst
+        while True:
+            self._refill()
+            if self.tokens >= need:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((need - self.tokens) / self.rate)
+
+    @property
+    def level(self) -> float:
+        self._refill()
+        return self.tokens / self.burst
+
+
+class KeyBudget:
+    def __init__(self, host):
+        self.host = host
+        rate, burst, self.quota = HOST_RATES.get(host, DEFAULT_RATE)
+        self.bucket = TokenBucket(rate, burst)
+        self.day = date.today()
+        self.count = 0
+        self.datasets = Counter()
+        self.waits = 0
+
+    def _roll(self):
+        if (today := date.today()) != self.day:
+            self.day = today
+            self.count = 0
+            self.datasets.clear()
+
+    async def acquire(self, dataset):
+        self._roll()
+        reserve = BACKGROUND_RESERVE if dataset in BACKGROUND_DATASETS else 0.0
+        if self.bucket.level * self.bucket.burst < 1 + reserve * self.bucket.burst:
+            self.waits += 1
+        await self.bucket.acquire(reserve)
+        self.count += 1
+        self.datasets[dataset] += 1
+        if self.count == self.quota:
+            _LOGGER.warning("%s daily quota %d reached", self.host, self.quota)
+
+    @property
+    def pressure(self) -> float:
+        self._roll()
+        return max(1 - self.bucket.level, self.count / self.quota)
+
+
+class RateLimiter:
+    def __init__(self):
+        self._budgets: dict[tuple[str, str], KeyBudget] = {}
+
+    def _budget(self, api_key, host) -> KeyBudget:
+        k = (key_id(api_key), host)
+        if (budget := self._budgets.get(k)) is None:
+            budget = self._budgets[k] = KeyBudget(host)
+        return budget
+
+    async def acquire(self, api_key, host, dataset):
+        await self._budget(api_key, host).acquire(dataset)
+
+    def pressure(self, api_key, host) -> float:
+        return self._budget(api_key, host).pressure
+
+    def interval_scale(self, api_key, host) -> float:
+        """Refresh interval multiplier for background datasets, grows from 1 when the budget is over half used."""
+        pressure = self.pressure(api_key, host)
+        if pressure <= 0.5:
+            return 1
+        return 1 + (MAX_INTERVAL_SCALE - 1) * (pressure - 0.5) * 2
+
+    def diagnostics(self) -> dict:
+        res = {}
+        for (kid, host), budget in self._budgets.items():
+            res[f"{kid}@{host}"] = {
+                "day": budget.day.isoformat(),
+                "requests_today": budget.count,
+                "daily_quota": budget.quota,
+                "quota_used": round(budget.count / budget.quota, 4),
+                "bucket_level": round(budget.bucket.level, 3),
+                "throttled_waits": budget.waits,
+                "pressure": round(budget.pressure, 3),
+                "datasets": dict(budget.datasets),
+            }
+        return res
+
+
+limiter = RateLimiter()
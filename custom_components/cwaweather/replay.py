@@ -0,0 +1,181 @@
+# Record / replay transport for the fetch layer.
+#   Record: every upstream response (url with the key redacted, status, latency, body) is appended to a gzip json-lines archive.
+#   Replay: the archive answers the requests instead of the network, with the recorded latency optionally scaled,
+#   so a busy day captured once can be replayed deterministically for profiling, benchmarks and coordinator regression runs.
+#
+#   CWAWEATHER_RECORD=/config/cwaweather-record.jsonl.gz
+#   CWAWEATHER_REPLAY=/config/cwaweather-record.jsonl.gz  CWAWEATHER_REPLAY_SCALE=0.1
+
+import gzip
+import json
+import time
+import base64
+import asyncio
+import logging
+from collections import deque
+from types import SimpleNamespace
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from aiohttp import ClientResponseError
+
+_LOGGER = logging.getLogger(__name__)
+
+SECRET_PARAMS = {"Authorization", "api_key"}
+REDACTED = "REDACTED"
+FLUSH_EVERY = 20
+
+
+def redact_url(url) -> str:
+    parts = urlsplit(url)
+    query = [(k, REDACTED if k in SECRET_PARAMS else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _encode_body(entry, body: bytes):
+    try:
+        entry["body"] = body.decode("utf-8")
+    except UnicodeDecodeError:
+        entry["body_b64"] = base64.b64encode(body).decode()
+
+
+def _decode_body(entry) -> bytes:
+    if "body_b64" in entry:
+        return base64.b64decode(entry["body_b64"])
+    return entry.get("body", "").encode("utf-8")
+
+
+class BufferedResponse:
+    """Fully read response, answers the subset of ClientResponse the fetch layer uses."""
+
+    def __init__(self, url, status, body: bytes, encoding = "utf-8"):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.encoding = encoding
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise ClientResponseError(SimpleNamespace(real_url=self.url), (), status=self.status, message="replayed")
+
+    def get_encoding(self):
+        return self.encoding
+
+    async def read(self):
+        return self.body
+
+    async def text(self):
+        return self.body.decode(self.encoding)
+
+
+class _Request:
+    def __init__(self, coro):
+        self._coro = coro
+
+    async def __aenter__(self):
+        return await self._coro
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class RecordingSession:
+    def __init__(self, inner, path):
+        self._inner = inner
+        self._path = path
+        self._pending: list[dict] = []
+        self._lock = asyncio.Lock()
+        self.recorded = 0
+
+    def get(self, url, **kwargs):
+        return _Request(self._get(url, **kwargs))
+
+    async def _get(self, url, **kwargs):
+        entry = {"url": redact_url(url), "ts": time.time()}
+        start = time.monotonic()
+        try:
+            async with self._inner.get(url, **kwargs) as response:
+                body = await response.read()
+                res = BufferedResponse(url, response.status, body, response.get_encoding())
+            entry["status"] = response.status
+            _encode_body(entry, body)
+            return res
+        except Exception as err:
+            entry["error"] = type(err).__name__
+            raise
+        finally:
+            entry["latency"] = round(time.monotonic() - start, 4)
+            self._pending.append(entry)
+            if len(self._pending) >= FLUSH_EVERY:
+                await self.async_flush()
+
+    def _write(self, entries):
+        with gzip.open(self._path, "at", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    async def async_flush(self):
+        async with self._lock:
+            entries, self._pending = self._pending, []
+            if entries:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, entries)
+                self.recorded += len(entries)
+
+    async def async_close(self):
+        await self.async_flush()
+        if hasattr(self._inner, "async_close"):
+            await self._inner.async_close()
+
+    def diagnostics(self) -> dict:
+        res = self._inner.diagnostics() if hasattr(self._inner, "diagnostics") else {}
+        return {**res, "recording": {"path": str(self._path), "recorded": self.recorded + len(self._pending)}}
+
+
+class ReplaySession:
+    """Serves recorded responses, per url in recorded order, the last one repeats once exhausted."""
+
+    def __init__(self, path, scale = 1.0):
+        self._path = path
+        self.scale = scale
+        self._entries: dict[str, deque] | None = None
+        self._lock = asyncio.Lock()
+        self.served = 0
+        self.missed = 0
+
+    def _load(self):
+        entries = {}
+        with gzip.open(self._path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                entries.setdefault(entry["url"], deque()).append(entry)
+        return entries
+
+    async def _async_load(self):
+        async with self._lock:
+            if self._entries is None:
+                self._entries = await asyncio.get_running_loop().run_in_executor(None, self._load)
+                _LOGGER.info("replaying %d urls from %s", len(self._entries), self._path)
+
+    def get(self, url, **kwargs):
+        return _Request(self._get(url))
+
+    async def _get(self, url):
+        if self._entries is None:
+            await self._async_load()
+
+        if (entries := self._entries.get(redact_url(url))) is None:
+            self.missed += 1
+            _LOGGER.warning("%s not recorded", redact_url(url))
+            return BufferedResponse(url, 404, b"")
+
+        entry = entries.popleft() if len(entries) > 1 else entries[0]
+        if self.scale and entry.get("latency"):
+            await asyncio.sleep(entry["latency"] * self.scale)
+        self.served += 1
+        if "error" in entry:
+            raise asyncio.TimeoutError() if "Timeout" in entry["error"] else ClientResponseError(SimpleNamespace(real_url=url), (), status=503, message=entry["error"])
+        return BufferedResponse(url, entry["status"], _decode_body(entry))
+
+    async def async_close(self):
+        pass
+
+    def diagnostics(self) -> dict:
+        return {"replay": {"path": str(self._path), "scale": self.scale, "served": self.served, "missed": self.missed}}
@@ -0,0 +1,155 @@
+# Retry, hedging and circuit breaker policies for the fetch layer.
+#   A refresh is bounded by the dataset deadline instead of by the slowest government server,
+#   and a host that keeps failing is skipped while the last good response is served.
+
+import time
+import random
+from collections import deque, OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 3
+    backoff: float = 1.0        # first retry delay, doubled every retry
+    backoff_max: float = 8.0
+    deadline: float = 30.0      # whole fetch including retries
+    hedge: bool = False         # fire a second request after the p95 latency
+    snapshot: bool = True       # keep the last good response to serve while the host fails
+
+    def delay(self, attempt) -> float:
+        # full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+
+
+DATASET_POLICIES = {
+    "O-A0001-001": RetryPolicy(hedge=True),
+    "O-A0003-001": RetryPolicy(hedge=True),
+    "F-D0047-089": RetryPolicy(deadline=45),
+    "F-D0047-091": RetryPolicy(deadline=45),
+    # every town of the country, tens of MB. The national index keeps its last build instead of a snapshot.
+    "F-D0047-093": RetryPolicy(attempts=2, deadline=120, snapshot=False),
+    "AQX_P_432": RetryPolicy(hedge=True),
+    "TownVillagePointQuery": RetryPolicy(attempts=2, deadline=15),
+}
+# by dataset id prefix, for the ids not listed above, see session.DATASET_PREFIX_TIMEOUTS
+DATASET_PREFIX_POLICIES = {
+    "F-D0047-": RetryPolicy(deadline=70),
+}
+DEFAULT_POLICY = RetryPolicy()
+
+
+def policy_for(dataset) -> RetryPolicy:
+    if (policy := DATASET_POLICIES.get(dataset)) is None:
+        policy = next((p for prefix, p in DATASET_PREFIX_POLICIES.items() if dataset and dataset.startswith(prefix)), DEFAULT_POLICY)
+    return policy
+
+
+class LatencyTracker:
+    """Recent latencies per dataset, for the hedge delay."""
+    MIN_SAMPLES = 20
+
+    def __init__(self, size = 100):
+        self._size = size
+        self._samples: dict[str, deque] = {}
+
+    def add(self, dataset, latency):
+        if (samples := self._samples.get(dataset)) is None:
+            samples = self._samples[dataset] = deque(maxlen=self._size)
+        samples.append(latency)
+
+    def p95(self, dataset) -> float | None:
+        samples = self._samples.get(dataset)
+        if samples is None or len(samples) < self.MIN_SAMPLES:
+            return None
+        return sorted(samples)[int(len(samples) * 0.95)]
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host):
+        super().__init__(f"circuit open for {host}")
+        self.host = host
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold = 5, reset_timeout = 120):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_at: float = None
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            # let one probe through, the other callers are rejected until it settles the state
+            self.state = self.HALF_OPEN
+            self.probe_at = now
+            return True
+        if self.state == self.HALF_OPEN and now - self.probe_at >= self.reset_timeout:
+            # the probe never settled (cancelled, or a client error saying nothing about the host), probe again
+            self.probe_at = now
+            return True
+        return False
+
+    def success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probe_at = None
+
+    def failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.probe_at = None
+
+
+class Breakers:
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, host) -> CircuitBreaker:
+        if (breaker := self._breakers.get(host)) is None:
+            breaker = self._breakers[host] = CircuitBreaker()
+        return breaker
+
+    def diagnostics(self) -> dict:
+        return {host: {"state": b.state, "failures": b.failures, "trips": b.trips} for host, b in self._breakers.items()}
+
+
+class SnapshotStore:
+    """Last good response per url, bounded LRU."""
+
+    def __init__(self, size = 64):
+        self._size = size
+        self._data: OrderedDict = OrderedDict()
+
+    def put(self, url, data):
+        self._data[url] = (time.time(), data)
+        self._data.move_to_end(url)
+        while len(self._data) > self._size:
+            self._data.popitem(last=False)
+
+    def get(self, url):
+        if (item := self._data.get(url)) is not None:
+            self._data.move_to_end(url)
+        return item
+
+    def __len__(self):
+        return len(self._data)
+
+
+latencies = LatencyTracker()
+breakers = Breakers()
+snapshots = SnapshotStore()
@@ -0,0 +1,83 @@
+# The last data of an entry kept in .storage, so the entities come up with it after a restart.
+#   The position, the forecast periods, the observation and the AQI station are saved a while after they
+#   changed. At setup they are restored before the platforms are set up, the first network refresh then
+#   runs in the background and only fetches what is due: a forecast of the current issuance is kept.
+
+import logging
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 60
+
+# older ones are not shown at all, the entities stay unknown until the first refresh
+OBSERVATION_MAX_AGE = timedelta(hours=1)
+AQI_MAX_AGE = timedelta(hours=3)
+FORECAST_MAX_AGE = timedelta(days=2)
+
+
+def _dump_periods(store) -> list[dict] | None:
+    if store is None:
+        return None
+    return [{**asdict(p), "time": p.time.isoformat()} for p in store.periods]
+
+
+class EntryStore:
+    def __init__(self, hass: HomeAssistant, entry_id: str):
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
+
+    def schedule_save(self, coordinator):
+        self._store.async_delay_save(lambda: self._dump(coordinator), SAVE_DELAY)
+
+    async def async_save(self, coordinator):
+        await self._store.async_save(self._dump(coordinator))
+
+    async def async_remove(self):
+        await self._store.async_remove()
+
+    def _dump(self, coordinator) -> dict:
+        res = {
+            "saved": datetime.now().astimezone().isoformat(),
+            "position": {"county": coordinator._city, "town": coordinator._town, "latitude": coordinator._latitude, "longitude": coordinator._longitude},
+        }
+        if (data := coordinator.data) is not None and data.hourly is not None:
+            res["forecast"] = {
+                "fetched": data.forecast_fetched.isoformat() if data.forecast_fetched else None,
+                "hourly": _dump_periods(data.hourly),
+                "twice_daily": _dump_periods(data.twice_daily),
+            }
+        if (obs := coordinator.observation.data) is not None:
+            res["observation"] = asdict(obs)
+        if (aqi := coordinator.aqi.data) is not None and aqi.aqi_station is not None:
+            res["aqi"] = {
+                "publishtime": aqi.aqi_publishtime.isoformat(),
+                "station": asdict(aqi.aqi_station),
+                "attributes": aqi.aqi_extra_attributes,
+            }
+        return res
+
+    async def async_load(self) -> dict | None:
+        """The saved data, with the parts too old to show left out."""
+        try:
+            stored = await self._store.async_load()
+        except Exception as err:
+            # a broken file only costs the restored values
+            _LOGGER.warning("%s: stored data unreadable: %r", self._store.key, err)
+            return None
+        if not stored:
+            return None
+
+        now = datetime.now().astimezone()
+        saved = datetime.fromisoformat(stored["saved"])
+        if now - saved > FORECAST_MAX_AGE:
+            stored.pop("forecast", None)
+        if now - saved > OBSERVATION_MAX_AGE:
+            stored.pop("observation", None)
+        if (aqi := stored.get("aqi")) is not None and now - datetime.fromisoformat(aqi["publishtime"]) > AQI_MAX_AGE:
+            stored.pop("aqi")
+        return stored
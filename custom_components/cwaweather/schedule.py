@@ -0,0 +1,86 @@
+# Publication times of the upstream datasets, and the refresh times derived from them.
+#   A dataset published on a fixed schedule is cached until its next publication is served (at most max_age),
+#   instead of the default minute, so entries refreshing at different times share one request per publication.
+#   Every coordinator refreshes at its own fixed phase of the interval (a hash of its name) instead of in
+#   lockstep from the setup, and the prefetcher fetches the shared datasets right after they are served.
+#   The lags are estimates, a publication served later than that is fetched again after max_age.
+
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+TZ = timezone(timedelta(hours=8))
+
+# the interval of every coordinator
+REFRESH_INTERVAL = timedelta(minutes=10)
+# a refresh closer than this to the last one waits for the next interval
+MIN_WAIT = 30
+# cache lifetime of the datasets without a publication schedule, seconds
+DEFAULT_CACHE_TTL = 60
+
+
+@dataclass(frozen=True)
+class Publication:
+    period: timedelta
+    offset: timedelta = timedelta(0)        # first publication of the day, Taiwan time
+    lag: timedelta = timedelta(minutes=5)   # until the publication is served
+    max_age: float = 600                    # seconds a response is cached at most
+
+    def latest(self, now: datetime) -> datetime:
+        """The last publication served by `now`."""
+        local = (now - self.lag).astimezone(TZ)
+        day = local.replace(hour=0, minute=0, second=0, microsecond=0)
+        return day + self.offset + ((local - day - self.offset) // self.period) * self.period
+
+    def last_served(self, now: datetime) -> datetime:
+        return self.latest(now) + self.lag
+
+    def next_served(self, now: datetime) -> datetime:
+        return self.last_served(now) + self.period
+
+
+# 發布時機：每日 05:30、11:30、17:30、23:30, for every F-D0047 county dataset
+FORECAST = Publication(timedelta(hours=6), offset=timedelta(hours=5, minutes=30), lag=timedelta(minutes=10), max_age=900)
+OBSERVATION = Publication(timedelta(minutes=10), lag=timedelta(minutes=4))
+AQI = Publication(timedelta(hours=1), lag=timedelta(minutes=6))
+# 溫度分析格點資料, hourly
+TEMPERATURE_GRID = Publication(timedelta(hours=1), lag=timedelta(minutes=20))
+
+DATASET_PUBLICATIONS = {
+    "O-A0001-001": OBSERVATION,
+    "O-A0003-001": OBSERVATION,
+    "AQX_P_432": AQI,
+    # the national index keeps its own build, the tens of MB payload isn't kept around
+    "F-D0047-093": None,
+    # the grids are kept decoded on disk, see grid.py
+    "O-A0038-001": None,
+}
+
+
+def publication_for(dataset) -> Publication | None:
+    if dataset in DATASET_PUBLICATIONS:
+        return DATASET_PUBLICATIONS[dataset]
+    if dataset and dataset.startswith("F-D0047-"):
+        return FORECAST
+    return None
+
+
+def cache_expiry(dataset, ts: float) -> float:
+    """When a response of `dataset` fetched at `ts` leaves the fetch cache."""
+    if (pub := publication_for(dataset)) is None:
+        return ts + DEFAULT_CACHE_TTL
+    return min(pub.next_served(datetime.fromtimestamp(ts, TZ)).timestamp(), ts + pub.max_age)
+
+
+def phase(key: str, period: timedelta) -> float:
+    """A fixed offset in seconds within `period` for `key`, spread evenly over the keys."""
+    return zlib.crc32(key.encode()) / 2**32 * period.total_seconds()
+
+
+def next_refresh(key: str, now: datetime, interval: timedelta = REFRESH_INTERVAL) -> timedelta:
+    """The time from `now` to the next refresh of `key`, every `interval` at the phase of `key`."""
+    seconds = interval.total_seconds()
+    wait = (phase(key, interval) - now.timestamp()) % seconds
+    if wait < MIN_WAIT:
+        wait += seconds
+    return timedelta(seconds=wait)
@@ -1,5 +1,7 @@
+import time
 import logging
 from dataclasses import dataclass
+from datetime import timedelta
 from typing import Any
 from collections.abc import Callable
 from homeassistant.core import HomeAssistant
@@ -7,32 +9,60 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.components.sensor import SensorEntityDescription, SensorDeviceClass, SensorEntity, SensorStateClass
-from homeassistant.const import PERCENTAGE, CONCENTRATION_MICROGRAMS_PER_CUBIC_METER, CONCENTRATION_PARTS_PER_MILLION
-from .coordinator import CWAWeatherCoordinator, CWAWeatherData
+from homeassistant.const import PERCENTAGE, CONCENTRATION_MICROGRAMS_PER_CUBIC_METER, CONCENTRATION_PARTS_PER_MILLION, EntityCategory, UnitOfTime, UnitOfLength
+from .coordinator import CWAWeatherCoordinator, HAS_NUMPY, DATASET_FORECAST, DATASET_TWICE_DAILY, DATASET_OBSERVATION, DATASET_AQI, DATASET_CYCLONE, DATASET_GRID
 from .const import (
     DOMAIN,
     ATTRIBUTION_CWA,
     ATTRIBUTION_MOENV,
+    STATE_MAX_AGE,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
 @dataclass(frozen=True, kw_only=True)
 class CommonSensorEntityDescription(SensorEntityDescription):
-    native_value_fn: Callable[[CWAWeatherData], float | None]
+    native_value_fn: Callable[[Any], float | None]
+    # the data fields the value comes from, the entity is skipped when a refresh changed none of them
+    fields: frozenset[str] = frozenset()
+    # a new value within deadband of the written one is held back, until the last write is max_age old
+    deadband: float = 0
+    max_age: timedelta | None = None
+    # what the value is read from, decides the coordinators the entity listens to, see DATASETS_ALL
+    datasets: frozenset[str] = frozenset({DATASET_FORECAST})
+    attributes_fn: Callable[[Any], dict | None] | None = None
+
+
+def _is_due(description: CommonSensorEntityDescription, written_at) -> bool:
+    return description.max_age is not None and time.monotonic() - written_at >= description.max_age.total_seconds()
+
+
+def _is_changed(description: CommonSensorEntityDescription, old, new) -> bool:
+    if old is None or new is None or not description.deadband:
+        return old != new
+    # station values come in 0.1 steps, keep a 0.1 step within a 0.1 deadband despite float rounding
+    return abs(new - old) > description.deadband + 1e-9
+
 
 SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
     CommonSensorEntityDescription(
         key="temperature",
         translation_key="temperature",
-        native_value_fn=lambda data: data.native_temperature,
+        native_value_fn=lambda coordinator: coordinator.current("native_temperature"),
+        fields=frozenset({"native_temperature"}),
+        datasets=frozenset({DATASET_OBSERVATION, DATASET_FORECAST}),
+        deadband=0.1,
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.TEMPERATURE,
         native_unit_of_measurement=CWAWeatherCoordinator.native_temperature_unit,
     ),
     CommonSensorEntityDescription(
         key="apparent_temperature",
         translation_key="apparent_temperature",
-        native_value_fn=lambda data: data.native_apparent_temperature,
+        native_value_fn=lambda coordinator: coordinator.current("native_apparent_temperature"),
+        fields=frozenset({"native_apparent_temperature"}),
+        deadband=0.1,
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.TEMPERATURE,
         native_unit_of_measurement=CWAWeatherCoordinator.native_temperature_unit,
         entity_registry_enabled_default=False,
@@ -40,14 +70,22 @@ SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
     CommonSensorEntityDescription(
         key="humidity",
         translation_key="humidity",
-        native_value_fn=lambda data: data.humidity,
+        native_value_fn=lambda coordinator: coordinator.current("humidity"),
+        fields=frozenset({"humidity"}),
+        datasets=frozenset({DATASET_OBSERVATION, DATASET_FORECAST}),
+        deadband=1,
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.HUMIDITY,
         native_unit_of_measurement=PERCENTAGE,
     ),
     CommonSensorEntityDescription(
         key="pressure",
         translation_key="pressure",
-        native_value_fn=lambda data: data.native_pressure,
+        native_value_fn=lambda coordinator: coordinator.current("native_pressure"),
+        fields=frozenset({"native_pressure"}),
+        datasets=frozenset({DATASET_OBSERVATION}),
+        deadband=0.1,
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.ATMOSPHERIC_PRESSURE,
         native_unit_of_measurement=CWAWeatherCoordinator.native_pressure_unit,
         entity_registry_enabled_default=False,
@@ -55,7 +93,10 @@ SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
     CommonSensorEntityDescription(
         key="dew_point",
         translation_key="dew_point",
-        native_value_fn=lambda data: data.native_dew_point,
+        native_value_fn=lambda coordinator: coordinator.current("native_dew_point"),
+        fields=frozenset({"native_dew_point"}),
+        deadband=0.1,
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.TEMPERATURE,
         native_unit_of_measurement=CWAWeatherCoordinator.native_temperature_unit,
         entity_registry_enabled_default=False,
@@ -63,14 +104,20 @@ SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
     CommonSensorEntityDescription(
         key="uv_index",
         translation_key="uv_index",
-        native_value_fn=lambda data: data.uv_index,
+        native_value_fn=lambda coordinator: coordinator.current("uv_index"),
+        fields=frozenset({"uv_index"}),
+        datasets=frozenset({DATASET_TWICE_DAILY}),
+        max_age=STATE_MAX_AGE,
         native_unit_of_measurement=CWAWeatherCoordinator.uv_index_unit,
         entity_registry_enabled_default=False,
     ),
     CommonSensorEntityDescription(
         key="wind_speed",
         translation_key="wind_speed",
-        native_value_fn=lambda data: data.native_wind_speed,
+        native_value_fn=lambda coordinator: coordinator.current("native_wind_speed"),
+        fields=frozenset({"native_wind_speed"}),
+        deadband=0.1,
+        max_age=STATE_MAX_AGE,
         native_unit_of_measurement=CWAWeatherCoordinator.native_wind_speed_unit,
         entity_registry_enabled_default=False,
     ),
@@ -82,17 +129,39 @@ class CWAWeatherSensorEntity(CoordinatorEntity, SensorEntity):
     _attr_state_class = SensorStateClass.MEASUREMENT
 
     def __init__(self, coordinator: CWAWeatherCoordinator, description: CommonSensorEntityDescription):
-        super().__init__(coordinator)
+        # bound to the coordinator of its own data, listening to the others it falls back to
+        self._sources = coordinator.coordinators_for(description.datasets)
+        super().__init__(self._sources[0], context=description.datasets)
+        self._main = coordinator
         self.entity_description = description
         self._attr_device_info = coordinator.device_info
         self._attr_unique_id = f"{coordinator.config_entry.entry_id}-{description.key}"
-        self._attr_native_value = self.entity_description.native_value_fn(self.coordinator.data)
+        self._attr_native_value = self._value()
+        self._written_at = time.monotonic()
+        self._held = False
+
+    def _value(self):
+        return self.entity_description.native_value_fn(self._main)
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        for coordinator in self._sources[1:]:
+            self.async_on_remove(coordinator.async_add_listener(self._handle_coordinator_update, self.coordinator_context))
 
     def _handle_coordinator_update(self) -> None:
-        if (val := self.entity_description.native_value_fn(self.coordinator.data)) != self._attr_native_value:
-            _LOGGER.debug(f"Updating sensor {self.coordinator.name} {self.entity_description.key} from {self._attr_native_value} to {val}")
+        description = self.entity_description
+        if description.fields and all(description.fields.isdisjoint(c.changed_fields) for c in self._sources) and not self._held:
+            return
+        val = self._value()
+        if _is_changed(description, self._attr_native_value, val) or (val != self._attr_native_value and _is_due(description, self._written_at)):
+            _LOGGER.debug(f"Updating sensor {self._main.name} {description.key} from {self._attr_native_value} to {val}")
             self._attr_native_value = val
+            self._written_at = time.monotonic()
+            self._held = False
+            self._main.refresh_metrics.state_writes[description.key] += 1
             self.async_write_ha_state()
+        else:
+            self._held = val != self._attr_native_value
 
 
 MOENV_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
@@ -100,6 +169,9 @@ MOENV_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
         key="aqi",
         translation_key="aqi",
         native_value_fn=lambda aqi: aqi.aqi,
+        fields=frozenset({"aqi_station"}),
+        datasets=frozenset({DATASET_AQI}),
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.AQI,
         native_unit_of_measurement=None,
     ),
@@ -107,6 +179,9 @@ MOENV_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
         key="pm2_5",
         translation_key="pm2_5",
         native_value_fn=lambda aqi: aqi.pm2_5,
+        fields=frozenset({"aqi_station"}),
+        datasets=frozenset({DATASET_AQI}),
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.PM25,
         native_unit_of_measurement=CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
     ),
@@ -114,6 +189,9 @@ MOENV_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
         key="pm10",
         translation_key="pm10",
         native_value_fn=lambda aqi: aqi.pm10,
+        fields=frozenset({"aqi_station"}),
+        datasets=frozenset({DATASET_AQI}),
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.PM10,
         native_unit_of_measurement=CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
     ),
@@ -121,6 +199,9 @@ MOENV_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
         key="o3",
         translation_key="o3",
         native_value_fn=lambda aqi: aqi.o3,
+        fields=frozenset({"aqi_station"}),
+        datasets=frozenset({DATASET_AQI}),
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.OZONE,
         native_unit_of_measurement=CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
         entity_registry_enabled_default=False,
@@ -129,6 +210,9 @@ MOENV_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
         key="co",
         translation_key="co",
         native_value_fn=lambda aqi: aqi.co,
+        fields=frozenset({"aqi_station"}),
+        datasets=frozenset({DATASET_AQI}),
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.CO,
         native_unit_of_measurement=CONCENTRATION_PARTS_PER_MILLION,
         entity_registry_enabled_default=False,
@@ -137,6 +221,9 @@ MOENV_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
         key="no2",
         translation_key="no2",
         native_value_fn=lambda aqi: aqi.no2,
+        fields=frozenset({"aqi_station"}),
+        datasets=frozenset({DATASET_AQI}),
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.NITROGEN_DIOXIDE,
         native_unit_of_measurement=CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
         entity_registry_enabled_default=False,
@@ -145,6 +232,9 @@ MOENV_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
         key="no",
         translation_key="no",
         native_value_fn=lambda aqi: aqi.no,
+        fields=frozenset({"aqi_station"}),
+        datasets=frozenset({DATASET_AQI}),
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.NITROGEN_MONOXIDE,
         native_unit_of_measurement=CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
         entity_registry_enabled_default=False,
@@ -153,6 +243,9 @@ MOENV_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
         key="so2",
         translation_key="so2",
         native_value_fn=lambda aqi: aqi.so2,
+        fields=frozenset({"aqi_station"}),
+        datasets=frozenset({DATASET_AQI}),
+        max_age=STATE_MAX_AGE,
         device_class=SensorDeviceClass.SULPHUR_DIOXIDE,
         native_unit_of_measurement=CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
         entity_registry_enabled_default=False,
@@ -160,22 +253,137 @@ MOENV_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
 )
 
 
-class MOENVSensorEntity(CoordinatorEntity, SensorEntity):
-    _attr_has_entity_name = True
+class MOENVSensorEntity(CWAWeatherSensorEntity):
     _attr_attribution = ATTRIBUTION_MOENV
-    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def _value(self):
+        if (data := self._main.aqi.data) is None or data.aqi_station is None:
+            return None
+        return self.entity_description.native_value_fn(data.aqi_station)
+
+
+CYCLONE_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
+    CommonSensorEntityDescription(
+        key="typhoon_distance",
+        translation_key="typhoon_distance",
+        native_value_fn=lambda cyclone: cyclone.distance,
+        fields=frozenset({"distance"}),
+        datasets=frozenset({DATASET_CYCLONE}),
+        device_class=SensorDeviceClass.DISTANCE,
+        native_unit_of_measurement=UnitOfLength.KILOMETERS,
+        suggested_display_precision=0,
+    ),
+    CommonSensorEntityDescription(
+        key="typhoon_closest_distance",
+        translation_key="typhoon_closest_distance",
+        native_value_fn=lambda cyclone: cyclone.closest_distance,
+        fields=frozenset({"closest_distance"}),
+        datasets=frozenset({DATASET_CYCLONE}),
+        device_class=SensorDeviceClass.DISTANCE,
+        native_unit_of_measurement=UnitOfLength.KILOMETERS,
+        suggested_display_precision=0,
+        entity_registry_enabled_default=False,
+    ),
+    CommonSensorEntityDescription(
+        key="typhoon_eta",
+        translation_key="typhoon_eta",
+        native_value_fn=lambda cyclone: cyclone.eta,
+        fields=frozenset({"eta"}),
+        datasets=frozenset({DATASET_CYCLONE}),
+        device_class=SensorDeviceClass.TIMESTAMP,
+    ),
+)
+
+
+class CWACycloneSensorEntity(CWAWeatherSensorEntity):
+    # unknown without a storm, the values only change with an advisory
+    _attr_state_class = None
+
+    def _value(self):
+        if (data := self._main.cyclone.data) is None:
+            return None
+        return self.entity_description.native_value_fn(data)
+
+    @property
+    def extra_state_attributes(self) -> dict | None:
+        if (data := self._main.cyclone.data) is None or data.storm is None:
+            return None
+        return {"storm": data.storm, "closest_time": data.closest_time.isoformat()}
+
+
+GRID_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
+    CommonSensorEntityDescription(
+        key="grid_temperature",
+        translation_key="grid_temperature",
+        native_value_fn=lambda grid: grid.native_temperature,
+        fields=frozenset({"native_temperature"}),
+        datasets=frozenset({DATASET_GRID}),
+        deadband=0.1,
+        max_age=STATE_MAX_AGE,
+        device_class=SensorDeviceClass.TEMPERATURE,
+        native_unit_of_measurement=CWAWeatherCoordinator.native_temperature_unit,
+        entity_registry_enabled_default=False,
+    ),
+)
+
+
+class CWAGridSensorEntity(CWAWeatherSensorEntity):
+    def _value(self):
+        if (data := self._main.grid.data) is None:
+            return None
+        return self.entity_description.native_value_fn(data)
+
+
+DIAGNOSTIC_SENSOR_TYPES: tuple[CommonSensorEntityDescription, ...] = (
+    CommonSensorEntityDescription(
+        key="refresh_duration",
+        translation_key="refresh_duration",
+        # of the forecast refresh, the last refresh of every coordinator in the attributes
+        native_value_fn=lambda coordinator: coordinator.refresh_metrics.total.last,
+        attributes_fn=lambda coordinator: {c.dataset: round(c.refresh_metrics.total.last, 1) for c in coordinator.coordinators if c.refresh_metrics.total.last is not None},
+        state_class=SensorStateClass.MEASUREMENT,
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        suggested_display_precision=0,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+    CommonSensorEntityDescription(
+        key="upstream_requests",
+        translation_key="upstream_requests",
+        # sent by the entry's refreshes since the start, failed ones included
+        native_value_fn=lambda coordinator: sum(c.refresh_metrics.requests for c in coordinator.coordinators),
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        entity_registry_enabled_default=False,
+    ),
+)
+
+
+class CWAWeatherDiagnosticSensorEntity(CoordinatorEntity, SensorEntity):
+    _attr_has_entity_name = True
 
     def __init__(self, coordinator: CWAWeatherCoordinator, description: CommonSensorEntityDescription):
-        super().__init__(coordinator)
+        super().__init__(coordinator, context=description.datasets)
         self.entity_description = description
         self._attr_device_info = coordinator.device_info
         self._attr_unique_id = f"{coordinator.config_entry.entry_id}-{description.key}"
-        self._attr_native_value = self.entity_description.native_value_fn(self.coordinator.data.aqi_station)
+        self._attr_native_value, self._attr_extra_state_attributes = self._values()
+
+    def _values(self) -> tuple:
+        description = self.entity_description
+        return description.native_value_fn(self.coordinator), description.attributes_fn(self.coordinator) if description.attributes_fn else None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # after every refresh of every coordinator of the entry, the coordinators only call on a data change
+        for coordinator in self.coordinator.coordinators:
+            self.async_on_remove(coordinator.refresh_metrics.async_add_listener(self._handle_coordinator_update))
 
     def _handle_coordinator_update(self) -> None:
-        if (val := self.entity_description.native_value_fn(self.coordinator.data.aqi_station)) != self._attr_native_value:
-            _LOGGER.debug(f"Updating sensor {self.coordinator.name} {self.entity_description.key} from {self._attr_native_value} to {val}")
-            self._attr_native_value = val
+        if (values := self._values()) != (self._attr_native_value, self._attr_extra_state_attributes):
+            self._attr_native_value, self._attr_extra_state_attributes = values
+            self.coordinator.refresh_metrics.state_writes[self.entity_description.key] += 1
             self.async_write_ha_state()
 
 
@@ -183,4 +391,8 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
     coordinator = config_entry.runtime_data
     entities = [CWAWeatherSensorEntity(coordinator, description) for description in SENSOR_TYPES]
     entities.extend(MOENVSensorEntity(coordinator, description) for description in MOENV_SENSOR_TYPES)
+    if HAS_NUMPY:
+        entities.extend(CWACycloneSensorEntity(coordinator, description) for description in CYCLONE_SENSOR_TYPES)
+        entities.extend(CWAGridSensorEntity(coordinator, description) for description in GRID_SENSOR_TYPES)
+    entities.extend(CWAWeatherDiagnosticSensorEntity(coordinator, description) for description in DIAGNOSTIC_SENSOR_TYPES)
     async_add_entities(entities, False)
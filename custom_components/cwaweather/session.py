@@ -0,0 +1,146 @@
+# Integration owned HTTP sessions for the government open data hosts.
+#   opendata.cwa.gov.tw, data.moenv.gov.tw and api.nlsc.gov.tw each get their own keep-alive pool,
+#   so entries refreshing on the same tick reuse warm TLS connections instead of handshaking again.
+
+import os
+import logging
+from collections import Counter
+from urllib.parse import urlsplit
+import aiohttp
+from homeassistant.core import HomeAssistant, Event, callback
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+HOST_CWA = "opendata.cwa.gov.tw"
+HOST_MOENV = "data.moenv.gov.tw"
+HOST_NLSC = "api.nlsc.gov.tw"
+
+# max concurrent connections per host
+HOST_LIMITS = {
+    HOST_CWA: 8,
+    HOST_MOENV: 4,
+    HOST_NLSC: 4,
+}
+DEFAULT_HOST_LIMIT = 4
+
+KEEPALIVE_TIMEOUT = 75
+DNS_CACHE_TTL = 300
+
+# (connect, read) timeout in seconds per dataset
+DATASET_TIMEOUTS = {
+    "O-A0001-001": (5, 20),
+    "O-A0002-001": (5, 30),
+    "O-A0003-001": (5, 10),
+    "F-D0047-089": (5, 20),
+    "F-D0047-091": (5, 20),
+    "F-D0047-093": (5, 60),
+    "AQX_P_432": (5, 15),
+    "TownVillagePointQuery": (5, 5),
+}
+# by dataset id prefix, for the ids not listed above
+DATASET_PREFIX_TIMEOUTS = {
+    # the county forecasts F-D0047-001..087, all the towns of a county in one payload
+    "F-D0047-": (5, 30),
+}
+DEFAULT_TIMEOUT = (5, 10)
+
+
+def dataset_timeout(dataset) -> aiohttp.ClientTimeout:
+    if (timeout := DATASET_TIMEOUTS.get(dataset)) is None:
+        timeout = next((t for prefix, t in DATASET_PREFIX_TIMEOUTS.items() if dataset and dataset.startswith(prefix)), DEFAULT_TIMEOUT)
+    connect, read = timeout
+    return aiohttp.ClientTimeout(total=connect + 2 * read, connect=connect, sock_connect=connect, sock_read=read)
+
+
+class HostSessionPool:
+    """aiohttp sessions keyed by host, used like a single ClientSession."""
+
+    def __init__(self):
+        self._sessions: dict[str, aiohttp.ClientSession] = {}
+        self.stats: dict[str, Counter] = {}
+
+    def _trace_config(self, stats: Counter) -> aiohttp.TraceConfig:
+        async def on_request_start(session, ctx, params):
+            stats["requests"] += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            stats["connections_reused"] += 1
+
+        async def on_dns_cache_hit(session, ctx, params):
+            stats["dns_cache_hit"] += 1
+
+        async def on_dns_cache_miss(session, ctx, params):
+            stats["dns_cache_miss"] += 1
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace
+
+    def _session(self, host) -> aiohttp.ClientSession:
+        if (session := self._sessions.get(host)) is None or session.closed:
+            stats = self.stats.setdefault(host, Counter())
+            limit = HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT)
+            connector = aiohttp.TCPConnector(
+                ssl=False,
+                limit=limit,
+                limit_per_host=limit,
+                use_dns_cache=True,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+            )
+            session = aiohttp.ClientSession(connector=connector, trace_configs=[self._trace_config(stats)])
+            self._sessions[host] = session
+        return session
+
+    def get(self, url, **kwargs):
+        return self._session(urlsplit(url).hostname).get(url, **kwargs)
+
+    async def async_close(self):
+        for host, session in self._sessions.items():
+            _LOGGER.debug("%s: %s", host, dict(self.stats.get(host, {})))
+            await session.close()
+        self._sessions.clear()
+
+    def diagnostics(self) -> dict:
+        res = {}
+        for host, stats in self.stats.items():
+            created = stats["connections_created"]
+            reused = stats["connections_reused"]
+            res[host] = dict(stats)
+            res[host]["reuse_ratio"] = round(reused / (created + reused), 3) if created + reused else None
+        return res
+
+
+def _create_session():
+    # record / replay transport, see replay.py
+    if path := os.environ.get("CWAWEATHER_REPLAY"):
+        from .replay import ReplaySession
+        _LOGGER.warning("replaying upstream responses from %s", path)
+        return ReplaySession(path, float(os.environ.get("CWAWEATHER_REPLAY_SCALE", "1")))
+    if path := os.environ.get("CWAWEATHER_RECORD"):
+        from .replay import RecordingSession
+        _LOGGER.warning("recording upstream responses to %s", path)
+        return RecordingSession(HostSessionPool(), path)
+    return HostSessionPool()
+
+
+@callback
+def async_get_session(hass: HomeAssistant) -> HostSessionPool:
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (pool := domain_data.get("session")) is None:
+        pool = domain_data["session"] = _create_session()
+
+        async def _async_close(event: Event) -> None:
+            await pool.async_close()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close)
+    return pool
@@ -0,0 +1,52 @@
+# Upstream data shared by all entries, fetched by whichever entry refreshes first.
+#   One fetch at a time, the entries refreshing meanwhile wait for it and take its result. Not fetched again
+#   within refetch_after of the last fetch tried, unless the owner says otherwise, and the last data is kept
+#   while upstream fails. A failing first fetch raises, there is nothing to keep yet.
+
+import time
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from aiohttp import ClientError
+from .resilience import CircuitOpenError
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SharedFeed:
+    def __init__(self, name, refetch_after):
+        self.name = name
+        self.refetch_after = refetch_after
+        self.tried: float = None
+        self.fetched: float = None      # the last successful fetch
+        self._lock = asyncio.Lock()
+
+    def due(self, now: float) -> bool:
+        """Whether refetch_after passed since the last fetch tried."""
+        return self.tried is None or now - self.tried >= self.refetch_after
+
+    async def async_update(
+        self,
+        fetch: Callable[[], Awaitable],
+        has_data: Callable[[], bool],
+        due: Callable[[float], bool] | None = None,
+        prepare: Callable[[], Awaitable] | None = None,
+    ) -> bool:
+        """Await `fetch()` (fetching and taking the new data) unless `has_data()` and not `due(now)`, True when it
+        succeeded. `prepare()` runs first, under the same lock."""
+        async with self._lock:
+            if prepare is not None:
+                await prepare()
+            now = time.time()
+            if has_data() and not (due or self.due)(now):
+                return False
+            self.tried = now
+            try:
+                await fetch()
+            except (ClientError, asyncio.TimeoutError, CircuitOpenError) as err:
+                if not has_data():
+                    raise
+                _LOGGER.warning("%s unavailable, keep the last data: %r", self.name, err)
+                return False
+            self.fetched = now
+            return True
@@ -1,65 +1,197 @@
 import logging
 import asyncio
-import async_timeout
+import time
+import dataclasses
 from datetime import datetime
-import copy
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from urllib.parse import urlsplit
+from aiohttp import ClientError, ClientResponseError
+from .session import dataset_timeout
+from .ratelimit import limiter
+from .resilience import policy_for, latencies, breakers, snapshots, CircuitOpenError
+from .metrics import metrics
+from .schedule import cache_expiry, DEFAULT_CACHE_TTL
+
+try:
+    # orjson is much faster on the large station / forecast payloads, use it when available.
+    from orjson import loads as json_loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    from json import loads as json_loads
+    JSON_BACKEND = "json"
 
 _LOGGER = logging.getLogger(__name__)
 
 
-async def _url_get(session, url, is_json = True, verify_ssl = False, timeout = 10):
-    async with async_timeout.timeout(timeout):
-        async with session.get(url) as response:
-            response.raise_for_status()
-            if is_json:
-                return await response.json()
-            else:
-                return await response.text()
+async def _url_get(session, url, is_json = True, dataset = None):
+    metrics.request(dataset)
+    async with session.get(url, timeout=dataset_timeout(dataset)) as response:
+        response.raise_for_status()
+        body = await response.read()
+        m = metrics.dataset(dataset)
+        m.bytes_total += len(body)
+        m.bytes_last = len(body)
+        if is_json:
+            # decode straight from the body bytes, both backends accept bytes.
+            start = time.perf_counter()
+            data = json_loads(body)
+            m.decode.add((time.perf_counter() - start) * 1000)
+            return data
+        else:
+            return body.decode(response.get_encoding())
+
+
+def _is_retryable(err):
+    # client errors like an invalid key won't get better by retrying, and say nothing about the host
+    if isinstance(err, ClientResponseError):
+        return err.status == 429 or err.status >= 500
+    return isinstance(err, (ClientError, asyncio.TimeoutError))
+
+
+async def _hedged_get(session, url, is_json, dataset, api_key, delay):
+    first = asyncio.ensure_future(_url_get(session, url, is_json, dataset))
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return first.result()
+
+        async def _second():
+            await limiter.acquire(api_key, urlsplit(url).hostname, dataset)
+            _LOGGER.debug("%s hedged after %.2fs", url, delay)
+            return await _url_get(session, url, is_json, dataset)
+
+        pending.add(asyncio.ensure_future(_second()))
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        # also when the deadline cancels the wait, a request left running would hold a rate limit token and a connection
+        for task in pending:
+            task.cancel()
+
 
+async def _fetch(session, url, is_json, dataset, api_key):
+    host = urlsplit(url).hostname
+    breaker = breakers.get(host)
+    policy = policy_for(dataset)
+    error = None
 
+    if breaker.allow():
+        try:
+            async with asyncio.timeout(policy.deadline):
+                for attempt in range(policy.attempts):
+                    if attempt:
+                        await asyncio.sleep(policy.delay(attempt - 1))
+                        if not breaker.allow():
+                            break
+                    await limiter.acquire(api_key, host, dataset)
+                    start = time.monotonic()
+                    try:
+                        if policy.hedge and (delay := latencies.p95(dataset)) is not None:
+                            data = await _hedged_get(session, url, is_json, dataset, api_key, delay)
+                        else:
+                            data = await _url_get(session, url, is_json, dataset)
+                    except Exception as err:
+                        if not _is_retryable(err):
+                            raise
+                        error = err
+                        breaker.failure()
+                        _LOGGER.debug("%s attempt %d failed: %r", url, attempt + 1, err)
+                        continue
+
+                    latencies.add(dataset, time.monotonic() - start)
+                    metrics.dataset(dataset).latency.add((time.monotonic() - start) * 1000)
+                    breaker.success()
+                    if policy.snapshot:
+                        snapshots.put(url, data)
+                    return data
+        except TimeoutError as err:
+            error = error or err
+    else:
+        error = CircuitOpenError(host)
+
+    if (snap := snapshots.get(url)) is not None:
+        ts, data = snap
+        metrics.dataset(dataset).cache["stale"] += 1
+        _LOGGER.warning("%s unavailable (%r), serving snapshot from %s", url, error, datetime.fromtimestamp(ts))
+        return data
+    raise error
+
+
+# url -> (expiry, data), data is None while the fetch is in flight
 _data_cache = {}
+def cache_clear():
+    _data_cache.clear()
+
 def _cache_clean():
-    ts = datetime.now().timestamp()
-    for k in [k for k, (t, r) in _data_cache.items() if ts - t >= 60]:
+    ts = time.time()
+    for k in [k for k, (t, r) in _data_cache.items() if ts >= t]:
         del _data_cache[k]
     return ts
 
-async def _cache_hit_or_fetch(url, ts, session, is_json, verify_ssl, timeout):
+async def _cache_hit_or_fetch(url, ts, session, is_json, dataset, api_key):
     if url not in _data_cache:
-        _data_cache[url] = (ts, None)
+        _data_cache[url] = (ts + DEFAULT_CACHE_TTL, None)
+        metrics.dataset(dataset).cache["miss"] += 1
         try:
-            data = await _url_get(session, url, is_json, verify_ssl, timeout)
-            _data_cache[url] = (ts, data)
+            data = await _fetch(session, url, is_json, dataset, api_key)
+            # published datasets are kept until their next publication, see schedule.py
+            _data_cache[url] = (cache_expiry(dataset, ts), data)
             _LOGGER.debug("%s fetched", url)
-            return copy.deepcopy(data)
+            return data
         except:
-            del _data_cache[url]
+            _data_cache.pop(url, None)
             raise
 
     _, data = _data_cache[url]
     if data is not None:
         _LOGGER.debug("%s cached", url)
-        return copy.deepcopy(data)
+        metrics.dataset(dataset).cache["hit"] += 1
+        return data
 
     return False
 
-async def url_get(session, url, is_json = True, verify_ssl = False, timeout = 10):
+# The decoded payload is shared by every caller within the cache lifetime (and by the snapshot store),
+# the parsers build new objects from it and must never modify it.
+async def url_get(session, url, is_json = True, dataset = None, api_key = None):
     ts = _cache_clean()
+    waiting = False
     while True:
-        if data := await _cache_hit_or_fetch(url, ts, session, is_json, verify_ssl, timeout):
+        if data := await _cache_hit_or_fetch(url, ts, session, is_json, dataset, api_key):
             return data
 
         _LOGGER.debug("%s wait...", url)
+        if not waiting:
+            waiting = True
+            metrics.dataset(dataset).cache["wait"] += 1
         await asyncio.sleep(.5)
         # _cache_clean()
 
 
+_float_fields = {}
+def float_fields(cls) -> frozenset:
+    """Names of the float typed fields of a record dataclass."""
+    if (res := _float_fields.get(cls)) is None:
+        res = _float_fields[cls] = frozenset(f.name for f in dataclasses.fields(cls) if f.type is float) if dataclasses.is_dataclass(cls) else frozenset()
+    return res
+
+def to_float(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
 def parse_element(attrs, v0, r = None, par = ""):
     r = r if r is not None else {}
+    floats = float_fields(type(r))
     for k, v in v0.items():
         if f'{par}{k}' in attrs and v != '-99' and v != -99:
-            r.__setattr__(k, v)
+            r.__setattr__(k, to_float(v) if k in floats else v)
         elif isinstance(v, dict):
             parse_element(attrs, v, r, f'{par}{k}/')
     return r
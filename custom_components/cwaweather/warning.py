@@ -0,0 +1,103 @@
+# Weather warnings (W-C0033-001, the hazards of every county), one snapshot shared by all entries.
+#   The national dataset is fetched once per cycle and indexed by county, and by (county, town) for hazards
+#   naming the towns they affect. An entry's warnings are a dict lookup plus a validity check of the few hazards
+#   found. A response the fetch cache hands out again is not indexed again.
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from .cwa import CWA
+from .shared import SharedFeed
+from .locations import normalize
+from .metrics import metrics
+from .schedule import TZ
+
+_LOGGER = logging.getLogger(__name__)
+
+# entries refreshing in between share the last fetch
+REFETCH_AFTER = 300
+
+
+@dataclass(frozen=True, slots=True)
+class Hazard:
+    phenomena: str
+    significance: str
+    start: datetime
+    end: datetime
+
+    @property
+    def name(self) -> str:
+        return f"{self.phenomena}{self.significance}"
+
+    def active(self, now: datetime) -> bool:
+        return self.start <= now < self.end
+
+    def as_dict(self) -> dict:
+        return {"name": self.name, "phenomena": self.phenomena, "significance": self.significance, "start": self.start.isoformat(), "end": self.end.isoformat()}
+
+
+def _time(v) -> datetime:
+    return datetime.fromisoformat(v).replace(tzinfo=TZ)
+
+
+class WarningIndex:
+    def __init__(self, payload):
+        self.payload = payload
+        # county -> hazards of the whole county, (county, town) -> hazards naming the town
+        self.counties: dict[str, tuple[Hazard, ...]] = {}
+        towns = {}
+        for loc in payload["records"]["location"]:
+            county = normalize(loc["locationName"])
+            whole = []
+            for haz in loc["hazardConditions"]["hazards"]:
+                info = haz["info"]
+                hazard = Hazard(info["phenomena"], info["significance"], _time(haz["validTime"]["startTime"]), _time(haz["validTime"]["endTime"]))
+                if areas := (info.get("affectedAreas") or {}).get("location"):
+                    for area in areas:
+                        towns.setdefault((county, normalize(area["locationName"])), []).append(hazard)
+                else:
+                    whole.append(hazard)
+            if whole:
+                self.counties[county] = tuple(whole)
+        self.towns: dict[tuple[str, str], tuple[Hazard, ...]] = {k: tuple(v) for k, v in towns.items()}
+
+    def __len__(self):
+        return sum(map(len, self.counties.values())) + sum(map(len, self.towns.values()))
+
+    def active(self, county, town, now: datetime) -> tuple[Hazard, ...]:
+        """The hazards in effect at `now` for the county and town."""
+        county = normalize(county)
+        found = self.counties.get(county, ())
+        if town and (in_town := self.towns.get((county, normalize(town)))):
+            found += in_town
+        return tuple(h for h in found if h.active(now))
+
+
+class WeatherWarnings:
+    def __init__(self):
+        self._index: WarningIndex = None
+        self._shared = SharedFeed("weather warnings", REFETCH_AFTER)
+
+    async def async_update(self, session, api_key) -> WarningIndex:
+        """The index, fetched again when the last fetch is REFETCH_AFTER old."""
+        async def fetch():
+            payload = await CWA.get_weather_warnings(session, api_key)
+            if (index := self._index) is not None and payload is index.payload:
+                return
+            with metrics.parse_timer("W-C0033-001"):
+                index = self._index = WarningIndex(payload)
+            _LOGGER.debug("%d weather warnings in %d counties", len(index), len(index.counties))
+        await self._shared.async_update(fetch, has_data=lambda: self._index is not None)
+        return self._index
+
+    def diagnostics(self) -> dict:
+        if (index := self._index) is None:
+            return {}
+        return {
+            "counties": {county: [h.name for h in hazards] for county, hazards in index.counties.items()},
+            "towns": len(index.towns),
+            "fetched": datetime.fromtimestamp(self._shared.fetched).isoformat(),
+        }
+
+
+weather_warnings = WeatherWarnings()
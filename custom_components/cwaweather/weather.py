@@ -7,7 +7,7 @@ from homeassistant.core import HomeAssistant, callback
 from homeassistant.components import weather
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from .coordinator import CWAWeatherCoordinator
+from .coordinator import CWAWeatherCoordinator, DATASET_FORECAST, DATASET_TWICE_DAILY, DATASET_OBSERVATION
 from .const import (
     DOMAIN,
     ATTRIBUTION_CWA,
@@ -20,6 +20,15 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry, asyn
     async_add_entities([CWAWeatherEntity(coordinator)], False)
 
 
+# CWAWeatherData / ObservationData fields (and coordinator attributes) the entity state is made of
+STATE_FIELDS = frozenset({
+    "condition", "native_temperature", "native_apparent_temperature", "native_pressure", "humidity",
+    "native_dew_point", "native_wind_speed", "wind_bearing", "uv_index", "forecast_attributes",
+    "station_attributes",
+})
+FORECAST_TYPES = ("hourly", "twice_daily", "daily")
+
+
 class CWAWeatherEntity(weather.SingleCoordinatorWeatherEntity[CWAWeatherCoordinator]):
     _attr_has_entity_name = True
     _attr_name = None
@@ -32,19 +41,41 @@ class CWAWeatherEntity(weather.SingleCoordinatorWeatherEntity[CWAWeatherCoordina
     )
 
     def __init__(self, coordinator: CWAWeatherCoordinator):
-        super().__init__(coordinator)
-        self._unsubscribe_listener = None
+        super().__init__(coordinator, context=frozenset({DATASET_FORECAST, DATASET_TWICE_DAILY, DATASET_OBSERVATION}))
+        self._unsubscribe_listeners = []
         self._attr_native_temperature_unit = coordinator.native_temperature_unit
         self._attr_native_wind_speed_unit = coordinator.native_wind_speed_unit
         self._attr_unique_id = coordinator.config_entry.entry_id
         self._attr_device_info = coordinator.device_info
+        self._forecasts = {}
+        self._written_available = True
 
     async def async_added_to_hass(self):
-        self._unsubscribe_listener = self.coordinator.async_add_listener(self._handle_coordinator_update)
+        # the station observations come on their own schedule
+        self._unsubscribe_listeners = [
+            c.async_add_listener(self._handle_coordinator_update, self.coordinator_context)
+            for c in (self.coordinator, self.coordinator.observation)
+        ]
 
     async def async_will_remove_from_hass(self):
-        if self._unsubscribe_listener:
-            self._unsubscribe_listener()
+        for unsubscribe in self._unsubscribe_listeners:
+            unsubscribe()
+        self._unsubscribe_listeners = []
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        # write the state only when its fields changed, and wake forecast subscribers only
+        # when their view changed, new forecasts or the "from now" cut moved to the next period
+        changed = self.coordinator.changed_fields | self.coordinator.observation.changed_fields
+        if not changed.isdisjoint(STATE_FIELDS) or self.available != self._written_available:
+            self._written_available = self.available
+            self.coordinator.refresh_metrics.state_writes["weather"] += 1
+            self.async_write_ha_state()
+
+        forecasts = {kind: self.coordinator.get_forcasts(kind) for kind in FORECAST_TYPES}
+        if changed := [kind for kind in FORECAST_TYPES if forecasts[kind] is not self._forecasts.get(kind)]:
+            self._forecasts = forecasts
+            self.coordinator.config_entry.async_create_task(self.hass, self.async_update_listeners(changed))
 
     @callback
     def _async_forecast_hourly(self) -> list[weather.Forecast] | None:
@@ -60,35 +91,35 @@ class CWAWeatherEntity(weather.SingleCoordinatorWeatherEntity[CWAWeatherCoordina
 
     @property
     def condition(self) -> str | None:
-        return self.coordinator.data.condition
+        return self.coordinator.current("condition")
 
     @property
     def native_temperature(self) -> float | None:
-        return self.coordinator.data.native_temperature
+        return self.coordinator.current("native_temperature")
 
     @property
     def native_apparent_temperature(self) -> float | None:
-        return self.coordinator.data.native_apparent_temperature
+        return self.coordinator.current("native_apparent_temperature")
 
     @property
     def native_pressure(self) -> float | None:
-        return self.coordinator.data.native_pressure
+        return self.coordinator.current("native_pressure")
 
     @property
     def humidity(self) -> float | None:
-        return self.coordinator.data.humidity
+        return self.coordinator.current("humidity")
 
     @property
     def native_dew_point(self) -> float:
-        return self.coordinator.data.native_dew_point
+        return self.coordinator.current("native_dew_point")
 
     @property
     def native_wind_speed(self) -> float:
-        return self.coordinator.data.native_wind_speed
+        return self.coordinator.current("native_wind_speed")
 
     @property
     def wind_bearing(self) -> float:
-        return self.coordinator.data.wind_bearing
+        return self.coordinator.current("wind_bearing")
 
     # @property
     # def native_wind_gust_speed(self) -> float | None:
@@ -96,7 +127,7 @@ class CWAWeatherEntity(weather.SingleCoordinatorWeatherEntity[CWAWeatherCoordina
 
     @property
     def uv_index(self) -> float:
-        return self.coordinator.data.uv_index
+        return self.coordinator.current("uv_index")
 
     @property
     def extra_state_attributes(self):